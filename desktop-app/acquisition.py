@@ -0,0 +1,234 @@
+import re
+import threading
+
+import numpy as np
+
+from protocol import FrameDecoder
+
+# The Pico's ADC is 12-bit, so a flat input sits in the middle of the range.
+ADC_MIDPOINT = 2048
+# Depends on the analog front-end gain; 1.0 shows raw ADC counts.
+DEFAULT_MICROVOLTS_PER_COUNT = 1.0
+
+_READING_PATTERN = re.compile(rb'EEG reading: (-?\d+)')
+_MAX_PARTIAL_LINE = 4096
+
+def parse_text_block(data):
+    """
+    Bulk-parses the firmware's "EEG reading: %d" lines.
+
+    Args:
+        data: Raw bytes read from the port, possibly ending mid-line.
+
+    Returns:
+        A tuple (counts, remainder, skipped_lines): the ADC counts of every
+        complete line as a float array, the trailing partial line to prepend
+        to the next read, and how many complete lines held no reading.
+    """
+    cut = data.rfind(b'\n')
+    if cut < 0:
+        if len(data) > _MAX_PARTIAL_LINE: # Garbage without line breaks
+            return np.empty(0), b'', 1
+        return np.empty(0), data, 0
+
+    complete, remainder = data[:cut + 1], data[cut + 1:]
+    values = _READING_PATTERN.findall(complete)
+    counts = np.fromiter(map(int, values), dtype=np.float64, count=len(values))
+    skipped_lines = complete.count(b'\n') - len(values)
+    return counts, remainder, skipped_lines
+
+class TextLineDecoder:
+    """
+    Incremental decoder for the legacy text output of the firmware.
+    Has the same interface as `protocol.FrameDecoder`.
+    """
+    def __init__(self):
+        self._pending = b''
+        self.skipped_lines = 0
+
+    def feed(self, data):
+        """Returns the samples of every complete line, centered on the ADC midpoint."""
+        counts, self._pending, skipped = parse_text_block(self._pending + data)
+        self.skipped_lines += skipped
+        counts -= ADC_MIDPOINT
+        return counts
+
+    def stats(self):
+        return {"skippedLines": self.skipped_lines}
+
+def create_decoder(protocol):
+    """Returns a stream decoder for 'binary' frames or 'text' lines."""
+    if protocol == 'binary':
+        return FrameDecoder()
+    if protocol == 'text':
+        return TextLineDecoder()
+    raise ValueError(f"Unknown protocol: {protocol}")
+
+class SampleQueue:
+    """
+    Bounded single-producer/single-consumer queue of samples.
+
+    The producer only ever advances the tail and the consumer only `_head`,
+    each after the data it guards has been copied, so the two sides never
+    need a lock. When the queue is full the newest samples are dropped and
+    counted, instead of blocking the acquisition thread.
+
+    `clear()` starts a new generation. The producer tags each block with the
+    generation it read before deciding to forward it, and the consumer
+    discards blocks with an older tag, so a block the producer was still
+    pushing while the consumer cleared never leaks into the next session.
+    """
+    def __init__(self, capacity=8192, channels=1):
+        self.capacity = capacity
+        self.channels = channels
+        self._buffer = np.zeros((channels, capacity))
+        self._head = 0 # Total samples consumed
+        # (total samples produced, generation of the newest block, total when
+        # that generation's first block started), published as one object
+        self._produced = (0, 0, 0)
+        self.generation = 0 # Advanced by clear()
+        self.overflow_events = 0
+        self.dropped_samples = 0
+
+    def push(self, samples, generation=None):
+        """
+        Enqueues as many samples as fit and returns how many were accepted.
+
+        Args:
+            samples: A channels x samples block (a 1-D block for a single channel).
+            generation: The `generation` the producer read before it decided
+                to push the block (None for the current one). A block from
+                before the last clear() is discarded.
+        """
+        if generation is None:
+            generation = self.generation
+        elif generation != self.generation:
+            return 0
+        tail, produced_generation, generation_start = self._produced
+        if generation != produced_generation:
+            generation_start = tail
+
+        samples = samples.reshape(self.channels, -1)
+        available = samples.shape[1]
+        free = self.capacity - (tail - self._head)
+        count = min(available, free)
+        if count < available:
+            self.overflow_events += 1
+            self.dropped_samples += available - count
+
+        start = tail % self.capacity
+        first = min(count, self.capacity - start)
+        self._buffer[:, start:start + first] = samples[:, :first]
+        self._buffer[:, :count - first] = samples[:, first:count]
+        self._produced = (tail + count, generation, generation_start)
+        return count
+
+    def pop_all(self):
+        """Dequeues every available sample as one contiguous channels x samples array."""
+        tail, generation, generation_start = self._produced
+        if generation != self.generation:
+            # Pushed after the last clear(), but for the generation before it
+            self._head = tail
+            return np.empty((self.channels, 0))
+        head = max(self._head, generation_start)
+        count = tail - head
+        if count == 0:
+            self._head = tail
+            return np.empty((self.channels, 0))
+
+        start = head % self.capacity
+        first = min(count, self.capacity - start)
+        samples = np.empty((self.channels, count))
+        samples[:, :first] = self._buffer[:, start:start + first]
+        samples[:, first:] = self._buffer[:, :count - first]
+        self._head = tail
+        return samples
+
+    def clear(self):
+        """Discards everything queued so far, and any block still being pushed (consumer side)."""
+        self.generation += 1
+        self._head = self._produced[0]
+
+    def __len__(self):
+        return self._produced[0] - self._head
+
+class SerialAcquisition(threading.Thread):
+    """
+    Reads the Pico's USB serial stream on a dedicated thread.
+
+    Incoming bytes are read in bulk, parsed into blocks of samples and
+    pushed into a `SampleQueue`, which the GUI thread drains on its own
+    schedule. Neither side ever waits for the other.
+    """
+    def __init__(self, port, baudrate=115200, protocol='binary', queue_capacity=8192,
+                 microvolts_per_count=DEFAULT_MICROVOLTS_PER_COUNT, read_size=4096):
+        super().__init__(name="SerialAcquisition", daemon=True)
+        self.port = port
+        self.baudrate = baudrate
+        self.decoder = create_decoder(protocol)
+        self.microvolts_per_count = microvolts_per_count
+        self.read_size = read_size
+        self.queue = SampleQueue(queue_capacity)
+
+        self.bytes_read = 0
+        self.samples_parsed = 0
+        self.error = None
+
+        self._stop_event = threading.Event()
+        self._forwarding = threading.Event()
+
+    def set_forwarding(self, enabled):
+        """
+        Enables or disables handing samples to the queue.
+        While disabled the port is still read, so the device never backs up,
+        but the samples are discarded rather than counted as dropped.
+        """
+        if enabled:
+            self._forwarding.set()
+        else:
+            self._forwarding.clear()
+
+    def stop(self):
+        """Asks the thread to finish its current read and exit."""
+        self._stop_event.set()
+
+    def run(self):
+        try:
+            # Imported here, so that simulated sessions (which use SampleQueue) never load it
+            import serial
+        except ImportError: # pyserial is only needed when a real device is attached
+            self.error = "pyserial is not installed"
+            return
+
+        try:
+            with serial.Serial(self.port, self.baudrate, timeout=0.05) as link:
+                while not self._stop_event.is_set():
+                    chunk = link.read(self.read_size)
+                    if not chunk:
+                        continue
+                    self.bytes_read += len(chunk)
+
+                    counts = self.decoder.feed(chunk)
+                    if counts.size == 0:
+                        continue
+                    self.samples_parsed += counts.size
+
+                    # Read before the forwarding check, so a block decided
+                    # on before a clear() is recognized as stale
+                    generation = self.queue.generation
+                    if self._forwarding.is_set():
+                        self.queue.push(counts * self.microvolts_per_count, generation)
+        except (serial.SerialException, OSError) as e:
+            self.error = str(e)
+
+    def stats(self):
+        """Returns the acquisition counters as a dictionary."""
+        return {
+            "bytesRead": self.bytes_read,
+            "samplesParsed": self.samples_parsed,
+            **self.decoder.stats(),
+            "overflowEvents": self.queue.overflow_events,
+            "droppedSamples": self.queue.dropped_samples,
+            "queued": len(self.queue),
+            "error": self.error,
+        }
@@ -0,0 +1,123 @@
+import numpy as np
+
+# Band edges in Hz. A missing upper edge means "up to Nyquist".
+BANDS = {
+    'Theta (4-8Hz)': (4, 8),
+    'Alpha (8-13Hz)': (8, 13),
+    'Beta (13-30Hz)': (13, 30),
+    'Gamma (>30Hz)': (30, None),
+}
+
+class BandPowerEngine:
+    """
+    Streaming band-power estimator based on a hop-based Welch method.
+
+    Instead of transforming the whole window on every sample, one
+    Hann-windowed segment is transformed every `hop` samples and averaged
+    with the previous `segments` periodograms. The window, the band
+    integration weights and the scratch buffers are built once, so each
+    hop costs one small real FFT and one matrix product.
+
+    All channels are analyzed together: the FFT, the averaging and the band
+    integration each run as a single vectorized operation over a
+    channels x samples window.
+    """
+    def __init__(self, sample_rate=250, segment_length=250, hop=25, segments=8, channels=1):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.segment_length = segment_length
+        self.hop = hop
+        self.band_names = list(BANDS)
+
+        # --- Cached analysis plan ---
+        self._window = np.hanning(segment_length)
+        self._windowed = np.empty((channels, segment_length))
+        freqs = np.fft.rfftfreq(segment_length, 1 / sample_rate)
+        self.frequencies = freqs
+        # One-sided PSD scaling (density, V**2/Hz) as used by Welch's method
+        psd_scale = np.full(freqs.size, 2.0 / (sample_rate * np.sum(self._window**2)))
+        psd_scale[0] /= 2
+        if segment_length % 2 == 0:
+            psd_scale[-1] /= 2
+        self._psd_scale = psd_scale
+
+        # Rows of this matrix integrate the PSD over each band (PSD * df)
+        df = freqs[1] - freqs[0]
+        self._band_weights = np.zeros((len(BANDS), freqs.size))
+        for row, (low, high) in enumerate(BANDS.values()):
+            high = freqs[-1] + df if high is None else high
+            self._band_weights[row, (freqs >= low) & (freqs < high)] = df
+
+        self._periodograms = np.zeros((segments, channels, freqs.size))
+        self._segment_ends = np.zeros(segments, dtype=np.int64) # Sample index one past each segment
+        self.reset()
+
+    def reset(self):
+        """Discards all accumulated periodograms."""
+        self._periodograms.fill(0)
+        self._slot = 0
+        self._filled = 0
+        self._pending = 0
+        self._position = 0 # Samples pushed since the reset
+        self.band_powers = np.zeros((self.channels, len(BANDS))) # Channels x bands
+        self.band_powers.flags.writeable = False
+
+    def push(self, count, waveform):
+        """
+        Advances the estimator by `count` newly appended samples.
+
+        Args:
+            count: How many samples were appended since the last call.
+            waveform: The live channels x samples window, newest sample last.
+
+        Returns:
+            True if the band powers were re-estimated on this call.
+        """
+        self._pending += count
+        self._position += count
+        if self._pending < self.hop:
+            return False
+        # A large block only needs the newest segment, not every missed hop
+        self._pending %= self.hop
+
+        segment = waveform[:, -self.segment_length:]
+        np.subtract(segment, segment.mean(axis=1, keepdims=True), out=self._windowed)
+        self._windowed *= self._window
+        spectrum = np.fft.rfft(self._windowed, axis=1)
+
+        psd = self._periodograms[self._slot]
+        np.multiply(spectrum.real, spectrum.real, out=psd)
+        psd += spectrum.imag * spectrum.imag
+        psd *= self._psd_scale
+        self._segment_ends[self._slot] = self._position
+        self._slot = (self._slot + 1) % len(self._periodograms)
+        self._filled = min(self._filled + 1, len(self._periodograms))
+
+        mean_psd = self._periodograms.sum(axis=0) / self._filled
+        # A new, read-only array each hop, so consumers can hold on to it safely
+        self.band_powers = mean_psd @ self._band_weights.T
+        self.band_powers.flags.writeable = False
+        return True
+
+    @property
+    def first_sample(self):
+        """
+        Index of the oldest sample the current estimate depends on: the start
+        of the oldest segment in the average (negative while the first
+        segments still reach back before the first sample).
+        """
+        if not self._filled:
+            return -self.segment_length
+        return int(self._segment_ends[:self._filled].min()) - self.segment_length
+
+    @property
+    def latest_periodogram(self):
+        """
+        The channels x frequencies PSD of the newest segment. It is a buffer
+        that later hops overwrite, so copy what must be kept.
+        """
+        return self._periodograms[self._slot - 1]
+
+    def as_dict(self):
+        """Returns the latest band powers, averaged over channels, keyed by band name."""
+        return dict(zip(self.band_names, self.band_powers.mean(axis=0).tolist()))
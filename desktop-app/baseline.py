@@ -0,0 +1,91 @@
+import numpy as np
+
+# Guided relaxation weights later samples more, as the patient settles
+GUIDED_HALFLIFE_S = 30.0
+# Powers and ratios are roughly log-normal, so statistics are kept on their logarithm
+LOG_FLOOR = 1e-12
+
+class RunningStats:
+    """Welford's streaming mean and variance, one estimate per field."""
+    def __init__(self, fields):
+        self.count = 0
+        self.mean = np.zeros(fields)
+        self._m2 = np.zeros(fields)
+
+    def add(self, values, dt=None):
+        self.count += 1
+        delta = values - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (values - self.mean)
+
+    @property
+    def variance(self):
+        return self._m2 / (self.count - 1) if self.count > 1 else np.zeros_like(self._m2)
+
+class EwmaStats:
+    """
+    Exponentially weighted mean and variance, one estimate per field.
+    Each update is weighted by the time it covers, so the half-life holds
+    whatever the update rate.
+    """
+    def __init__(self, fields, halflife_s=GUIDED_HALFLIFE_S):
+        self.count = 0
+        self.halflife_s = halflife_s
+        self.mean = np.zeros(fields)
+        self.variance = np.zeros(fields)
+
+    def add(self, values, dt=None):
+        self.count += 1
+        if self.count == 1:
+            self.mean[:] = values
+            return
+        alpha = 1 - 0.5 ** ((dt or 0.0) / self.halflife_s)
+        delta = values - self.mean
+        self.mean += alpha * delta
+        self.variance = (1 - alpha) * (self.variance + alpha * delta * delta)
+
+class Baseline:
+    """
+    A patient's resting alpha/beta ratio and band powers.
+
+    Built during calibration by feeding one analysis result at a time to
+    `add`; memory use is constant however long calibration runs. Once
+    `freeze` is called, `z_scores` expresses new results in standard
+    deviations from the baseline.
+    """
+    def __init__(self, field_names, method='welford', min_std=0.05):
+        self.field_names = tuple(field_names)
+        fields = len(self.field_names)
+        self.method = method
+        self.stats = RunningStats(fields) if method == 'welford' else EwmaStats(fields)
+        self.min_std = min_std # Guards against a near-constant calibration signal
+        self.mean = None
+        self.std = None
+        self._last_time = None
+
+    @staticmethod
+    def _log(values):
+        return np.log(np.maximum(np.asarray(values, dtype=np.float64), LOG_FLOOR))
+
+    def add(self, time, values):
+        """Adds the analysis result at session `time` (seconds) to the estimate."""
+        dt = None if self._last_time is None else time - self._last_time
+        self._last_time = time
+        self.stats.add(self._log(values), dt)
+
+    def freeze(self):
+        """Fixes the estimate. Returns False if too little data was collected."""
+        if self.stats.count < 2:
+            return False
+        self.mean = self.stats.mean.copy()
+        self.std = np.maximum(np.sqrt(self.stats.variance), self.min_std)
+        return True
+
+    @property
+    def is_ready(self):
+        return self.mean is not None
+
+    def z_scores(self, values):
+        """Standard scores of one result per field against the frozen baseline."""
+        return (self._log(values) - self.mean) / self.std
+
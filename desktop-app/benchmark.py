@@ -0,0 +1,168 @@
+"""
+Headless benchmark of the model -> data_updated pipeline.
+
+Drives NeuroDataModel directly, without the controller's QTimer, over a
+matrix of window sizes, channel counts, sample rates and block sizes, and
+reports throughput, per-update latency percentiles and memory growth.
+
+    python benchmark.py --channels 1 8 32 --output bench.json
+    python benchmark.py --view --output bench.json      # include update_view
+    python benchmark.py --compare old.json --output new.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+def _make_input(channels, sample_rate, seconds, seed=0):
+    """Precomputes a synthetic channels x samples signal so generation is not timed."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    signal = 20 * np.sin(2 * np.pi * 10 * t) + 8 * np.sin(2 * np.pi * 22 * t)
+    return signal + rng.normal(0, 3, (channels, t.size))
+
+def _create_pipeline(channels, sample_rate, window, with_view):
+    from model import NeuroDataModel
+
+    model = NeuroDataModel(channel_count=channels, sample_rate=sample_rate, window_samples=window)
+    if with_view:
+        from view import NeuroTrackView
+        view = NeuroTrackView()
+        # Connected directly, so every update pays for a full view refresh
+        model.data_updated.connect(view.update_view)
+        model._benchmark_view = view # Keep the view alive with the model
+    return model
+
+def run_case(channels, sample_rate, window, block, seconds, with_view=False):
+    """Benchmarks one configuration and returns its results as a dictionary."""
+    signal = _make_input(channels, sample_rate, seconds)
+    blocks = [signal[:, i:i + block] for i in range(0, signal.shape[1] - block + 1, block)]
+
+    # --- Timing pass ---
+    model = _create_pipeline(channels, sample_rate, window, with_view)
+    latencies = np.empty(len(blocks), dtype=np.int64)
+    clock = time.perf_counter_ns
+    start = clock()
+    for i, samples in enumerate(blocks):
+        before = clock()
+        model.append_block(samples)
+        latencies[i] = clock() - before
+    elapsed = (clock() - start) / 1e9
+
+    # --- Memory pass (tracemalloc slows things down, so it is not timed) ---
+    model = _create_pipeline(channels, sample_rate, window, with_view)
+    half = len(blocks) // 2
+    for samples in blocks[:half]: # Warm up caches and lazily allocated buffers
+        model.append_block(samples)
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    for samples in blocks[half:]:
+        model.append_block(samples)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    samples_processed = len(blocks) * block
+    p50, p99 = np.percentile(latencies, [50, 99]) / 1000
+    return {
+        "channels": channels,
+        "sampleRate": sample_rate,
+        "windowSamples": window,
+        "blockSize": block,
+        "withView": with_view,
+        "updates": len(blocks),
+        "samplesPerSecond": samples_processed / elapsed,
+        "realTimeFactor": samples_processed / elapsed / sample_rate,
+        "latencyUs": {
+            "p50": float(p50),
+            "p99": float(p99),
+            "max": float(latencies.max() / 1000),
+        },
+        "memory": {
+            "growthBytes": current - baseline,
+            "peakBytes": peak - baseline,
+        },
+    }
+
+def compare_results(previous, current, tolerance=0.15):
+    """
+    Compares two result files case by case.
+
+    Returns:
+        A list of human-readable regressions (throughput drops or p99
+        latency increases larger than `tolerance`).
+    """
+    def key(case):
+        return (case["channels"], case["sampleRate"], case["windowSamples"], case["blockSize"], case["withView"])
+
+    old_cases = {key(case): case for case in previous["results"]}
+    regressions = []
+    for case in current["results"]:
+        old = old_cases.get(key(case))
+        if old is None:
+            continue
+        if case["samplesPerSecond"] < old["samplesPerSecond"] * (1 - tolerance):
+            regressions.append(f"{key(case)}: throughput {old['samplesPerSecond']:,.0f} -> {case['samplesPerSecond']:,.0f} samples/s")
+        if case["latencyUs"]["p99"] > old["latencyUs"]["p99"] * (1 + tolerance):
+            regressions.append(f"{key(case)}: p99 latency {old['latencyUs']['p99']:.1f} -> {case['latencyUs']['p99']:.1f} us")
+    return regressions
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Headless NeuroTrack pipeline benchmark")
+    parser.add_argument('--windows', type=int, nargs='+', default=[500, 2500], help="Waveform window sizes in samples")
+    parser.add_argument('--channels', type=int, nargs='+', default=[1, 8, 32], help="Channel counts")
+    parser.add_argument('--rates', type=int, nargs='+', default=[250, 1000], help="Sample rates in Hz")
+    parser.add_argument('--blocks', type=int, nargs='+', default=[1, 10], help="Samples per update")
+    parser.add_argument('--seconds', type=float, default=10.0, help="Seconds of signal per case")
+    parser.add_argument('--view', action='store_true', help="Also refresh an offscreen NeuroTrackView on every update")
+    parser.add_argument('--output', default='benchmark_results.json', help="Where to write the JSON results")
+    parser.add_argument('--compare', metavar='PREVIOUS', help="Report regressions against an earlier results file")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.view:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PyQt6.QtWidgets import QApplication
+        app = QApplication(sys.argv[:1])
+
+    results = []
+    for window, channels, rate, block in itertools.product(args.windows, args.channels, args.rates, args.blocks):
+        result = run_case(channels, rate, window, block, args.seconds, with_view=args.view)
+        results.append(result)
+        print(f"window={window:>5} channels={channels:>3} rate={rate:>5}Hz block={block:>3}: "
+              f"{result['samplesPerSecond']:>12,.0f} samples/s  "
+              f"p50={result['latencyUs']['p50']:8.1f}us  p99={result['latencyUs']['p99']:8.1f}us  "
+              f"mem+={result['memory']['growthBytes']:>8,d}B")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "seconds": args.seconds,
+        },
+        "results": results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare_results(json.load(f), report)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
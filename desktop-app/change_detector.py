@@ -0,0 +1,153 @@
+"""
+Streaming change-point detection on the analysis results.
+
+A two-sided CUSUM runs over the logarithm of every field (the alpha/beta
+ratio and each band power). Each field is standardized against a slowly
+adapting reference level, and evidence of a sustained shift accumulates
+in one statistic per direction:
+
+    low  = max(0, low  + (-z - drift) * weight)
+    high = max(0, high + ( z - drift) * weight)
+
+Successive results come from overlapping analysis windows and are far from
+independent, so each one only counts for the share of a window that is new
+(`weight`): the evidence is in standard deviations per window length, and
+the false-alarm rate does not grow with the analysis update rate.
+
+An event starts when a statistic crosses `threshold` and ends once it has
+fallen below `release * threshold`, so a shift that hovers around the
+threshold raises one event rather than a burst of them. The reference
+stops adapting to a field while it has an event, so a sustained drop is not
+absorbed into the "normal" level. State is a handful of numbers per field
+and every update costs the same, whatever the session length.
+"""
+import numpy as np
+
+from baseline import LOG_FLOOR
+
+DEFAULT_DRIFT = 1.0 # Shifts smaller than this many standard deviations are ignored
+DEFAULT_THRESHOLD = 5.0 # Accumulated evidence, in standard deviations, that raises an event
+DEFAULT_RELEASE = 0.25 # An event ends once the evidence is below this fraction of the threshold
+REFERENCE_HALFLIFE_S = 60.0 # How quickly the reference follows slow, benign drift
+WARMUP_S = 5.0 # Reference history needed before any event is raised
+MIN_STD = 0.1 # Floor on the reference spread of the log values
+EVIDENCE_CAP = 2.0 # In thresholds; bounds how long an event outlasts the shift itself
+
+DROP, RISE = -1, 1
+
+class ChangeEvent:
+    """A detected shift of one field: when it started, and ended (None while ongoing)."""
+    __slots__ = ('time', 'field', 'direction', 'end')
+
+    def __init__(self, time, field, direction):
+        self.time = time
+        self.field = field
+        self.direction = direction
+        self.end = None
+
+    def __repr__(self):
+        return f"ChangeEvent({self.time:.1f}s, {self.field!r}, {'drop' if self.direction == DROP else 'rise'})"
+
+class ChangeDetector:
+    """
+    CUSUM change detection over a fixed set of fields, one update per
+    analysis result. Detected events are appended to `events`.
+
+    Args:
+        field_names: Names of the fields passed to `update`, in order.
+        directions: Per field, DROP or RISE to watch one direction only,
+            or 0 for both (default: both for every field).
+        drift: Allowance k, in standard deviations; lower is more sensitive.
+        threshold: Decision level h, in standard deviations; lower is more sensitive.
+        release: Hysteresis, as the fraction of h an event must fall below to end.
+        window_s: Length of the analysis window each result is computed from.
+    """
+    def __init__(self, field_names, directions=None, drift=DEFAULT_DRIFT, threshold=DEFAULT_THRESHOLD,
+                 release=DEFAULT_RELEASE, window_s=1.0, halflife_s=REFERENCE_HALFLIFE_S):
+        self.field_names = tuple(field_names)
+        fields = len(self.field_names)
+        directions = np.zeros(fields) if directions is None else np.asarray(directions)
+        self._watch_drop = directions <= 0
+        self._watch_rise = directions >= 0
+        self.drift = drift
+        self.threshold = threshold
+        self.release = release
+        self.window_s = window_s
+        self.halflife_s = halflife_s
+        self.events = []
+
+        self._mean = np.zeros(fields)
+        self._variance = np.zeros(fields)
+        self._low = np.zeros(fields)
+        self._high = np.zeros(fields)
+        self.dropped = np.zeros(fields, dtype=bool) # Fields with an ongoing drop event
+        self.risen = np.zeros(fields, dtype=bool)
+        self._ongoing = {} # (field index, direction) -> ChangeEvent
+        self._count = 0
+        self._started = None
+        self._last_time = None
+
+    def reset(self):
+        self.events.clear()
+        for array in (self._mean, self._variance, self._low, self._high):
+            array.fill(0)
+        self.dropped.fill(False)
+        self.risen.fill(False)
+        self._ongoing.clear()
+        self._count = 0
+        self._started = None
+        self._last_time = None
+
+    def update(self, time, values):
+        """
+        Adds the analysis result at session `time` (seconds).
+
+        Returns:
+            The events that started with this result (usually none).
+        """
+        x = np.log(np.maximum(np.asarray(values, dtype=np.float64), LOG_FLOOR))
+        if self._started is None:
+            self._started = self._last_time = time
+        dt, self._last_time = time - self._last_time, time
+        self._count += 1
+
+        started = []
+        if time - self._started >= WARMUP_S:
+            z = (x - self._mean) / np.maximum(np.sqrt(self._variance), MIN_STD)
+            weight = min(1.0, dt / self.window_s)
+            cap = EVIDENCE_CAP * self.threshold
+            np.clip(self._low + (-z - self.drift) * weight, 0, cap, out=self._low)
+            np.clip(self._high + (z - self.drift) * weight, 0, cap, out=self._high)
+            started += self._advance(time, self._low, self._watch_drop, self.dropped, DROP)
+            started += self._advance(time, self._high, self._watch_rise, self.risen, RISE)
+
+        # Equal weights at first, so the short warm-up gives a usable spread;
+        # fields with an ongoing event keep their reference level
+        alpha = max(1 - 0.5 ** (dt / self.halflife_s), 1 / self._count) * ~(self.dropped | self.risen)
+        delta = x - self._mean
+        self._mean += alpha * delta
+        self._variance = (1 - alpha) * (self._variance + alpha * delta * delta)
+        return started
+
+    def _advance(self, time, evidence, watched, active, direction):
+        """Starts and ends the events of one direction; returns the started ones."""
+        starting = watched & ~active & (evidence > self.threshold)
+        ending = active & (evidence < self.release * self.threshold)
+        if not (starting.any() or ending.any()):
+            return []
+        for field in np.flatnonzero(ending):
+            self._ongoing.pop((field, direction)).end = time
+        started = []
+        for field in np.flatnonzero(starting):
+            event = ChangeEvent(time, self.field_names[field], direction)
+            self._ongoing[(field, direction)] = event
+            started.append(event)
+        self.events.extend(started)
+        active[starting] = True
+        active[ending] = False
+        return started
+
+    def is_active(self, field, direction):
+        """True while `field` has an ongoing event in `direction` (DROP or RISE)."""
+        index = self.field_names.index(field)
+        return bool((self.dropped if direction == DROP else self.risen)[index])
@@ -1,41 +1,100 @@
-from PyQt6.QtCore import QTimer, Qt
-from PyQt6.QtGui import QPainter
-from PyQt6.QtWidgets import QDialog  # <<< THE MISSING IMPORT IS ADDED HERE
-from PyQt6.QtPrintSupport import QPrinter, QPrintDialog
+import time
+from datetime import datetime
 
+from PyQt6.QtCore import QThreadPool, QTimer
+from PyQt6.QtWidgets import QFileDialog
+
+from instrumentation import Instrumentation
+from recording import SessionRecorder
+from render_scheduler import RenderScheduler, DEFAULT_FPS
+from report import ReportData, ReportTask
+from scheduler import SimulatedAcquisition
+from simulator import SimulatedSignal
 from view import ModeSelectionDialog
 
+ACQUISITION_POLL_MS = 20 # How often queued device samples are handed to the model
+STATS_INTERVAL_MS = 1000 # How often the live performance stats are refreshed
+
 class NeuroTrackController:
     """
     The Controller in MVC. Connects the View and the Model.
     Handles user input, application state, and timers.
     """
-    def __init__(self, model, view):
+    def __init__(self, model, view, render_fps=DEFAULT_FPS, acquisition=None,
+                 replay=None, recordings_dir=None, instrumentation=None, stream_server=None, export_edf=False):
         self._model = model
         self._view = view
+        if acquisition is None and replay is None:
+            # Simulated samples are paced by the clock on their own thread,
+            # exactly like a device, rather than one per GUI timer tick
+            acquisition = SimulatedAcquisition(SimulatedSignal(model.sample_rate, model.channel_count))
+        self._acquisition = acquisition
+        self._replay = replay
+        self._recordings_dir = recordings_dir
+        self._export_edf = export_edf
+        self._stream_server = stream_server
+        self._render_scheduler = RenderScheduler(fps=render_fps)
+        self._instrumentation = instrumentation if instrumentation is not None else Instrumentation()
+        self._instrument_pipeline()
         self._connect_signals()
+        self._view.set_trend_source(self._model.trend)
+        self._view.set_event_source(self._model.event_log)
+        self._view.set_spectrogram_source(self._model.spectrogram)
         
         # State management
         self.app_state = 'idle' # idle, calibrating, guided, monitoring, paused
         self.is_running = False
+        self._session_warning = None # Kept in the status bar until the session stops
 
         # Timers
         self.data_timer = QTimer()
-        self.data_timer.timeout.connect(self._model.update_data)
+        if self._replay is not None:
+            data_callback = self._advance_replay
+            self.data_interval = ACQUISITION_POLL_MS
+            self._view.set_connection_status(f"CONNECTION: REPLAY ({self._replay.recording.path})")
+        else:
+            data_callback = self._drain_acquisition
+            self.data_interval = ACQUISITION_POLL_MS
+            self._view.set_connection_status(f"CONNECTION: {self._acquisition.port}")
+        self.data_timer.timeout.connect(
+            self._instrumentation.timer_callback(data_callback, 'timer.data', self.data_interval))
 
         self.calibration_timer = QTimer()
         self.calibration_timer.setSingleShot(True)
         self.calibration_timer.timeout.connect(self._on_calibration_complete)
 
         self.calibration_countdown_timer = QTimer()
-        self.calibration_countdown_timer.timeout.connect(self._update_calibration_countdown)
+        self.calibration_countdown_timer.timeout.connect(
+            self._instrumentation.timer_callback(self._update_calibration_countdown, 'timer.calibrationCountdown', 1000))
+
+        if self._instrumentation.enabled:
+            self._last_stats = (time.monotonic(), 0.0, 0)
+            self.stats_timer = QTimer()
+            self.stats_timer.timeout.connect(self._update_performance_stats)
+            self.stats_timer.start(STATS_INTERVAL_MS)
+            self._view.show_performance_stats(True)
         
+    def _instrument_pipeline(self):
+        """Times each stage of the hot path. Does nothing unless instrumentation is enabled."""
+        self._instrumentation.instrument(self._model, 'append_block')
+        self._instrumentation.instrument(self._model, 'get_data_snapshot')
+        self._instrumentation.instrument(self._render_scheduler, 'submit')
+        self._instrumentation.instrument(self._view, 'update_view')
+        if self._stream_server is not None:
+            self._instrumentation.instrument(self._stream_server, 'publish')
+
     def _connect_signals(self):
         """Connect signals from the View to Controller slots."""
         self._view.new_session_button.clicked.connect(self.start_new_session)
         self._view.pause_resume_button.clicked.connect(self.toggle_pause_resume)
         self._view.print_button.clicked.connect(self.print_report)
-        self._model.data_updated.connect(self._view.update_view)
+        self._view.export_stats_button.clicked.connect(self.export_performance_stats)
+        # Model updates are coalesced to the display frame rate
+        self._model.data_updated.connect(self._render_scheduler.submit)
+        self._render_scheduler.frame_ready.connect(self._view.update_view)
+        # Remote viewers get every update; the server does its own coalescing
+        if self._stream_server is not None:
+            self._model.data_updated.connect(self._stream_server.publish)
 
     def start_new_session(self):
         """Shows the mode selection dialog and configures a new session."""
@@ -46,10 +105,16 @@ class NeuroTrackController:
             mode = dialog.selected_mode
             if mode:
                 self._model.reset()
+                self._start_recording()
                 self._view.pause_resume_button.setVisible(True)
                 self._view.print_button.setEnabled(True)
                 
                 if mode == 'immediate':
+                    if not self._model.use_population_norms():
+                        self._warn("NO POPULATION NORMS FOR THIS PATIENT, USING DEFAULT THRESHOLDS")
+                    elif self._model.norms.approximate:
+                        self._warn(f"NO POPULATION NORMS FOR AGE {self._model.patient_age:g}, "
+                                   f"USING NEAREST ({self._model.norms.description})")
                     self.app_state = 'monitoring'
                     self.start_monitoring()
                 else: # calibrating or guided
@@ -58,11 +123,16 @@ class NeuroTrackController:
                     self.start_calibration(mode, duration)
 
     def start_calibration(self, mode, duration):
-        """Starts the calibration/guided relaxation process."""
+        """
+        Starts the calibration/guided relaxation process. Data is acquired
+        and analyzed throughout, building the patient's personal baseline.
+        """
         self.calibration_duration = duration
+        self._model.start_calibration('welford' if mode == 'calibrating' else 'ewma')
         self._view.calibration_overlay.start(mode, duration)
         self.calibration_countdown_timer.start(1000)
         self.calibration_timer.start(duration * 1000)
+        self._start_data()
 
     def _update_calibration_countdown(self):
         """Updates the countdown timer on the overlay."""
@@ -74,23 +144,122 @@ class NeuroTrackController:
     def _on_calibration_complete(self):
         """Called when the calibration timer finishes."""
         self._view.calibration_overlay.stop()
+        if not self._model.finish_calibration():
+            self._warn("CALIBRATION FAILED: NO DATA, USING DEFAULT THRESHOLDS")
         self.app_state = 'monitoring'
         self.start_monitoring()
 
     def start_monitoring(self):
         """Starts the main data acquisition and plotting."""
         self.is_running = True
-        self.data_timer.start(4)
+        if not self.data_timer.isActive():
+            self._start_data()
         self._update_pause_resume_button()
 
+    def _start_data(self):
+        """Starts feeding samples to the model."""
+        self._set_acquisition_forwarding(True)
+        self._instrumentation.reset_timer_gaps()
+        self.data_timer.start(self.data_interval)
+
+    def _set_acquisition_forwarding(self, enabled):
+        """Starts or stops handing device samples to the queue, if a device is attached."""
+        if self._acquisition is None:
+            return
+        if enabled and not self._acquisition.is_alive() and self._acquisition.error is None:
+            self._acquisition.start()
+        self._acquisition.set_forwarding(enabled)
+        if not enabled:
+            self._acquisition.queue.clear()
+
+    def _drain_acquisition(self):
+        """Feeds all samples queued by the acquisition thread to the model in one block."""
+        samples = self._acquisition.queue.pop_all()
+        if samples.size:
+            self._model.append_block(samples)
+
+        stats = self._acquisition.stats()
+        if stats["error"]:
+            status = f"CONNECTION: ERROR ({stats['error']})"
+        else:
+            status = f"CONNECTION: {self._acquisition.port} | DROPPED: {stats['droppedSamples']}"
+            if "lagMs" in stats:
+                status += f" | LAG: {stats['lagMs']:.1f} ms | JITTER: {stats['jitterMs']:.1f} ms"
+        if self._session_warning:
+            status += f" | {self._session_warning}"
+        self._view.set_connection_status(status)
+
+    def _warn(self, text):
+        """Shows a warning about the session, which the connection status updates keep visible."""
+        self._session_warning = text
+        self._view.set_connection_status(text)
+
+    def _advance_replay(self):
+        """Plays the next stretch of the recording; stops the timer at its end."""
+        if not self._replay.advance():
+            self.data_timer.stop()
+            self._view.set_connection_status("CONNECTION: REPLAY FINISHED")
+
+    def _start_recording(self):
+        """Starts recording the new session to disk, unless recording is disabled."""
+        if self._recordings_dir is None or self._replay is not None:
+            return
+        self._model.recorder = SessionRecorder.create(self._recordings_dir, self._model.sample_rate,
+                                                      channels=self._model.channel_count,
+                                                      patient_id=self._model.patient_id,
+                                                      export_edf=self._export_edf)
+
+    def _stop_recording(self):
+        if self._model.recorder is not None:
+            self._model.recorder.close()
+            self._model.recorder = None
+
+    def _update_performance_stats(self):
+        """Shows the achieved sample rate, render rate and dropped ticks in the status bar."""
+        now = time.monotonic()
+        samples = self._model.session_time * self._model.sample_rate / 1000
+        frames = self._instrumentation.histogram('NeuroTrackView.update_view').count
+        last_time, last_samples, last_frames = self._last_stats
+        self._last_stats = (now, samples, frames)
+
+        elapsed = now - last_time
+        sample_rate = max(0.0, samples - last_samples) / elapsed
+        fps = (frames - last_frames) / elapsed
+        dropped = self._instrumentation.counters.get('droppedTicks', 0)
+        self._view.set_performance_stats(f"RATE: {sample_rate:.0f} Hz | FPS: {fps:.0f} | DROPPED TICKS: {dropped}")
+
+    def export_performance_stats(self):
+        """Saves the collected stage timings and counters as JSON."""
+        path, _ = QFileDialog.getSaveFileName(self._view, "Export Performance Stats",
+                                              "neurotrack_stats.json", "JSON files (*.json)")
+        if path:
+            self._instrumentation.export(path)
+
+    def shutdown(self):
+        """Stops background work before the application exits."""
+        self.stop_session()
+        if self._acquisition is not None and self._acquisition.is_alive():
+            self._acquisition.stop()
+            self._acquisition.join()
+        if self._stream_server is not None:
+            self._stream_server.stop()
+
     def stop_session(self):
         """Stops the current session completely and resets the UI."""
         self.is_running = False
         self.data_timer.stop()
+        self._set_acquisition_forwarding(False)
+        if isinstance(self._acquisition, SimulatedAcquisition):
+            self._acquisition.restart() # So a seeded simulation repeats in every session
+        if self._replay is not None:
+            self._replay.rewind() # Every session replays the recording from its start
+            self._view.set_connection_status(f"CONNECTION: REPLAY ({self._replay.recording.path})")
         self.calibration_timer.stop()
         self.calibration_countdown_timer.stop()
+        self._stop_recording()
         
         self.app_state = 'idle'
+        self._session_warning = None
         self._model.reset()
         self._view.pause_resume_button.setVisible(False)
         self._view.print_button.setEnabled(False)
@@ -105,10 +274,13 @@ class NeuroTrackController:
         self.is_running = not self.is_running
         if self.is_running:
             self.app_state = 'monitoring'
+            self._set_acquisition_forwarding(True)
+            self._instrumentation.reset_timer_gaps()
             self.data_timer.start()
         else:
             self.app_state = 'paused'
             self.data_timer.stop()
+            self._set_acquisition_forwarding(False)
         self._update_pause_resume_button()
 
     def _update_pause_resume_button(self):
@@ -116,26 +288,14 @@ class NeuroTrackController:
         self._view.update_pause_resume_button_state(self.is_running)
 
     def print_report(self):
-        """Captures the current view and sends it to a printer."""
-        printer = QPrinter(QPrinter.PrinterMode.HighResolution)
-        dialog = QPrintDialog(printer, self._view)
-        
-        # --- CORRECTED LINE ---
-        # We now correctly refer to QDialog.DialogCode.Accepted
-        if dialog.exec() == QDialog.DialogCode.Accepted:
-            painter = QPainter(printer)
-            pixmap = self._view.central_widget.grab()
-            
-            page_rect = printer.pageLayout().paintRectPixels(printer.resolution())
-
-            pixmap_scaled = pixmap.scaled(
-                page_rect.size(),
-                Qt.AspectRatioMode.KeepAspectRatio,
-                Qt.TransformationMode.SmoothTransformation
-            )
-            
-            x = (page_rect.width() - pixmap_scaled.width()) / 2
-            y = (page_rect.height() - pixmap_scaled.height()) / 2
-            
-            painter.drawPixmap(int(x), int(y), pixmap_scaled)
-            painter.end()
\ No newline at end of file
+        """Saves a vector PDF report of the session, rendered on a background thread."""
+        default_name = f"neurotrack_report_{self._model.patient_id}_{datetime.now():%Y%m%d_%H%M%S}.pdf"
+        path, _ = QFileDialog.getSaveFileName(self._view, "Save Report", default_name, "PDF files (*.pdf)")
+        if not path:
+            return
+        # Copying the data is quick; the rendering happens off the GUI thread
+        task = ReportTask(ReportData.from_model(self._model), path)
+        task.signals.finished.connect(lambda path: self._view.set_connection_status(f"REPORT SAVED: {path}"))
+        task.signals.failed.connect(lambda path, error: self._view.set_connection_status(f"REPORT FAILED: {error}"))
+        self._view.set_connection_status("GENERATING REPORT...")
+        QThreadPool.globalInstance().start(task)
@@ -0,0 +1,448 @@
+"""
+EDF and EDF+ import and export.
+
+EDF stores a recording as a fixed ASCII header followed by data records of
+equal duration. Each record holds a block of 16-bit samples for every
+signal in turn. EDF+ adds an "EDF Annotations" signal, whose bytes are
+time-stamped annotation lists (TALs).
+
+`EdfFile` memory-maps the data records, so opening a multi-gigabyte
+archive reads only the header, and `read` and `chunks` convert just the
+records they touch. `EdfWriter` appends one record at a time while a
+session runs. The record count in its header is updated after every
+record, so the file is valid at any moment during acquisition.
+
+    python edf.py review archive/*.edf          # analyze at maximum speed
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+ANNOTATION_LABEL = "EDF Annotations"
+RECORD_DURATION_S = 1 # Of written files
+ANNOTATION_BYTES = 120 # Per written record; must be even
+RECORD_TAL_BYTES = 16 # Kept free in every record for its time stamp TAL
+MAX_PENDING_ANNOTATIONS = 256 # Annotations waiting for record space; further ones are dropped
+DIGITAL_MIN, DIGITAL_MAX = -32768, 32767
+RESOLUTION_UV = 0.1 # Of written files, which thereby hold -3276.8 to 3276.7 μV
+UNIT_SCALES = {'uV': 1.0, 'µV': 1.0, 'μV': 1.0, 'mV': 1e3, 'V': 1e6, 'nV': 1e-3} # To μV
+CHUNK_RECORDS = 60 # Records converted per chunk by EdfFile.chunks
+
+# EDF+ dates spell the month in English, whatever the locale
+MONTHS = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
+# Offsets of the recording field and of the record count within the header
+_RECORDING_OFFSET = 88
+_RECORD_COUNT_OFFSET = 236
+# Recording subfield with the number of samples actually acquired, when the
+# last record is only partly filled; other readers see it as free text
+SAMPLE_COUNT_PREFIX = "samples="
+# Per-signal header fields: name, width in bytes
+_SIGNAL_FIELDS = [
+    ('label', 16), ('transducer', 80), ('dimension', 8), ('physical_min', 8), ('physical_max', 8),
+    ('digital_min', 8), ('digital_max', 8), ('prefilter', 80), ('samples_per_record', 8), ('reserved', 32),
+]
+
+class EdfSignal:
+    """The header of one signal, and where its samples sit within a data record."""
+    __slots__ = ('label', 'transducer', 'dimension', 'physical_min', 'physical_max',
+                 'digital_min', 'digital_max', 'prefilter', 'samples_per_record', 'offset')
+
+    @property
+    def is_annotation(self):
+        return self.label == ANNOTATION_LABEL
+
+    @property
+    def gain(self):
+        """Physical units per digital step."""
+        return (self.physical_max - self.physical_min) / (self.digital_max - self.digital_min)
+
+class EdfAnnotation:
+    """One EDF+ annotation; times are in seconds from the start of the file."""
+    __slots__ = ('onset', 'duration', 'text')
+
+    def __init__(self, onset, duration, text):
+        self.onset = onset
+        self.duration = duration
+        self.text = text
+
+    def __repr__(self):
+        return f"EdfAnnotation({self.onset:.3f}s, {self.text!r})"
+
+def _parse_tals(raw):
+    """Parses the bytes of one record's annotation signal into (onset, duration, texts) tuples."""
+    tals = []
+    for tal in raw.split(b'\x00'):
+        if not tal.startswith((b'+', b'-')):
+            continue
+        fields = tal.decode('utf-8', errors='replace').split('\x14')
+        onset, _, duration = fields[0].partition('\x15')
+        tals.append((float(onset), float(duration) if duration else None, [text for text in fields[1:] if text]))
+    return tals
+
+class EdfFile:
+    """
+    An EDF or EDF+ file opened for streaming reads.
+
+    The data signals are those that share the sample rate of the first
+    non-annotation signal. Signals at other rates are left out and listed
+    in `skipped`. Samples are returned in μV, as channels x samples float64
+    arrays, like the blocks `NeuroDataModel.append_block` takes.
+
+    EDF+D files (records with gaps between them) are read as if the
+    records were contiguous.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            fixed = f.read(256)
+            if len(fixed) < 256:
+                raise ValueError(f"Not an EDF file: {path}")
+            signal_count = int(fixed[252:256])
+            signal_header = f.read(256 * signal_count)
+        text = lambda start, end: fixed[start:end].decode('latin-1').strip()
+
+        self.patient = text(8, 88)
+        self.recording_info = text(88, 168)
+        self.header_bytes = int(text(184, 192))
+        reserved = text(192, 236)
+        self.plus = reserved.startswith('EDF+')
+        self.continuous = reserved != 'EDF+D'
+        self.record_duration = float(text(244, 252))
+        try:
+            self.start = datetime.strptime(text(168, 176) + text(176, 184), "%d.%m.%y%H.%M.%S")
+        except ValueError:
+            self.start = None
+
+        self.signals = self._parse_signals(signal_header, signal_count)
+        record_samples = sum(signal.samples_per_record for signal in self.signals)
+        # -1 while a writer is still recording; trust the file size over the header
+        available = (os.path.getsize(path) - self.header_bytes) // (2 * record_samples)
+        declared = int(text(236, 244))
+        self.record_count = available if declared < 0 else min(declared, available)
+        # Samples per channel, without the padding of a partly filled last record
+        self._sample_limit = None
+        for subfield in self.recording_info.split(' '):
+            if subfield.startswith(SAMPLE_COUNT_PREFIX) and subfield[len(SAMPLE_COUNT_PREFIX):].isdigit():
+                self._sample_limit = int(subfield[len(SAMPLE_COUNT_PREFIX):])
+
+        data = [signal for signal in self.signals if not signal.is_annotation]
+        if not data:
+            raise ValueError(f"No data signals in {path}")
+        self.samples_per_record = data[0].samples_per_record
+        self.data_signals = [signal for signal in data if signal.samples_per_record == self.samples_per_record]
+        self.skipped = [signal.label for signal in data if signal.samples_per_record != self.samples_per_record]
+        rate = self.samples_per_record / self.record_duration
+        self.sample_rate = int(rate) if rate == int(rate) else rate
+        self.channels = len(self.data_signals)
+        self.channel_labels = [signal.label for signal in self.data_signals]
+
+        # Per channel: physical = digital * scale + shift, in μV
+        scale = np.array([signal.gain * UNIT_SCALES.get(signal.dimension, 1.0) for signal in self.data_signals])
+        shift = np.array([(signal.physical_min - signal.digital_min * signal.gain) * UNIT_SCALES.get(signal.dimension, 1.0)
+                          for signal in self.data_signals])
+        self._scale = scale[:, np.newaxis]
+        self._shift = shift[:, np.newaxis]
+        # Index of every data sample within a record, as channels x samples_per_record
+        self._columns = np.array([np.arange(signal.offset, signal.offset + self.samples_per_record)
+                                  for signal in self.data_signals])
+        if self.record_count:
+            self._records = np.memmap(path, dtype='<i2', mode='r', offset=self.header_bytes,
+                                      shape=(self.record_count, record_samples))
+        else:
+            self._records = np.empty((0, record_samples), dtype='<i2')
+        self._annotations = None
+
+    @staticmethod
+    def _parse_signals(header, count):
+        signals = [EdfSignal() for _ in range(count)]
+        position = 0
+        for name, width in _SIGNAL_FIELDS:
+            for signal in signals:
+                value = header[position:position + width].decode('latin-1').strip()
+                position += width
+                if name == 'reserved':
+                    continue
+                if name in ('physical_min', 'physical_max', 'digital_min', 'digital_max'):
+                    value = float(value)
+                elif name == 'samples_per_record':
+                    value = int(value)
+                setattr(signal, name, value)
+        offset = 0
+        for signal in signals:
+            signal.offset = offset
+            offset += signal.samples_per_record
+        return signals
+
+    @property
+    def sample_count(self):
+        """Samples per channel, excluding any padding of the last record."""
+        count = self.record_count * self.samples_per_record
+        return count if self._sample_limit is None else min(count, self._sample_limit)
+
+    @property
+    def duration(self):
+        """Length of the recording in seconds."""
+        return self.sample_count / self.samples_per_record * self.record_duration
+
+    @property
+    def patient_id(self):
+        """The EDF+ patient code, or the whole patient field of a plain EDF file."""
+        if self.plus:
+            code = self.patient.split(' ')[0]
+            return "" if code == 'X' else code
+        return self.patient
+
+    def read(self, start, count):
+        """Returns samples [start, start + count) of every data channel, in μV."""
+        start = max(0, start)
+        end = min(start + count, self.sample_count)
+        if end <= start:
+            return np.empty((self.channels, 0))
+        first, last = start // self.samples_per_record, -(-end // self.samples_per_record)
+        # Only the records in range are paged in
+        records = self._records[first:last][:, self._columns] # Records x channels x samples
+        samples = records.transpose(1, 0, 2).reshape(self.channels, -1)
+        skip = start - first * self.samples_per_record
+        return samples[:, skip:skip + end - start] * self._scale + self._shift
+
+    def chunks(self, chunk_records=CHUNK_RECORDS):
+        """Yields the whole recording as consecutive channels x samples blocks."""
+        chunk = chunk_records * self.samples_per_record
+        for start in range(0, self.sample_count, chunk):
+            yield self.read(start, chunk)
+
+    @property
+    def annotations(self):
+        """The EDF+ annotations (not the per-record time stamps), parsed on first access."""
+        if self._annotations is None:
+            self._annotations = []
+            for signal in self.signals:
+                if not signal.is_annotation:
+                    continue
+                raw = self._records[:, signal.offset:signal.offset + signal.samples_per_record]
+                for record in raw:
+                    for onset, duration, texts in _parse_tals(record.tobytes()):
+                        self._annotations += [EdfAnnotation(onset, duration, text) for text in texts]
+            self._annotations.sort(key=lambda annotation: annotation.onset)
+        return self._annotations
+
+def _format_number(value, width=8):
+    """Formats a header number to fit its field, dropping decimals as needed."""
+    text = f"{value:.{width}f}".rstrip('0').rstrip('.')
+    if len(text) > width:
+        text = text[:width].rstrip('.')
+    return text
+
+def _format_onset(seconds):
+    return "+" + (f"{seconds:.4f}".rstrip('0').rstrip('.') or "0")
+
+class EdfWriter:
+    """
+    Writes an EDF+C file incrementally, one data record at a time.
+
+    Has the same `append(samples, data)` interface as
+    `recording.SessionRecorder`. Changes of cognitive state and the start
+    and end of acute events in the snapshots are written as annotations.
+    Samples are clipped to the range RESOLUTION_UV allows. EDF records are
+    all the same size, so `close` pads a partly filled last record (and
+    writes further padded records if annotations are left over), and
+    records the number of samples actually acquired in the header's
+    recording field. `EdfFile` reads back exactly those samples.
+
+    Args:
+        path: The .edf file to create.
+        labels: Channel labels (default: "EEG Ch1", ...).
+    """
+    def __init__(self, path, sample_rate, channels=1, patient_id="", labels=None, start=None):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.labels = labels or [f"EEG Ch{i + 1}" for i in range(channels)]
+        self.start = start or datetime.now()
+        self.samples_per_record = int(round(sample_rate * RECORD_DURATION_S))
+        self.records_written = 0
+        self.samples_written = 0
+
+        self._record = np.zeros((channels, self.samples_per_record), dtype='<i2')
+        self._buffered = 0
+        self._pending_annotations = [] # Encoded TALs not written yet
+        self.dropped_annotations = 0
+        self._state = None
+        self._acute = False
+
+        self._file = open(path, 'wb')
+        self._recording = f"Startdate {self.start.day:02d}-{MONTHS[self.start.month - 1]}-{self.start.year} X X NeuroTrack"
+        self._file.write(self._header(patient_id))
+        self._file.flush()
+
+    def _header(self, patient_id):
+        signals = [(label, "AgAgCl electrode", "uV", DIGITAL_MIN * RESOLUTION_UV, DIGITAL_MAX * RESOLUTION_UV,
+                    DIGITAL_MIN, DIGITAL_MAX, "", self.samples_per_record) for label in self.labels]
+        signals.append((ANNOTATION_LABEL, "", "", -1, 1, DIGITAL_MIN, DIGITAL_MAX, "", ANNOTATION_BYTES // 2))
+        patient = patient_id.replace(' ', '_') or 'X'
+        fields = [
+            ("0", 8),
+            (f"{patient} X X X", 80),
+            (self._recording, 80),
+            (f"{self.start:%d.%m.%y}", 8),
+            (f"{self.start:%H.%M.%S}", 8),
+            (str(256 * (len(signals) + 1)), 8),
+            ("EDF+C", 44),
+            ("-1", 8), # Record count, filled in as records are written
+            (_format_number(RECORD_DURATION_S), 8),
+            (str(len(signals)), 4),
+        ]
+        for index, (_, width) in enumerate(_SIGNAL_FIELDS):
+            for signal in signals:
+                value = signal[index] if index < len(signal) else ""
+                fields.append((_format_number(value) if isinstance(value, (int, float)) else value, width))
+        return b"".join(value.encode('latin-1', errors='replace')[:width].ljust(width) for value, width in fields)
+
+    def annotate(self, onset, text, duration=None):
+        """
+        Adds an annotation at `onset` seconds from the start of the file.
+        Text too long for one record's annotation space is truncated. While
+        MAX_PENDING_ANNOTATIONS wait for space, further ones are dropped
+        and counted in `dropped_annotations`.
+        """
+        tal = _format_onset(onset)
+        if duration is not None:
+            tal += "\x15" + _format_onset(duration)[1:]
+        tal = (tal + "\x14").encode('utf-8')
+        room = ANNOTATION_BYTES - RECORD_TAL_BYTES - len(tal) - 2 # Less the closing "\x14\x00"
+        if room < 0:
+            raise ValueError(f"Annotation onset {onset} and duration {duration} do not fit into a record")
+        if len(self._pending_annotations) >= MAX_PENDING_ANNOTATIONS:
+            self.dropped_annotations += 1
+            return
+        # Cut on a character boundary
+        text = text.encode('utf-8')[:room].decode('utf-8', errors='ignore').encode('utf-8')
+        self._pending_annotations.append(tal + text + b"\x14\x00")
+
+    def append(self, samples, data=None):
+        """
+        Adds a channels x samples block, annotating what changed in the
+        model snapshot `data` (if given) at the end of the block.
+        """
+        samples = np.asarray(samples, dtype=np.float64).reshape(self.channels, -1)
+        digital = np.clip(np.round(samples / RESOLUTION_UV), DIGITAL_MIN, DIGITAL_MAX).astype('<i2')
+        while digital.shape[1]:
+            take = min(digital.shape[1], self.samples_per_record - self._buffered)
+            self._record[:, self._buffered:self._buffered + take] = digital[:, :take]
+            self._buffered += take
+            digital = digital[:, take:]
+            if self._buffered == self.samples_per_record:
+                self._write_record()
+        self.samples_written += samples.shape[1]
+
+        if data is not None:
+            onset = self.samples_written / self.sample_rate
+            if data.cognitive_state != self._state and data.cognitive_state != "ACUTE EVENT DETECTED":
+                self._state = data.cognitive_state
+                self.annotate(onset, f"State: {data.cognitive_state}")
+            if data.acute_event != self._acute:
+                self._acute = data.acute_event
+                self.annotate(onset, "Acute event" if data.acute_event else "Acute event end")
+
+    def _write_record(self):
+        # The first TAL of every record time-stamps the record itself
+        annotations = bytearray((_format_onset(self.records_written * RECORD_DURATION_S) + "\x14\x14\x00").encode('ascii'))
+        while self._pending_annotations and len(annotations) + len(self._pending_annotations[0]) <= ANNOTATION_BYTES:
+            annotations += self._pending_annotations.pop(0) # Whatever does not fit goes into the next record
+        annotations += bytes(ANNOTATION_BYTES - len(annotations))
+
+        self._file.write(self._record.tobytes())
+        self._file.write(annotations)
+        self._buffered = 0
+        self.records_written += 1
+        # Keep the header consistent, so the file can be read while it grows
+        self._file.seek(_RECORD_COUNT_OFFSET)
+        self._file.write(str(self.records_written).ljust(8).encode('ascii'))
+        self._file.seek(0, os.SEEK_END)
+        self._file.flush()
+
+    def close(self):
+        """Writes the last record and any annotations still pending, and finalizes the header."""
+        if self._file.closed:
+            return
+        if self._buffered or self._pending_annotations:
+            # Padding holds each channel's last value, so other readers see no step
+            if self._buffered:
+                self._record[:, self._buffered:] = self._record[:, self._buffered - 1:self._buffered]
+                self._write_record()
+            while self._pending_annotations:
+                self._record[:] = self._record[:, -1:]
+                self._write_record()
+            self._file.seek(_RECORDING_OFFSET)
+            recording = f"{self._recording} {SAMPLE_COUNT_PREFIX}{self.samples_written}"
+            self._file.write(recording.encode('ascii').ljust(80))
+        self._file.close()
+
+def review(path, model_factory=None, progress=None):
+    """
+    Plays an EDF file through the analysis path of a fresh NeuroDataModel
+    as fast as possible, one analysis update at a time.
+
+    Args:
+        model_factory: Called with (channel_count, sample_rate) to create
+            the model (default: NeuroDataModel with default settings).
+        progress: Optional callback, called with the fraction done after
+            every chunk.
+
+    Returns:
+        The model after the last sample, with its trend, state log and
+        event log filled in.
+    """
+    edf = EdfFile(path)
+    if model_factory is None:
+        from model import NeuroDataModel
+        model_factory = lambda channels, rate: NeuroDataModel(channel_count=channels, sample_rate=rate)
+    model = model_factory(edf.channels, edf.sample_rate)
+    hop = model.analysis_hop
+    for index, chunk in enumerate(edf.chunks()):
+        for start in range(0, chunk.shape[1], hop):
+            model.append_block(chunk[:, start:start + hop])
+        if progress is not None:
+            progress(min(1.0, (index + 1) * CHUNK_RECORDS / max(edf.record_count, 1)))
+    return model
+
+def summarize(path, model, elapsed):
+    """The outcome of `review` as a JSON-serializable dictionary."""
+    return {
+        "file": path,
+        "durationS": model.session_time / 1000,
+        "channels": model.channel_count,
+        "sampleRate": model.sample_rate,
+        "reviewS": elapsed,
+        "acuteEvents": [round(event.time, 1) for event in model.event_log
+                        if event.field == "Alpha/Beta Ratio" and event.direction < 0],
+        "changeEvents": len(model.event_log),
+        "stateSeconds": model.state_durations(),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="NeuroTrack EDF/EDF+ tools")
+    commands = parser.add_subparsers(dest='command', required=True)
+    review_parser = commands.add_parser('review', help="Analyze EDF files at maximum speed and print a JSON summary per file")
+    review_parser.add_argument('files', nargs='+', help="EDF or EDF+ files")
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for path in args.files:
+        started = time.perf_counter()
+        try:
+            model = review(path)
+        except (OSError, ValueError) as e:
+            print(f"Error: {path}: {e}", file=sys.stderr)
+            failed += 1
+            continue
+        print(json.dumps(summarize(path, model, time.perf_counter() - started)))
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
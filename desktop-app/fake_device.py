@@ -0,0 +1,75 @@
+import os
+import pty
+import threading
+import time
+import tty
+
+import numpy as np
+
+from protocol import FRAME_SAMPLES, encode_frames
+
+class FakePicoDevice:
+    """
+    Emulates the Pico firmware on a pseudo-terminal (POSIX only).
+
+    Open `device.port` exactly like the real USB serial port. The fake
+    device writes binary frames (or legacy "EEG reading: %d" lines) in
+    bursts at the given sample rate, so the acquisition path can be
+    exercised without hardware.
+    """
+    def __init__(self, sample_rate=250, burst=FRAME_SAMPLES, protocol='binary', seed=None):
+        if protocol == 'binary' and burst % FRAME_SAMPLES:
+            raise ValueError(f"burst must be a multiple of {FRAME_SAMPLES} for binary frames")
+        self.sample_rate = sample_rate
+        self.burst = burst
+        self.protocol = protocol
+        self._seq = 0
+        self.samples_written = 0
+        self._rng = np.random.default_rng(seed)
+
+        self._master_fd, self._slave_fd = pty.openpty()
+        tty.setraw(self._slave_fd) # No echo or newline translation
+        self.port = os.ttyname(self._slave_fd)
+
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="FakePicoDevice", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+        os.close(self._master_fd)
+        os.close(self._slave_fd)
+
+    def write_lines(self, payload):
+        """Writes raw bytes to the port, e.g. to inject malformed data."""
+        os.write(self._master_fd, payload)
+
+    def _run(self):
+        period = self.burst / self.sample_rate
+        next_wake = time.monotonic()
+        while not self._stop_event.is_set():
+            t = (self.samples_written + np.arange(self.burst)) / self.sample_rate
+            signal = 20 * np.sin(2 * np.pi * 10 * t) + 8 * np.sin(2 * np.pi * 22 * t)
+            counts = np.clip(2048 + signal + self._rng.normal(0, 3, self.burst), 0, 4095).astype(int)
+            if self.protocol == 'binary':
+                self.write_lines(encode_frames(counts - 2048, start_seq=self._seq))
+                self._seq = (self._seq + self.burst // FRAME_SAMPLES) % 65536
+            else:
+                self.write_lines(b''.join(b'EEG reading: %d\n' % c for c in counts))
+            self.samples_written += self.burst
+
+            next_wake += period
+            self._stop_event.wait(max(0.0, next_wake - time.monotonic()))
+
+if __name__ == '__main__':
+    device = FakePicoDevice().start()
+    print(f"Fake Pico streaming binary frames on {device.port} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        device.stop()
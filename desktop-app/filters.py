@@ -0,0 +1,200 @@
+"""
+Streaming pre-processing of raw EEG: an IIR filter chain and artifact flags.
+
+The filters are second-order sections (biquads) designed here with the
+bilinear transform, and run with NumPy only: importing scipy.signal alone
+would take longer than the whole dashboard needs to show its window. Each
+section keeps its state between blocks, so filtering a signal block by
+block gives the same result as filtering it in one go.
+"""
+import numpy as np
+
+DEFAULT_HIGHPASS_HZ = 0.5
+DEFAULT_NOTCH_HZ = 50 # Mains frequency; 60 in the Americas
+NOTCH_Q = 30.0
+BUTTERWORTH_ORDER = 4 # Per filter edge, as order / 2 sections
+BLOCK_CHUNK = 64 # Longest stretch filtered with one matrix product per section
+
+# Artifact thresholds, in μV
+BLINK_THRESHOLD = 100.0 # Eye blinks are large, slow frontal deflections
+CLIPPING_LEVEL = 2000.0 # Near the end of the ADC range (±2048 counts at 1 μV/count)
+ARTIFACT_HOLD_S = 0.5 # How long a flag stays raised after the artifact ends
+
+def _butterworth_sections(kind, cutoff, sample_rate, order=BUTTERWORTH_ORDER):
+    """Low- or high-pass Butterworth filter of even `order` as biquad rows [b0 b1 b2 1 a1 a2]."""
+    w0 = 2 * np.pi * cutoff / sample_rate
+    cos_w0, sin_w0 = np.cos(w0), np.sin(w0)
+    sections = []
+    for k in range(order // 2):
+        q = 1 / (2 * np.cos(np.pi * (2 * k + 1) / (2 * order)))
+        alpha = sin_w0 / (2 * q)
+        if kind == 'lowpass':
+            b = [(1 - cos_w0) / 2, 1 - cos_w0, (1 - cos_w0) / 2]
+        else:
+            b = [(1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2]
+        a = [1 + alpha, -2 * cos_w0, 1 - alpha]
+        sections.append(np.array(b + a) / a[0])
+    return sections
+
+def _notch_section(frequency, sample_rate, q=NOTCH_Q):
+    w0 = 2 * np.pi * frequency / sample_rate
+    alpha = np.sin(w0) / (2 * q)
+    b = [1, -2 * np.cos(w0), 1]
+    a = [1 + alpha, -2 * np.cos(w0), 1 - alpha]
+    return np.array(b + a) / a[0]
+
+def design_chain(sample_rate, highpass=DEFAULT_HIGHPASS_HZ, notch=DEFAULT_NOTCH_HZ, bandpass=None):
+    """
+    Returns the sections x 6 SOS matrix of the chain. Any stage can be
+    disabled with None; stages at or above the Nyquist frequency are left out.
+    """
+    nyquist = sample_rate / 2
+    sections = []
+    if highpass:
+        sections += _butterworth_sections('highpass', highpass, sample_rate)
+    if notch and notch < nyquist:
+        sections.append(_notch_section(notch, sample_rate))
+    if bandpass:
+        low, high = bandpass
+        sections += _butterworth_sections('highpass', low, sample_rate)
+        if high < nyquist:
+            sections += _butterworth_sections('lowpass', high, sample_rate)
+    return np.array(sections).reshape(-1, 6)
+
+class FilterChain:
+    """
+    Filters channels x samples blocks through a fixed SOS chain.
+
+    State is initialized from the first block as if its first sample had
+    been constant forever, so a DC offset does not ring through the
+    high-pass at startup.
+    """
+    def __init__(self, sample_rate, channels=1, highpass=DEFAULT_HIGHPASS_HZ, notch=DEFAULT_NOTCH_HZ, bandpass=None):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sos = design_chain(sample_rate, highpass, notch, bandpass)
+        self._recursion = [self._recursion_matrices(a1, a2) for a1, a2 in self.sos[:, 4:]]
+        # Per section and channel: the two previous values of the direct form II delay line
+        self._state = np.zeros((len(self.sos), channels, 2))
+        self._initialized = False
+
+    @staticmethod
+    def _recursion_matrices(a1, a2):
+        """
+        Impulse response of 1/A(z) as a BLOCK_CHUNK x BLOCK_CHUNK matrix
+        (so that block @ matrix runs the recursion), and the responses to
+        a unit w[-1] and a unit w[-2].
+        """
+        def recurse(first, second):
+            out = np.empty(BLOCK_CHUNK + 2)
+            out[0], out[1] = first, second
+            for n in range(2, BLOCK_CHUNK + 2):
+                out[n] = -a1 * out[n - 1] - a2 * out[n - 2]
+            return out[2:]
+
+        impulse = np.concatenate(([1.0], recurse(0.0, 1.0)[:-1]))
+        index = np.arange(BLOCK_CHUNK)
+        lag = index[np.newaxis, :] - index[:, np.newaxis] # Output n minus input k
+        response = np.where(lag >= 0, impulse[np.clip(lag, 0, None)], 0.0)
+        return response, recurse(0.0, 1.0), recurse(1.0, 0.0)
+
+    def reset(self):
+        self._state.fill(0)
+        self._initialized = False
+
+    def process(self, samples):
+        """Filters a channels x samples block and returns the filtered copy."""
+        samples = np.asarray(samples, dtype=np.float64)
+        if len(self.sos) == 0 or samples.shape[1] == 0:
+            return samples.copy()
+        if not self._initialized:
+            self._init_state(samples[:, 0])
+
+        filtered = samples
+        for start in range(0, samples.shape[1], BLOCK_CHUNK):
+            filtered_chunk = samples[:, start:start + BLOCK_CHUNK]
+            for section in range(len(self.sos)):
+                filtered_chunk = self._run_section(section, filtered_chunk)
+            if start == 0 and samples.shape[1] <= BLOCK_CHUNK:
+                return filtered_chunk
+            if start == 0:
+                filtered = np.empty_like(samples)
+            filtered[:, start:start + BLOCK_CHUNK] = filtered_chunk
+        return filtered
+
+    def _run_section(self, section, x):
+        """
+        One biquad over a block of at most BLOCK_CHUNK samples, without a
+        per-sample loop: the recursion w[n] = x[n] - a1 w[n-1] - a2 w[n-2]
+        is the block times a triangular matrix of the impulse response of
+        1/A(z), plus the decay of the two carried-over values.
+        """
+        count = x.shape[1]
+        response, from_last, from_second_last = self._recursion[section]
+        history = self._state[section] # Channels x [w[-2], w[-1]]
+        w = np.empty((self.channels, count + 2))
+        w[:, :2] = history
+        np.matmul(x, response[:count, :count], out=w[:, 2:])
+        w[:, 2:] += history[:, 1:] * from_last[:count] + history[:, :1] * from_second_last[:count]
+        self._state[section] = w[:, -2:]
+        b = self.sos[section]
+        return b[0] * w[:, 2:] + b[1] * w[:, 1:-1] + b[2] * w[:, :-2]
+
+    def _init_state(self, first):
+        self._initialized = True
+        level = first.copy()
+        for section, (b0, b1, b2, _, a1, a2) in enumerate(self.sos):
+            w = level / (1 + a1 + a2) # Steady state for a constant input
+            self._state[section] = w[:, np.newaxis]
+            level = (b0 + b1 + b2) * w
+
+class ArtifactDetector:
+    """
+    Flags eye blinks and clipping per channel with block-wide thresholds.
+    A flag stays up for ARTIFACT_HOLD_S after the last offending sample.
+    """
+    def __init__(self, sample_rate, channels=1, blink_threshold=BLINK_THRESHOLD, clipping_level=CLIPPING_LEVEL):
+        self.blink_threshold = blink_threshold
+        self.clipping_level = clipping_level
+        self._hold = int(ARTIFACT_HOLD_S * sample_rate)
+        self._position = 0
+        # Sample position each channel last showed the artifact
+        self._last_blink = np.full(channels, -self._hold - 1)
+        self._last_clip = np.full(channels, -self._hold - 1)
+        self.blink = np.zeros(channels, dtype=bool)
+        self.clipping = np.zeros(channels, dtype=bool)
+
+    def reset(self):
+        self._position = 0
+        self._last_blink.fill(-self._hold - 1)
+        self._last_clip.fill(-self._hold - 1)
+        self.blink.fill(False)
+        self.clipping.fill(False)
+
+    def update(self, raw, filtered):
+        """
+        Args:
+            raw: The channels x samples block as acquired (clipping shows there).
+            filtered: The same block after the filter chain (blinks show there,
+                without the DC offset).
+        """
+        self._position += raw.shape[1]
+        clipped = (np.abs(raw) >= self.clipping_level).any(axis=1)
+        blinked = (np.abs(filtered) >= self.blink_threshold).any(axis=1)
+        self._last_clip[clipped] = self._position
+        self._last_blink[blinked] = self._position
+        np.less_equal(self._position - self._last_clip, self._hold, out=self.clipping)
+        np.less_equal(self._position - self._last_blink, self._hold, out=self.blink)
+
+    @property
+    def last_artifact(self):
+        """
+        Sample index one past the end of the newest block with an artifact
+        on any channel (negative if there was none).
+        """
+        return int(max(self._last_blink.max(), self._last_clip.max()))
+
+    @property
+    def active(self):
+        """Names of the artifacts currently flagged on any channel."""
+        return tuple(name for name, flags in (("Blink", self.blink), ("Clipping", self.clipping)) if flags.any())
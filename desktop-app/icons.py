@@ -1,9 +1,15 @@
 import sys
 import os
+import hashlib
 from PyQt6.QtGui import QIcon, QPixmap, QPainter
-from PyQt6.QtSvg import QSvgRenderer
 from PyQt6.QtCore import Qt, QSize
 
+# Rendered icons, keyed by (icon_key, color, size). Each combination is
+# rendered from its SVG only once per process, and once per install when
+# the on-disk cache is writable.
+_icon_cache = {}
+ICON_CACHE_ENV = "NEUROTRACK_ICON_CACHE"
+
 def resource_path(relative_path):
     """ Get absolute path to resource, works for dev and for PyInstaller """
     try:
@@ -14,19 +20,48 @@ def resource_path(relative_path):
 
     return os.path.join(base_path, relative_path)
 
-def create_icon_from_svg(icon_key: str, color: str) -> QIcon:
+def icon_cache_dir():
+    """
+    Where rendered icons are persisted: beside the executable for PyInstaller
+    builds (the onefile temp folder is gone after exit), otherwise in the
+    user's cache directory. NEUROTRACK_ICON_CACHE overrides both.
+    """
+    if os.environ.get(ICON_CACHE_ENV):
+        return os.environ[ICON_CACHE_ENV]
+    if getattr(sys, 'frozen', False):
+        return os.path.join(os.path.dirname(sys.executable), "icon_cache")
+    return os.path.join(os.path.expanduser("~"), ".cache", "NeuroTrack", "icons")
+
+def _render_svg(svg_colored, size):
+    from PyQt6.QtSvg import QSvgRenderer # Only needed on a cache miss
+
+    renderer = QSvgRenderer(svg_colored.encode('utf-8'))
+    pixmap = QPixmap(size or renderer.defaultSize())
+    pixmap.fill(Qt.GlobalColor.transparent)
+
+    painter = QPainter(pixmap)
+    renderer.render(painter)
+    painter.end()
+    return pixmap
+
+def create_icon_from_svg(icon_key: str, color: str, size: int = None) -> QIcon:
     """
     Creates a QIcon from an SVG file, with a specified color.
-    
+
     Args:
         icon_key: The base name of the SVG file (e.g., "printer").
         color: The hex color code for the icon.
-        
+        size: Edge length in pixels to render at (default: the SVG's own size).
+
     Returns:
         A QIcon object.
     """
+    key = (icon_key, color, size)
+    if key in _icon_cache:
+        return _icon_cache[key]
+
     icon_path = resource_path(f'assets/icons/{icon_key}.svg')
-    
+
     try:
         with open(icon_path, 'r', encoding='utf-8') as f:
             svg_string = f.read()
@@ -35,14 +70,20 @@ def create_icon_from_svg(icon_key: str, color: str) -> QIcon:
         return QIcon() # Return an empty icon
 
     svg_colored = svg_string.replace('stroke="currentColor"', f'stroke="{color}"')
-    
-    renderer = QSvgRenderer(svg_colored.encode('utf-8'))
-    pixmap = QPixmap(renderer.defaultSize())
-    pixmap.fill(Qt.GlobalColor.transparent)
-    
-    painter = QPainter(pixmap)
-    renderer.render(painter)
-    painter.end()
-    
-    return QIcon(pixmap)
 
+    # Named by content, so an edited SVG never picks up a stale rendering
+    digest = hashlib.sha1(f"{svg_colored}|{size}".encode('utf-8')).hexdigest()[:16]
+    cached_path = os.path.join(icon_cache_dir(), f"{icon_key}-{digest}.png")
+    pixmap = QPixmap(cached_path) if os.path.exists(cached_path) else QPixmap()
+    if pixmap.isNull():
+        pixmap = _render_svg(svg_colored, QSize(size, size) if size else None)
+        try:
+            os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+            pixmap.save(cached_path + ".tmp", "PNG")
+            os.replace(cached_path + ".tmp", cached_path)
+        except OSError:
+            pass # A read-only install just renders on every start
+
+    icon = QIcon(pixmap)
+    _icon_cache[key] = icon
+    return icon
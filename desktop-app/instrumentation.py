@@ -0,0 +1,132 @@
+import json
+import time
+from datetime import datetime
+
+# Bucket i counts durations below 2**i microseconds (and at least 2**(i-1));
+# the last bucket also holds everything slower.
+BUCKET_COUNT = 24
+
+class LatencyHistogram:
+    """Fixed-bucket, power-of-two latency histogram with O(1) recording."""
+    def __init__(self):
+        self.buckets = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record(self, duration_ns):
+        self.buckets[min((duration_ns // 1000).bit_length(), BUCKET_COUNT - 1)] += 1
+        self.count += 1
+        self.total_ns += duration_ns
+        if duration_ns > self.max_ns:
+            self.max_ns = duration_ns
+
+    def percentile(self, q):
+        """Upper bound, in microseconds, of the bucket holding the q-th percentile."""
+        if self.count == 0:
+            return 0.0
+        target = q / 100 * self.count
+        cumulative = 0
+        for bucket, bucket_count in enumerate(self.buckets):
+            cumulative += bucket_count
+            if cumulative >= target:
+                return float(2 ** bucket)
+        return float(2 ** (BUCKET_COUNT - 1))
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "meanUs": self.total_ns / self.count / 1000 if self.count else 0.0,
+            "maxUs": self.max_ns / 1000,
+            "p50Us": self.percentile(50),
+            "p99Us": self.percentile(99),
+            "buckets": list(self.buckets),
+        }
+
+class Instrumentation:
+    """
+    Per-stage timing of the hot path.
+
+    Methods are instrumented by replacing them on the instance with a timed
+    wrapper, so when instrumentation is disabled nothing is wrapped and the
+    hot path runs exactly as before. Enable it before the signal
+    connections are made, since existing connections keep the original
+    methods.
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.histograms = {}
+        self.counters = {}
+        self._last_ticks = {}
+        self._started = time.monotonic()
+
+    def histogram(self, stage):
+        if stage not in self.histograms:
+            self.histograms[stage] = LatencyHistogram()
+        return self.histograms[stage]
+
+    def instrument(self, obj, method_name, stage=None):
+        """Times every call of `obj.method_name` under `stage` (default Class.method)."""
+        if not self.enabled:
+            return
+        method = getattr(obj, method_name)
+        histogram = self.histogram(stage or f"{type(obj).__name__}.{method_name}")
+        clock = time.perf_counter_ns
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                histogram.record(clock() - start)
+
+        setattr(obj, method_name, timed)
+
+    def timer_callback(self, callback, stage, interval_ms):
+        """
+        Wraps a QTimer callback. Besides timing it, every gap between two
+        ticks that spans one or more whole extra intervals is counted as
+        dropped ticks. Returns `callback` unchanged when disabled.
+        """
+        if not self.enabled:
+            return callback
+        histogram = self.histogram(stage)
+        interval_ns = interval_ms * 1_000_000
+        clock = time.perf_counter_ns
+        last_ticks = self._last_ticks
+
+        def timed(*args):
+            start = clock()
+            last_tick = last_ticks.get(stage)
+            if last_tick is not None:
+                missed = (start - last_tick) // interval_ns - 1
+                if missed > 0:
+                    self.increment("droppedTicks", missed)
+            last_ticks[stage] = start
+            try:
+                return callback(*args)
+            finally:
+                histogram.record(clock() - start)
+
+        return timed
+
+    def reset_timer_gaps(self):
+        """Forgets tick history, e.g. after a pause, so the gap is not counted as dropped."""
+        self._last_ticks.clear()
+
+    def increment(self, counter, amount=1):
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def snapshot(self):
+        """Returns all histograms and counters as a JSON-friendly dictionary."""
+        return {
+            "timestamp": datetime.now().isoformat(timespec='seconds'),
+            "uptimeS": time.monotonic() - self._started,
+            "stages": {stage: histogram.to_dict() for stage, histogram in self.histograms.items()},
+            "counters": dict(self.counters),
+        }
+
+    def export(self, path):
+        """Writes the current snapshot to a JSON file."""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2)
@@ -1,24 +1,155 @@
+import time
+_STARTED = time.perf_counter() # Reference point of the startup benchmark
+
+import argparse
 import sys
 from PyQt6.QtWidgets import QApplication
 
 from view import NeuroTrackView
 from model import NeuroDataModel
 from controller import NeuroTrackController
+from recording import DEFAULT_RECORDINGS_DIR, ReplaySource, open_recording
+from instrumentation import Instrumentation
+from icons import resource_path
+from norms import DEFAULT_NORMS_PATH, load_norm_table
+from filters import DEFAULT_HIGHPASS_HZ, DEFAULT_NOTCH_HZ
+from change_detector import DEFAULT_RELEASE, DEFAULT_THRESHOLD
+from waveform_lod import DEFAULT_HISTORY_S
+from scheduler import SimulatedAcquisition
+from simulator import SCENARIOS, SimulatedSignal
+_IMPORTED = time.perf_counter()
+
+def parse_args(argv):
+    """Parses NeuroTrack's own options, leaving Qt's arguments untouched."""
+    parser = argparse.ArgumentParser(description="NeuroTrack EEG dashboard")
+    parser.add_argument('--port', help="Serial port of the Pico (e.g. COM3 or /dev/ttyACM0). Simulates data if omitted.")
+    parser.add_argument('--baud', type=int, default=115200, help="Serial baud rate")
+    parser.add_argument('--protocol', choices=['binary', 'text'], default='binary',
+                        help="Stream format sent by the firmware ('text' for older firmware)")
+    parser.add_argument('--channels', type=int, default=1, help="Number of simulated EEG channels")
+    parser.add_argument('--record-dir', default=DEFAULT_RECORDINGS_DIR,
+                        help="Where sessions are recorded (default: %(default)s)")
+    parser.add_argument('--no-record', action='store_true', help="Do not record sessions to disk")
+    parser.add_argument('--export-edf', action='store_true',
+                        help="Also write each recorded session as EDF+ (session.edf in its recording directory)")
+    parser.add_argument('--replay', metavar='RECORDING',
+                        help="Replay a recorded session (a recording directory or an EDF/EDF+ file) instead of live data")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="Replay or simulation speed, e.g. 1 for real time or 10; 0 runs as fast as possible")
+    parser.add_argument('--scenario', choices=list(SCENARIOS), default='default',
+                        help="Scripted session to simulate (see python simulator.py --list)")
+    parser.add_argument('--seed', type=int, help="Seed of the simulated data, for a reproducible session")
+    parser.add_argument('--age', type=float, help="Patient age in years, for population norms")
+    parser.add_argument('--sex', choices=['F', 'M'], help="Patient sex, for population norms")
+    parser.add_argument('--montage', help="Electrode montage name in the norm table (default: by channel count)")
+    parser.add_argument('--norms', default=None, help="Population norm table used in Immediate mode (default: bundled table)")
+    parser.add_argument('--highpass', type=float, default=DEFAULT_HIGHPASS_HZ,
+                        help="High-pass cutoff in Hz, 0 to disable (default: %(default)s)")
+    parser.add_argument('--notch', type=int, choices=[0, 50, 60], default=DEFAULT_NOTCH_HZ,
+                        help="Mains notch frequency in Hz, 0 to disable (default: %(default)s)")
+    parser.add_argument('--bandpass', type=float, nargs=2, metavar=('LOW', 'HIGH'),
+                        help="Additional band-pass filter in Hz")
+    parser.add_argument('--event-threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Evidence in standard deviations that raises an acute event; lower is more sensitive (default: %(default)s)")
+    parser.add_argument('--event-release', type=float, default=DEFAULT_RELEASE,
+                        help="Fraction of the threshold the evidence must fall below to end an event (default: %(default)s)")
+    parser.add_argument('--waveform-history', type=float, default=DEFAULT_HISTORY_S, metavar='SECONDS',
+                        help="How far back the EEG chart can be scrolled and zoomed out (default: %(default)s)")
+    # streaming.py (and asyncio) is only imported when used, to keep startup fast
+    parser.add_argument('--serve', nargs='?', const='', metavar='[HOST:]PORT',
+                        help="Stream the session to remote viewers (default: 127.0.0.1:8765)")
+    parser.add_argument('--beds', type=int, help="Watch this many beds at once in the ward overview")
+    parser.add_argument('--bed-ports', nargs='+', default=[], metavar='PORT',
+                        help="Serial ports of the first beds; the remaining beds are simulated")
+    parser.add_argument('--workers', type=int, help="Analysis worker processes for --beds (default: one per core)")
+    parser.add_argument('--instrument', action='store_true',
+                        help="Time each pipeline stage and show live performance stats in the status bar")
+    parser.add_argument('--eager-charts', action='store_true', help="Build the charts before showing the window")
+    # Used by startup_benchmark.py: report startup timings and quit
+    parser.add_argument('--startup-probe', action='store_true', help=argparse.SUPPRESS)
+    return parser.parse_known_args(argv)
+
+def run_ward(args, app):
+    """Runs the multi-bed overview instead of the single-patient dashboard."""
+    from ward import BedSpec, WardManager
+    from ward_view import WardView
+    from ward_controller import WardController
+    from band_power import BANDS
+
+    ports = args.bed_ports + [None] * (args.beds - len(args.bed_ports))
+    # Every simulated bed gets its own stream, reproducible from --seed
+    specs = [BedSpec(f"Bed {bed + 1}", channels=1 if port else args.channels, port=port,
+                     baudrate=args.baud, protocol=args.protocol, scenario=args.scenario,
+                     seed=None if args.seed is None else args.seed + bed)
+             for bed, port in enumerate(ports)]
+    manager = WardManager(specs, workers=args.workers)
+    manager.start()
+    view = WardView([spec.name for spec in specs])
+    controller = WardController(manager, view, BANDS)
+    app.aboutToQuit.connect(controller.shutdown)
+
+    view.resize(1280, 800)
+    view.show()
+    sys.exit(app.exec())
 
 def main():
     """Main function to run the NeuroTrack application."""
-    app = QApplication(sys.argv)
+    args, qt_args = parse_args(sys.argv[1:])
+    app = QApplication(sys.argv[:1] + qt_args)
+    if args.beds:
+        run_ward(args, app)
     
+    recording = open_recording(args.replay) if args.replay else None
+    channel_count = 1 if args.port else recording.channels if recording else args.channels
+
     # Create instances of the MVC components
-    model = NeuroDataModel()
-    view = NeuroTrackView()
+    if recording:
+        model = NeuroDataModel(channel_count=channel_count, sample_rate=recording.sample_rate)
+    else:
+        model = NeuroDataModel(channel_count=channel_count)
+    model.configure_filters(args.highpass or None, args.notch or None, args.bandpass)
+    model.change_detector.threshold = args.event_threshold
+    model.change_detector.release = args.event_release
+    model.patient_age = args.age
+    model.patient_sex = args.sex
+    if args.montage:
+        model.montage = args.montage
+    # Memory-mapped, so opening it costs next to nothing at startup
+    model.norm_table = load_norm_table(args.norms or resource_path(DEFAULT_NORMS_PATH))
+    # The window is painted first and the charts (and pyqtgraph) follow right after
+    view = NeuroTrackView(defer_charts=not args.eager_charts, waveform_history_s=args.waveform_history)
+    acquisition = None
+    if args.port:
+        from acquisition import SerialAcquisition
+        acquisition = SerialAcquisition(args.port, baudrate=args.baud, protocol=args.protocol)
+    elif not recording:
+        signal = SimulatedSignal(model.sample_rate, model.channel_count, args.scenario, args.seed)
+        acquisition = SimulatedAcquisition(signal, speed=args.speed or None)
+    replay = ReplaySource(recording, model, speed=args.speed or None) if recording else None
+    stream_server = None
+    if args.serve is not None:
+        from streaming import StreamServer, parse_address
+        stream_server = StreamServer(model, *parse_address(args.serve))
+        try:
+            stream_server.start()
+        except OSError as e:
+            print(f"Error: Cannot stream on {stream_server.host}:{stream_server.port}: {e}")
+            stream_server = None
     # The controller wires the model and view together
-    controller = NeuroTrackController(model=model, view=view)
+    controller = NeuroTrackController(model=model, view=view, acquisition=acquisition, replay=replay,
+                                      recordings_dir=None if args.no_record else args.record_dir,
+                                      instrumentation=Instrumentation(enabled=args.instrument),
+                                      stream_server=stream_server, export_edf=args.export_edf)
+    app.aboutToQuit.connect(controller.shutdown)
     
+    if args.startup_probe:
+        from startup_benchmark import StartupProbe
+        StartupProbe(view, _STARTED, _IMPORTED) # Owned by the view
+
     view.resize(1280, 800)
     view.show()
     
     sys.exit(app.exec())
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -1,109 +1,287 @@
 import numpy as np
 from PyQt6.QtCore import QObject, pyqtSignal
 
+from band_power import BandPowerEngine
+from baseline import Baseline
+from change_detector import DROP, ChangeDetector
+from filters import ArtifactDetector, FilterChain
+from ring_buffer import RingBuffer
+from sample_store import CompressedSampleStore
+from snapshot import DataSnapshot
+from spectrogram import Spectrogram
+from trend_store import TrendStore
+
+SAMPLE_RATE = 250
+WAVEFORM_SAMPLES = 500 # 2 seconds of data at 250Hz
+STATE_COLORS = {
+    "Idle": "#A0A0A0",
+    "Calibrating": "#A0A0A0",
+    "Calm": "#2ECC71", # Green
+    "Neutral / Focused": "#F1C40F", # Yellow
+    "High Cognitive Load": "#E74C3C", # Red
+    "ACUTE EVENT DETECTED": "#E74C3C",
+}
+# Classification against a personal baseline, in standard deviations of the log ratio
+CALM_Z_THRESHOLD = -1.0
+FOCUSED_Z_THRESHOLD = -2.0
+# Classification against population norms (Immediate mode), in percentiles of the ratio
+CALM_PERCENTILE = 16.0
+FOCUSED_PERCENTILE = 2.3
+
 class NeuroDataModel(QObject):
     """
     The Model in MVC. Handles data generation and business logic.
     It emits signals when data is updated, allowing the View to react.
     """
-    data_updated = pyqtSignal(dict)
+    data_updated = pyqtSignal(object) # DataSnapshot
     
-    def __init__(self):
+    def __init__(self, channel_count=1, sample_rate=SAMPLE_RATE, window_samples=WAVEFORM_SAMPLES):
         super().__init__()
         self.patient_name = "Jane Doe"
         self.patient_id = "PID-98765"
+        self.patient_age = None
+        self.patient_sex = None
+        self.montage = "frontal-1ch" if channel_count == 1 else "multi"
+        self.channel_count = channel_count
+        self.sample_rate = sample_rate
         self.session_time = 0
-        self.eeg_waveform = np.zeros(500) # 2 seconds of data at 250Hz
+        self._waveform = RingBuffer(window_samples, channels=channel_count)
+        # Every raw sample of the session, compressed; the waveform above is only the live window
+        self.samples = CompressedSampleStore(channel_count, sample_rate)
+        # Everything downstream (waveform, band powers, baseline) sees filtered data; see configure_filters
+        self.filters = FilterChain(sample_rate, channel_count)
+        self.artifacts = ArtifactDetector(sample_rate, channel_count)
         self.alpha_beta_ratio = 1.0
+        self.channel_ratios = self._read_only(np.ones(channel_count))
         self.cognitive_state = "Idle"
-        self.state_color = "#A0A0A0"
+        self.state_color = STATE_COLORS[self.cognitive_state]
         self.acute_event = False
-        self.fft_data = {'Theta': 0, 'Alpha': 0, 'Beta': 0, 'Gamma': 0}
+        # One-second segments (or the whole window, if shorter), re-estimated ten times per second
+        self._band_power = BandPowerEngine(sample_rate=sample_rate, segment_length=min(sample_rate, window_samples),
+                                           hop=max(1, sample_rate // 10), channels=channel_count)
+        self._alpha_band = self._band_power.band_names.index('Alpha (8-13Hz)')
+        self._beta_band = self._band_power.band_names.index('Beta (13-30Hz)')
+        self.band_names = tuple(self._band_power.band_names)
+        self.band_powers = self._read_only(np.zeros(len(self.band_names))) # Averaged over channels
+        self._snapshot_version = 0
         
-        self.time_offset = 0
-        self.ratio_history = [1.0]
+        # Session-long ratio and band power trends, one point per analysis update
+        self.trend = TrendStore(("Alpha/Beta Ratio",) + self.band_names)
+        # Rolling time-frequency image, one column per band power update
+        self.spectrogram = Spectrogram(self._band_power.frequencies, self._band_power.hop / sample_rate)
+        self.state_log = [] # (session time in ms, state) at every change of state
+        # Sustained shifts of the same fields; a drop of the ratio is an acute event.
+        # Its threshold, drift and release can be tuned in place.
+        self.change_detector = ChangeDetector(self.trend.field_names, directions=(DROP,) + (0,) * len(self.band_names),
+                                              window_s=self._band_power.segment_length / sample_rate)
+        self.event_log = self.change_detector.events # ChangeEvents, oldest first
+
+        # Personal baseline: accumulated while calibrating, then used to classify
+        self.baseline = None
+        self._calibration = None
+        self.ratio_z = None
+        # Population norms for sessions without calibration; see norms.py
+        self.norm_table = None
+        self.norms = None
+        self.ratio_percentile = None
+
+        # Optional SessionRecorder that persists every update
+        self.recorder = None
+
+    @property
+    def eeg_waveform(self):
+        """Read-only channels x samples view of the live waveform, oldest sample first."""
+        return self._waveform.view()
+
+    @property
+    def analysis_hop(self):
+        """Samples between two band power updates; feeding blocks of this size analyzes every window."""
+        return self._band_power.hop
+
+    @property
+    def fft_data(self):
+        """Channel-averaged band powers keyed by band name."""
+        return dict(zip(self.band_names, self.band_powers.tolist()))
+
+    @staticmethod
+    def _read_only(array):
+        array.flags.writeable = False
+        return array
+
+    def configure_filters(self, highpass, notch, bandpass=None):
+        """
+        Replaces the pre-processing chain; any stage can be None to disable it.
 
-    def update_data(self):
+        Args:
+            highpass: High-pass cutoff in Hz.
+            notch: Mains frequency to notch out in Hz (50 or 60).
+            bandpass: Optional (low, high) pass band in Hz.
         """
-        Generates a new data point and updates the model state.
-        This method simulates the continuous flow of data from the sensor.
+        self.filters = FilterChain(self.sample_rate, self.channel_count, highpass, notch, bandpass)
+
+    def append_block(self, samples):
         """
-        SAMPLE_RATE = 250
-        self.session_time += 1000 / SAMPLE_RATE
-        self.time_offset += 1 / SAMPLE_RATE
-
-        # --- Generate a realistic, complex EEG signal ---
-        alpha_amplitude = 15 + 10 * np.sin(self.time_offset / 5)
-        beta_amplitude = 8 + 6 * np.sin(self.time_offset / 1.5)
-        alpha_wave = alpha_amplitude * np.sin(2 * np.pi * 10 * self.time_offset)
-        beta_wave = beta_amplitude * np.sin(2 * np.pi * 22 * self.time_offset)
-        noise = (np.random.rand() - 0.5) * 10
-        new_amplitude = alpha_wave + beta_wave + noise
-        
-        # Update waveform buffer using a rolling window
-        self.eeg_waveform = np.roll(self.eeg_waveform, -1)
-        self.eeg_waveform[-1] = new_amplitude
+        Ingests a block of raw samples, re-runs the analysis and notifies the View.
+        A whole chunk is filtered and copied into the waveform buffer in one
+        call, so the cost does not depend on how many samples arrive per tick.
+
+        Args:
+            samples: A channels x samples block (a 1-D block for a single channel).
+        """
+        samples = np.asarray(samples, dtype=np.float64).reshape(self.channel_count, -1)
+        count = samples.shape[1]
+        self.samples.append(samples)
+        filtered = self.filters.process(samples)
+        self.artifacts.update(samples, filtered)
+        self._waveform.append_block(filtered)
+        self.session_time += count * 1000 / self.sample_rate
 
-        # --- Simulate Analysis (FFT, Ratio, State) ---
-        alpha_power = alpha_amplitude**2
-        beta_power = beta_amplitude**2
-        self.alpha_beta_ratio = alpha_power / beta_power if beta_power > 1 else alpha_power
+        # --- Band Power Analysis (FFT, Ratio) ---
+        if self._band_power.push(count, self.eeg_waveform):
+            powers = self._band_power.band_powers
+            self.band_powers = self._read_only(powers.mean(axis=0))
+            alpha_power = powers[:, self._alpha_band]
+            beta_power = powers[:, self._beta_band]
+            self.channel_ratios = self._read_only(np.divide(alpha_power, beta_power,
+                                                            out=np.ones_like(alpha_power), where=beta_power > 0))
+            if beta_power.mean() > 0:
+                self.alpha_beta_ratio = alpha_power.mean() / beta_power.mean()
+            features = (self.alpha_beta_ratio, *self.band_powers)
+            self.trend.append(self.session_time / 1000, features)
+            self.spectrogram.append(self.session_time / 1000, self._band_power.latest_periodogram.mean(axis=0))
+            # Estimates from a window still padded with fill values, or averaged
+            # over any segment with blinks or clipping in it, would skew the
+            # baseline and the detector. The artifact flag itself drops sooner.
+            first_sample = self._band_power.first_sample
+            trustworthy = first_sample >= 0 and first_sample >= self.artifacts.last_artifact
+            if trustworthy:
+                self.change_detector.update(self.session_time / 1000, features)
+            if self._calibration is not None:
+                if trustworthy:
+                    self._calibration.add(self.session_time / 1000, features)
+            elif self.baseline is not None:
+                self.ratio_z = float(self.baseline.z_scores(features)[0])
+            elif self.norms is not None:
+                self.ratio_percentile = float(self.norms.percentiles(features)[0])
 
-        # --- State Classification Logic ---
-        if self.alpha_beta_ratio > 2.5:
+        self._classify()
+
+        # --- Acute Event Detection Logic ---
+        self.acute_event = self.change_detector.is_active("Alpha/Beta Ratio", DROP)
+        if self.acute_event:
+            self.cognitive_state = "ACUTE EVENT DETECTED"
+            self.state_color = STATE_COLORS[self.cognitive_state]
+
+        if not self.state_log or self.state_log[-1][1] != self.cognitive_state:
+            self.state_log.append((self.session_time, self.cognitive_state))
+
+        snapshot = self.get_data_snapshot()
+        if self.recorder is not None:
+            self.recorder.append(samples, snapshot) # Raw, so a replay can be filtered differently
+
+        # Emit a signal with a snapshot of the new data for the View to update
+        self.data_updated.emit(snapshot)
+
+    def _classify(self):
+        """Sets the cognitive state from the ratio, relative to the baseline when there is one."""
+        if self._calibration is not None:
+            self.cognitive_state = "Calibrating"
+            self.state_color = STATE_COLORS[self.cognitive_state]
+            return
+        if self.ratio_z is not None:
+            calm = self.ratio_z > CALM_Z_THRESHOLD
+            focused = self.ratio_z > FOCUSED_Z_THRESHOLD
+        elif self.ratio_percentile is not None:
+            calm = self.ratio_percentile > CALM_PERCENTILE
+            focused = self.ratio_percentile > FOCUSED_PERCENTILE
+        else: # No personal baseline: fixed ratio thresholds
+            calm = self.alpha_beta_ratio > 2.5
+            focused = self.alpha_beta_ratio > 1.5
+
+        if calm:
             self.cognitive_state = "Calm"
-            self.state_color = "#2ECC71"  # Green
-        elif self.alpha_beta_ratio > 1.5:
+            self.state_color = STATE_COLORS[self.cognitive_state]
+        elif focused:
             self.cognitive_state = "Neutral / Focused"
-            self.state_color = "#F1C40F"  # Yellow
+            self.state_color = STATE_COLORS[self.cognitive_state]
         else:
             self.cognitive_state = "High Cognitive Load"
-            self.state_color = "#E74C3C"  # Red
+            self.state_color = STATE_COLORS[self.cognitive_state]
 
-        # --- Acute Event Detection Logic ---
-        last_ratio = self.ratio_history[-1]
-        self.acute_event = (last_ratio - self.alpha_beta_ratio) > 2.0
-        if self.acute_event:
-            self.cognitive_state = "ACUTE EVENT DETECTED"
-            self.state_color = "#E74C3C"
-
-        self.ratio_history.append(self.alpha_beta_ratio)
-        if len(self.ratio_history) > 250: # Keep last second of history
-            self.ratio_history.pop(0)
-            
-        # --- FFT Data Simulation ---
-        self.fft_data = {
-            'Theta (4-8Hz)': np.random.rand() * 200,
-            'Alpha (8-13Hz)': alpha_power * 10 + np.random.rand() * 50,
-            'Beta (13-30Hz)': beta_power * 10 + np.random.rand() * 50,
-            'Gamma (>30Hz)': np.random.rand() * 150
-        }
-        
-        # Emit a signal with a copy of the new data for the View to update
-        self.data_updated.emit(self.get_data_snapshot())
+    def start_calibration(self, method='welford'):
+        """
+        Starts accumulating a personal baseline from the incoming data.
+
+        Args:
+            method: 'welford' weights the whole calibration equally, 'ewma'
+                favours its later part (see baseline.py).
+        """
+        self.baseline = None
+        self.ratio_z = None
+        self.norms = None
+        self.ratio_percentile = None
+        self._calibration = Baseline(("Alpha/Beta Ratio",) + self.band_names, method=method)
+
+    def finish_calibration(self):
+        """Freezes the baseline gathered so far. Returns False if there was too little data."""
+        calibration, self._calibration = self._calibration, None
+        if calibration is not None and calibration.freeze():
+            self.baseline = calibration
+        return self.baseline is not None
+
+    def use_population_norms(self):
+        """
+        Classifies against the norm table stratum matching the patient
+        instead of a personal baseline. Returns False (keeping the fixed
+        thresholds) if there is no table or no matching stratum.
+        """
+        self.baseline = None
+        self.ratio_z = None
+        self.ratio_percentile = None
+        self.norms = None
+        if self.norm_table is not None:
+            self.norms = self.norm_table.select(self.patient_age, self.patient_sex, self.montage)
+        return self.norms is not None
+
+    def state_durations(self):
+        """Seconds of the session spent in each state so far."""
+        durations = {}
+        log = self.state_log + [(self.session_time, None)]
+        for (start, state), (end, _) in zip(log, log[1:]):
+            durations[state] = durations.get(state, 0) + (end - start) / 1000
+        return durations
 
     def get_data_snapshot(self):
-        """Returns a dictionary of the current model state."""
-        return {
-            "patientName": self.patient_name,
-            "patientId": self.patient_id,
-            "sessionTime": self.session_time,
-            "eegWaveform": self.eeg_waveform,
-            "fftData": self.fft_data,
-            "alphaBetaRatio": self.alpha_beta_ratio,
-            "cognitiveState": self.cognitive_state,
-            "stateColor": self.state_color,
-            "acuteEvent": self.acute_event,
-        }
+        """Returns a DataSnapshot of the current model state, without copying arrays."""
+        self._snapshot_version += 1
+        return DataSnapshot(
+            self._snapshot_version, self._waveform, self.patient_name, self.patient_id,
+            self.session_time, self.band_names, self.band_powers, self.alpha_beta_ratio,
+            self.channel_ratios, self.cognitive_state, self.state_color, self.acute_event,
+            self.sample_rate, self.artifacts.active,
+        )
         
     def reset(self):
         """Resets the model to its initial state for a new session."""
         self.session_time = 0
-        self.eeg_waveform = np.zeros(500)
+        self._waveform.reset()
+        self.samples.reset()
+        self.filters.reset()
+        self.artifacts.reset()
         self.alpha_beta_ratio = 1.0
+        self.channel_ratios = self._read_only(np.ones(self.channel_count))
         self.cognitive_state = "Idle"
-        self.state_color = "#A0A0A0"
+        self.state_color = STATE_COLORS[self.cognitive_state]
         self.acute_event = False
-        self.time_offset = 0
-        self.ratio_history = [1.0]
+        self._band_power.reset()
+        self.band_powers = self._read_only(np.zeros(len(self.band_names)))
+        self.trend.reset()
+        self.spectrogram.reset()
+        self.state_log.clear()
+        self.change_detector.reset()
+        self.baseline = None
+        self._calibration = None
+        self.ratio_z = None
+        self.norms = None
+        self.ratio_percentile = None
         self.data_updated.emit(self.get_data_snapshot())
\ No newline at end of file
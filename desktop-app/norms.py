@@ -0,0 +1,211 @@
+"""
+Population norm tables for Immediate mode.
+
+A norm table holds, for every stratum (age band x sex x montage), the
+percentiles of the alpha/beta ratio and each band power in a healthy
+reference population. Tables are compact binary files that are
+memory-mapped rather than parsed, so an emergency session can classify
+from its first analysis update.
+
+File layout (little-endian, every section 4-byte aligned):
+
+    header    HEADER_DTYPE
+    fields    S32 x field count       e.g. "Alpha/Beta Ratio"
+    levels    f4 x level count        percentile levels, ascending
+    strata    STRATUM_DTYPE x strata
+    values    f4 x strata x fields x levels
+              natural log of the metric at each level, ascending
+
+Build a table from per-subject reference values with `write_norm_table`.
+
+    python norms.py assets/population_norms.bin    # writes the example table
+"""
+import os
+import sys
+
+import numpy as np
+
+MAGIC = b"NTNORMS1"
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'), ('version', '<u4'), ('fields', '<u4'), ('levels', '<u4'), ('strata', '<u4'),
+])
+STRATUM_DTYPE = np.dtype([
+    ('age_low', '<f4'), ('age_high', '<f4'), ('sex', 'S4'), ('montage', 'S20'),
+])
+FIELD_DTYPE = np.dtype('S32')
+
+PERCENTILE_LEVELS = (1, 2.5, 5, 10, 15, 20, 25, 30, 40, 50, 60, 70, 75, 80, 85, 90, 95, 97.5, 99)
+POOLED_SEX = 'U'
+POOLED_AGE = (0.0, 200.0)
+DEFAULT_NORMS_PATH = os.path.join('assets', 'population_norms.bin')
+
+class NormStratum:
+    """
+    The percentile grid of one stratum, prepared for vectorized lookups.
+
+    Every field's grid row is shifted by a per-row offset larger than the
+    spread of the whole grid, so the rows form one ascending array and a
+    single `searchsorted` call answers the lookups of all fields at once.
+    """
+    def __init__(self, field_names, levels, log_values, description, approximate=False):
+        self.field_names = field_names
+        self.description = description
+        self.approximate = approximate # The patient's age lies outside the stratum's band
+        self._levels = np.asarray(levels, dtype=np.float64)
+        grid = np.asarray(log_values, dtype=np.float64)
+        fields, points = grid.shape
+        self._low = grid[:, :1]
+        self._high = grid[:, -1:]
+        self._offsets = (np.arange(fields) * (grid.max() - grid.min() + 1.0))[:, None]
+        self._flat = (grid + self._offsets).ravel()
+        self._row_starts = (np.arange(fields) * points)[:, None]
+        self._points = points
+
+    def percentiles(self, values):
+        """
+        Returns the population percentile of each value, interpolated
+        linearly between table levels and clamped to the outermost levels.
+
+        Args:
+            values: One value per field, or a fields x n array.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        shape = values.shape
+        logs = np.log(np.maximum(values.reshape(len(self.field_names), -1), 1e-12))
+        x = np.clip(logs, self._low, self._high) + self._offsets
+
+        index = np.searchsorted(self._flat, x, side='right')
+        index = np.clip(index, self._row_starts + 1, self._row_starts + self._points - 1)
+        lower, upper = self._flat[index - 1], self._flat[index]
+        span = upper - lower
+        fraction = np.divide(x - lower, span, out=np.zeros_like(x), where=span > 0)
+        level = index - 1 - self._row_starts
+        below = self._levels[level]
+        return (below + fraction * (self._levels[level + 1] - below)).reshape(shape)
+
+class NormTable:
+    """A memory-mapped norm table; only the strata that are looked up get paged in."""
+    def __init__(self, path):
+        self.path = path
+        header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+        if header.size == 0 or header['magic'][0] != MAGIC:
+            raise ValueError(f"{path} is not a NeuroTrack norm table")
+        header = header[0]
+        offset = HEADER_DTYPE.itemsize
+
+        def section(dtype, shape):
+            nonlocal offset
+            array = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape)
+            offset += array.nbytes
+            return array
+
+        self.field_names = tuple(name.decode() for name in section(FIELD_DTYPE, (int(header['fields']),)))
+        self.levels = section('<f4', (int(header['levels']),))
+        self.strata = section(STRATUM_DTYPE, (int(header['strata']),))
+        self._values = section('<f4', (len(self.strata), len(self.field_names), len(self.levels)))
+
+    def select(self, age=None, sex=None, montage=None):
+        """
+        Returns the NormStratum that best matches the patient, or None.
+
+        The narrowest age band containing `age` wins; without an age the
+        pooled age band is used, and an unknown sex falls back to the
+        pooled sex. If no band contains `age` (e.g. an implausible entry),
+        the nearest band is used and the stratum is marked `approximate`.
+        The montage must match exactly.
+        """
+        strata = self.strata
+        montage_match = strata['montage'] == (montage or '').encode()
+        sexes = [sex.upper()[:1], POOLED_SEX] if sex else [POOLED_SEX]
+        if age is None:
+            inside = (strata['age_low'] == POOLED_AGE[0]) & (strata['age_high'] == POOLED_AGE[1])
+            distances = np.where(inside, 0.0, np.inf)
+        else:
+            inside = (strata['age_low'] <= age) & (age < strata['age_high'])
+            # How far `age` lies outside each band
+            distances = np.where(age < strata['age_low'], strata['age_low'] - age, age - strata['age_high'])
+            distances[inside] = 0.0
+        widths = strata['age_high'] - strata['age_low']
+
+        best = None
+        for sex_code in sexes:
+            candidates = np.flatnonzero(montage_match & (strata['sex'] == sex_code.encode()) & np.isfinite(distances))
+            if candidates.size:
+                # Bands containing the age first, then the nearest; the narrowest of those
+                row = candidates[np.lexsort((widths[candidates], distances[candidates], ~inside[candidates]))[0]]
+                if best is None or inside[row] or distances[row] < distances[best]:
+                    best = row
+                if inside[best]:
+                    break
+        if best is None:
+            return None
+        stratum = strata[best]
+        description = (f"{montage}, {stratum['sex'].decode()}, "
+                       f"age {stratum['age_low']:g}-{stratum['age_high']:g}")
+        return NormStratum(self.field_names, self.levels, self._values[best], description,
+                           approximate=not inside[best])
+
+    def montages(self):
+        return sorted({montage.decode() for montage in self.strata['montage']})
+
+def write_norm_table(path, field_names, strata, levels=PERCENTILE_LEVELS):
+    """
+    Writes a norm table.
+
+    Args:
+        path: Output file.
+        field_names: Names of the metrics, e.g. the model's trend fields.
+        strata: A list of ((age_low, age_high), sex, montage, reference)
+            tuples, where `reference` is a fields x subjects array of
+            positive metric values from the reference population.
+        levels: Percentile levels to store.
+    """
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header[0] = (MAGIC, 1, len(field_names), len(levels), len(strata))
+    records = np.zeros(len(strata), dtype=STRATUM_DTYPE)
+    values = np.empty((len(strata), len(field_names), len(levels)), dtype='<f4')
+    for row, ((age_low, age_high), sex, montage, reference) in enumerate(strata):
+        records[row] = (age_low, age_high, sex.encode(), montage.encode())
+        values[row] = np.percentile(np.log(np.asarray(reference, dtype=np.float64)), levels, axis=1).T
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        for array in (header, np.array(field_names, dtype=FIELD_DTYPE),
+                      np.array(levels, dtype='<f4'), records, values):
+            array.tofile(f)
+    os.replace(tmp_path, path)
+
+def load_norm_table(path=DEFAULT_NORMS_PATH):
+    """Opens the norm table at `path`, or returns None if there is none."""
+    try:
+        return NormTable(path)
+    except (OSError, ValueError):
+        return None
+
+# --- Example table ---
+
+def write_example_table(path, subjects=20000, seed=0):
+    """
+    Writes an EXAMPLE table so Immediate mode works out of the box. It is
+    not clinical data: every stratum shares one log-normal distribution per
+    metric, with the ratio's placed so that the former fixed thresholds
+    (2.5 and 1.5) fall at the 16th and 2.3rd percentiles. Replace it with a
+    table built from a real reference population.
+    """
+    from band_power import BANDS
+
+    field_names = ["Alpha/Beta Ratio"] + list(BANDS)
+    # (median, sigma) of each metric's natural log
+    distributions = [(1.427, 0.511), (np.log(0.25), 0.8), (np.log(120.0), 1.0), (np.log(35.0), 1.0), (np.log(6.5), 0.8)]
+    rng = np.random.default_rng(seed)
+    reference = np.exp([rng.normal(mu, sigma, subjects) for mu, sigma in distributions])
+
+    age_bands = [POOLED_AGE, (0, 13), (13, 18), (18, 40), (40, 65), (65, 200)]
+    strata = [(ages, sex, montage, reference)
+              for montage in ('frontal-1ch', 'multi')
+              for sex in (POOLED_SEX, 'F', 'M')
+              for ages in age_bands]
+    write_norm_table(path, field_names, strata)
+
+if __name__ == '__main__':
+    write_example_table(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_NORMS_PATH)
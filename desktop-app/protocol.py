@@ -0,0 +1,196 @@
+"""
+Binary framing protocol between firmware-pico and the desktop app.
+
+Every frame is 38 bytes, all fields little-endian:
+
+    offset  size  field
+    0       2     sync word 0x5AA5 (bytes A5 5A)
+    2       2     sequence number, uint16, wraps around
+    4       32    FRAME_SAMPLES int16 ADC samples, centered on the ADC midpoint
+    36      2     Fletcher-16 checksum of bytes 2..35 (sequence + samples)
+
+Frames have a fixed size, so a run of aligned frames can be viewed as one
+structured NumPy array and decoded without a per-sample parse.
+"""
+import time
+
+import numpy as np
+
+SYNC_WORD = 0x5AA5
+SYNC_BYTES = SYNC_WORD.to_bytes(2, 'little')
+FRAME_SAMPLES = 16
+
+FRAME_DTYPE = np.dtype([
+    ('sync', '<u2'),
+    ('seq', '<u2'),
+    ('samples', '<i2', (FRAME_SAMPLES,)),
+    ('checksum', '<u2'),
+])
+FRAME_SIZE = FRAME_DTYPE.itemsize
+
+# Fletcher-16 over n bytes is sum(b) and sum((n - i) * b[i]), both mod 255
+_CHECKED_BYTES = FRAME_SIZE - 4
+_FLETCHER_WEIGHTS = np.arange(_CHECKED_BYTES, 0, -1, dtype=np.int64)
+
+def _fletcher16(checked):
+    """Vectorized Fletcher-16 over each row of a (frames, bytes) uint8 array."""
+    sum1 = checked.sum(axis=1, dtype=np.int64) % 255
+    sum2 = (checked @ _FLETCHER_WEIGHTS) % 255
+    return (sum2 << 8) | sum1
+
+def encode_frames(samples, start_seq=0):
+    """
+    Packs samples into frames, as the firmware does.
+
+    Args:
+        samples: Centered ADC samples; the length must be a multiple of FRAME_SAMPLES.
+        start_seq: Sequence number of the first frame.
+
+    Returns:
+        The encoded frames as bytes.
+    """
+    samples = np.asarray(samples, dtype=np.int16).reshape(-1, FRAME_SAMPLES)
+    frames = np.zeros(len(samples), dtype=FRAME_DTYPE)
+    frames['sync'] = SYNC_WORD
+    frames['seq'] = (start_seq + np.arange(len(samples))) % 65536
+    frames['samples'] = samples
+    checked = frames.view(np.uint8).reshape(len(samples), FRAME_SIZE)[:, 2:-2]
+    frames['checksum'] = _fletcher16(checked)
+    return frames.tobytes()
+
+class FrameDecoder:
+    """
+    Incremental decoder for the binary frame stream.
+
+    Each call to `feed` views every aligned run of frames in the buffer as
+    a structured array with np.frombuffer, validates sync words and
+    checksums for the whole run at once, and returns the samples as one
+    array. Gaps in the sequence numbers are counted as lost frames.
+    """
+    def __init__(self):
+        self._pending = b''
+        self._last_seq = None
+        self.frames_decoded = 0
+        self.frames_lost = 0
+        self.corrupt_frames = 0
+        self.bytes_skipped = 0
+
+    def feed(self, data):
+        """Decodes as many complete frames as possible and returns their int16 samples."""
+        buffer = self._pending + data if self._pending else data
+        blocks = []
+        position = 0
+        while len(buffer) - position >= FRAME_SIZE:
+            if buffer[position:position + 2] != SYNC_BYTES:
+                # Resynchronize on the next sync word
+                found = buffer.find(SYNC_BYTES, position + 1)
+                next_position = found if found >= 0 else len(buffer) - 1
+                self.bytes_skipped += next_position - position
+                position = next_position
+                continue
+
+            count = (len(buffer) - position) // FRAME_SIZE
+            frames = np.frombuffer(buffer, dtype=FRAME_DTYPE, count=count, offset=position)
+            checked = np.frombuffer(buffer, dtype=np.uint8, count=count * FRAME_SIZE, offset=position)
+            checked = checked.reshape(count, FRAME_SIZE)[:, 2:-2]
+            valid = (frames['sync'] == SYNC_WORD) & (frames['checksum'] == _fletcher16(checked))
+
+            # Keep the leading run of valid frames; anything after a bad frame is re-scanned
+            run = count if valid.all() else int(np.argmin(valid))
+            if run == 0:
+                self.corrupt_frames += 1
+                self.bytes_skipped += 1
+                position += 1
+                continue
+
+            accepted = frames[:run]
+            self._track_sequence(accepted['seq'])
+            blocks.append(accepted['samples'].reshape(-1))
+            self.frames_decoded += run
+            position += run * FRAME_SIZE
+
+        self._pending = buffer[position:]
+        if not blocks:
+            return np.empty(0, dtype=np.int16)
+        return blocks[0] if len(blocks) == 1 else np.concatenate(blocks)
+
+    def _track_sequence(self, seqs):
+        seqs = seqs.astype(np.int64)
+        if self._last_seq is not None:
+            seqs = np.concatenate(([self._last_seq], seqs))
+        self.frames_lost += int(((np.diff(seqs) - 1) % 65536).sum())
+        self._last_seq = int(seqs[-1])
+
+    def stats(self):
+        """Returns the decoder counters as a dictionary."""
+        return {
+            "framesDecoded": self.frames_decoded,
+            "framesLost": self.frames_lost,
+            "samplesLost": self.frames_lost * FRAME_SAMPLES,
+            "corruptFrames": self.corrupt_frames,
+            "bytesSkipped": self.bytes_skipped,
+        }
+
+class SimulatedFrameProducer:
+    """
+    Produces a binary frame stream like the firmware's, without hardware.
+    Frames can be dropped or corrupted on purpose to exercise the decoder.
+    """
+    def __init__(self, sample_rate=250, seed=None, drop_rate=0.0, corrupt_rate=0.0):
+        self.sample_rate = sample_rate
+        self.drop_rate = drop_rate
+        self.corrupt_rate = corrupt_rate
+        self._rng = np.random.default_rng(seed)
+        self._seq = 0
+        self._samples_produced = 0
+
+    def read(self, frame_count):
+        """Returns the next `frame_count` frames as bytes."""
+        n = frame_count * FRAME_SAMPLES
+        t = (self._samples_produced + np.arange(n)) / self.sample_rate
+        signal = 20 * np.sin(2 * np.pi * 10 * t) + 8 * np.sin(2 * np.pi * 22 * t)
+        samples = np.clip(signal + self._rng.normal(0, 3, n), -2048, 2047)
+        data = encode_frames(samples, start_seq=self._seq)
+        self._seq = (self._seq + frame_count) % 65536
+        self._samples_produced += n
+
+        if self.drop_rate or self.corrupt_rate:
+            frames = np.frombuffer(data, dtype=FRAME_DTYPE).copy()
+            corrupt = self._rng.random(frame_count) < self.corrupt_rate
+            frames['checksum'][corrupt] ^= 0xFFFF
+            keep = self._rng.random(frame_count) >= self.drop_rate
+            data = frames[keep].tobytes()
+        return data
+
+def load_test(sample_rate=8000, seconds=10.0, read_frames=64):
+    """
+    Streams `seconds` worth of simulated frames through the decoder as fast
+    as possible and reports how many times real time it can sustain.
+    """
+    producer = SimulatedFrameProducer(sample_rate=sample_rate, seed=0)
+    total_frames = int(sample_rate * seconds) // FRAME_SAMPLES
+    chunks = [producer.read(read_frames) for _ in range(total_frames // read_frames)]
+
+    decoder = FrameDecoder()
+    decoded = 0
+    start = time.perf_counter()
+    for chunk in chunks:
+        # Split reads mid-frame, as a serial port would
+        half = len(chunk) // 2 + 7
+        decoded += decoder.feed(chunk[:half]).size
+        decoded += decoder.feed(chunk[half:]).size
+    elapsed = time.perf_counter() - start
+
+    return {
+        "sampleRate": sample_rate,
+        "samplesDecoded": decoded,
+        "samplesPerSecond": decoded / elapsed,
+        "realTimeFactor": decoded / elapsed / sample_rate,
+        **decoder.stats(),
+    }
+
+if __name__ == '__main__':
+    for rate in (250, 1000, 4000, 8000):
+        result = load_test(sample_rate=rate)
+        print(f"{rate:>5} Hz: {result['samplesPerSecond']:,.0f} samples/s "
+              f"({result['realTimeFactor']:,.0f}x real time)")
@@ -0,0 +1,283 @@
+"""
+Session recording and replay.
+
+A recording is a directory with three files:
+
+    samples.f32   raw samples, float32, channels interleaved, appended chunk by chunk
+    metrics.bin   one METRIC_DTYPE record per model update
+    index.json    sample rate, record counts and a chunk table for seeking
+
+and, if exported, an EDF+ copy of the samples (session.edf, see edf.py).
+
+The data files are only ever appended to, and index.json is replaced
+atomically after each chunk, so the counts in the index always describe
+data that is fully on disk. Readers memory-map the data files, so opening
+a multi-hour recording costs the same as opening a short one.
+"""
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+from band_power import BANDS
+from edf import EdfFile, EdfWriter
+
+FORMAT_VERSION = 1
+SAMPLE_DTYPE = np.dtype('<f4')
+METRIC_DTYPE = np.dtype([
+    ('sample_index', '<u8'), # Samples recorded up to and including this update
+    ('session_time', '<f8'), # Milliseconds
+    ('band_powers', '<f4', (len(BANDS),)),
+    ('ratio', '<f4'),
+    ('state', 'u1'),
+    ('acute', 'u1'),
+])
+
+# Cognitive states are stored as their index in this list
+STATE_NAMES = ["Idle", "Calm", "Neutral / Focused", "High Cognitive Load", "ACUTE EVENT DETECTED", "Calibrating"]
+UNKNOWN_STATE = 255
+
+EDF_NAME = "session.edf"
+DEFAULT_RECORDINGS_DIR = os.path.join(os.path.expanduser("~"), "NeuroTrack", "recordings")
+
+class SessionRecorder:
+    """
+    Appends raw samples and derived metrics of a live session to disk.
+    Only the current chunk is held in memory, so sessions of any length
+    can be recorded.
+
+    Args:
+        export_edf: Also write the session to session.edf as it is recorded,
+            annotated with state changes and acute events.
+    """
+    def __init__(self, path, sample_rate, channels=1, patient_id="", sample_chunk=2048, metric_chunk=512,
+                 export_edf=False):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self._index = {
+            "version": FORMAT_VERSION,
+            "sampleRate": sample_rate,
+            "channels": channels,
+            "patientId": patient_id,
+            "startedAt": datetime.now().isoformat(timespec='seconds'),
+            "bands": list(BANDS),
+            "states": STATE_NAMES,
+            "sampleCount": 0,
+            "metricCount": 0,
+            "chunks": [], # [first sample, first metric, session time in ms]
+        }
+        self._state_codes = {name: code for code, name in enumerate(STATE_NAMES)}
+
+        self._sample_chunk = np.empty((sample_chunk, channels), dtype=SAMPLE_DTYPE)
+        self._samples_buffered = 0
+        self._metric_chunk = np.zeros(metric_chunk, dtype=METRIC_DTYPE)
+        self._metrics_buffered = 0
+
+        self._sample_file = open(os.path.join(path, "samples.f32"), 'ab')
+        self._metric_file = open(os.path.join(path, "metrics.bin"), 'ab')
+        self.edf = EdfWriter(os.path.join(path, EDF_NAME), sample_rate, channels, patient_id) if export_edf else None
+        self._write_index()
+
+    @classmethod
+    def create(cls, base_dir, sample_rate, channels=1, patient_id="", export_edf=False):
+        """Creates a recorder in a new, timestamped directory under `base_dir`."""
+        name = datetime.now().strftime("%Y%m%d-%H%M%S")
+        if patient_id:
+            name = f"{name}-{patient_id}"
+        return cls(os.path.join(base_dir, name), sample_rate, channels=channels, patient_id=patient_id,
+                   export_edf=export_edf)
+
+    def append(self, samples, data):
+        """
+        Records one model update.
+
+        Args:
+            samples: The channels x samples block that was just ingested.
+            data: The model snapshot computed from them.
+        """
+        if self.edf is not None:
+            self.edf.append(samples, data)
+        channels = self._sample_chunk.shape[1]
+        samples = np.asarray(samples, dtype=SAMPLE_DTYPE).reshape(channels, -1).T
+        chunk_length = len(self._sample_chunk)
+        while len(samples):
+            take = min(len(samples), chunk_length - self._samples_buffered)
+            self._sample_chunk[self._samples_buffered:self._samples_buffered + take] = samples[:take]
+            self._samples_buffered += take
+            samples = samples[take:]
+            if self._samples_buffered == chunk_length:
+                self._flush()
+
+        record = self._metric_chunk[self._metrics_buffered]
+        record['sample_index'] = self._index["sampleCount"] + self._samples_buffered
+        record['session_time'] = data.session_time
+        record['band_powers'] = data.band_powers
+        record['ratio'] = data.alpha_beta_ratio
+        record['state'] = self._state_codes.get(data.cognitive_state, UNKNOWN_STATE)
+        record['acute'] = data.acute_event
+        self._metrics_buffered += 1
+        if self._metrics_buffered == self._metric_chunk.size:
+            self._flush()
+
+    def close(self):
+        """Writes any buffered data and the final index."""
+        if self._sample_file.closed:
+            return
+        self._flush()
+        self._sample_file.close()
+        self._metric_file.close()
+        if self.edf is not None:
+            self.edf.close()
+
+    def _flush(self):
+        if not self._samples_buffered and not self._metrics_buffered:
+            return
+        first_time = float(self._metric_chunk['session_time'][0]) if self._metrics_buffered else None
+        self._index["chunks"].append([self._index["sampleCount"], self._index["metricCount"], first_time])
+
+        self._sample_file.write(self._sample_chunk[:self._samples_buffered].tobytes())
+        self._metric_file.write(self._metric_chunk[:self._metrics_buffered].tobytes())
+        self._sample_file.flush()
+        self._metric_file.flush()
+
+        self._index["sampleCount"] += self._samples_buffered
+        self._index["metricCount"] += self._metrics_buffered
+        self._samples_buffered = 0
+        self._metrics_buffered = 0
+        self._write_index()
+
+    def _write_index(self):
+        # Replace atomically so readers never see a half-written index
+        index_path = os.path.join(self.path, "index.json")
+        with open(index_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(self._index, f)
+        os.replace(index_path + ".tmp", index_path)
+
+class Recording:
+    """
+    A recorded session opened for review. `samples` (samples x channels)
+    and `metrics` are read-only memory maps, so nothing is loaded until it
+    is accessed.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "index.json"), encoding='utf-8') as f:
+            self.index = json.load(f)
+        if self.index["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported recording version: {self.index['version']}")
+
+        self.sample_rate = self.index["sampleRate"]
+        self.channels = self.index["channels"]
+        self.state_names = self.index["states"]
+        self.samples = self._map("samples.f32", SAMPLE_DTYPE, (self.index["sampleCount"], self.channels))
+        self.metrics = self._map("metrics.bin", METRIC_DTYPE, (self.index["metricCount"],))
+        # First metric record and its session time of every chunk that has metrics
+        chunks = [(metric, time_ms) for _, metric, time_ms in self.index["chunks"]
+                  if time_ms is not None and metric < len(self.metrics)]
+        self._chunk_metrics = np.array([metric for metric, _ in chunks], dtype=np.int64)
+        self._chunk_times = np.array([time_ms for _, time_ms in chunks], dtype=np.float64)
+
+    def _map(self, name, dtype, shape):
+        if shape[0] == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(os.path.join(self.path, name), dtype=dtype, mode='r', shape=shape)
+
+    @property
+    def sample_count(self):
+        return len(self.samples)
+
+    @property
+    def duration(self):
+        """Length of the recording in seconds."""
+        return len(self.samples) / self.sample_rate
+
+    def read(self, start, count):
+        """Returns samples [start, start + count) as a channels x samples float64 array."""
+        return np.asarray(self.samples[start:start + count], dtype=np.float64).T
+
+    def metrics_between(self, start_ms, end_ms):
+        """
+        Returns the metric records whose session time lies in [start_ms, end_ms).
+        The chunk table narrows each lookup to one chunk, so only that part
+        of metrics.bin is read, however long the recording.
+        """
+        return self.metrics[self._metric_at(start_ms):self._metric_at(end_ms)]
+
+    def _metric_at(self, time_ms):
+        """Index of the first metric record at or after `time_ms`."""
+        chunk = np.searchsorted(self._chunk_times, time_ms, side='right') - 1
+        if chunk < 0:
+            return 0
+        first = int(self._chunk_metrics[chunk])
+        last = int(self._chunk_metrics[chunk + 1]) if chunk + 1 < len(self._chunk_metrics) else len(self.metrics)
+        return first + int(np.searchsorted(self.metrics['session_time'][first:last], time_ms))
+
+def open_recording(path):
+    """Opens a recording directory, or an EDF/EDF+ file, for replay."""
+    if os.path.isfile(path):
+        return EdfFile(path)
+    return Recording(path)
+
+class ReplaySource:
+    """
+    Feeds a recording (a Recording or an edf.EdfFile) back through the model.
+
+    Call `advance()` periodically (e.g. from a QTimer). At a finite speed
+    it plays back the samples that are due since the last call; with
+    `speed=None` it plays as many samples as fit in `time_budget` seconds,
+    so the GUI stays responsive. Either way samples go to the model in
+    analysis-sized blocks (by default one per band power update), so a
+    fast replay skips none of the band power updates or spectrogram
+    columns the live session made.
+    """
+    def __init__(self, recording, model, speed=1.0, block_size=None, time_budget=0.05, max_catch_up=0.25):
+        self.recording = recording
+        self._model = model
+        self.speed = speed
+        self.block_size = block_size or model.analysis_hop
+        self.time_budget = time_budget
+        self.max_catch_up = max_catch_up
+        self.position = 0
+        self._due = 0.0
+        self._last_advance = None
+
+    @property
+    def finished(self):
+        return self.position >= self.recording.sample_count
+
+    def rewind(self):
+        """Starts the playback over from the beginning, e.g. for a new session."""
+        self.position = 0
+        self._due = 0.0
+        self._last_advance = None
+
+    def advance(self):
+        """Plays the next stretch of samples. Returns False once the recording has ended."""
+        if self.finished:
+            return False
+
+        now = time.monotonic()
+        if self.speed is None:
+            deadline = now + self.time_budget
+            while not self.finished and time.monotonic() < deadline:
+                self._play(self.block_size)
+        else:
+            # Pauses longer than max_catch_up are not made up for
+            elapsed = 0.0 if self._last_advance is None else min(now - self._last_advance, self.max_catch_up)
+            self._due += elapsed * self.speed * self.recording.sample_rate
+            count = int(self._due)
+            self._due -= count
+            while count > 0 and not self.finished:
+                count -= self._play(min(count, self.block_size))
+        self._last_advance = now
+        return not self.finished
+
+    def _play(self, count):
+        """Feeds the next `count` samples to the model as one block; returns how many there were."""
+        block = self.recording.read(self.position, count)
+        self.position += block.shape[1]
+        if block.shape[1]:
+            self._model.append_block(block)
+        return block.shape[1]
@@ -0,0 +1,45 @@
+from PyQt6.QtCore import QObject, QTimer, Qt, pyqtSignal
+
+DEFAULT_FPS = 30
+
+class RenderScheduler(QObject):
+    """
+    Coalesces model updates to the display refresh rate.
+
+    The model may publish hundreds of snapshots per second. Only the newest
+    one is kept, and it is forwarded once per frame through `frame_ready`.
+    The frame timer stops itself when no updates arrive, so an idle
+    dashboard does not keep waking the GUI thread.
+    """
+    frame_ready = pyqtSignal(object) # DataSnapshot
+
+    def __init__(self, fps=DEFAULT_FPS, parent=None):
+        super().__init__(parent)
+        self._pending = None
+        self._frame_timer = QTimer(self)
+        self._frame_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._frame_timer.timeout.connect(self._on_frame)
+        self.set_fps(fps)
+
+    def set_fps(self, fps):
+        """Changes the target frame rate (e.g. 30 or 60)."""
+        self.fps = fps
+        self._frame_timer.setInterval(max(1, round(1000 / fps)))
+
+    def submit(self, data):
+        """Queues the latest snapshot, replacing any not yet rendered."""
+        self._pending = data
+        if not self._frame_timer.isActive():
+            self._frame_timer.start()
+
+    def flush(self):
+        """Renders the pending snapshot immediately, if there is one."""
+        if self._pending is not None:
+            data, self._pending = self._pending, None
+            self.frame_ready.emit(data)
+
+    def _on_frame(self):
+        if self._pending is None:
+            self._frame_timer.stop()
+            return
+        self.flush()
@@ -0,0 +1,341 @@
+"""
+Vector PDF session reports.
+
+Reports are drawn with QPainter on a QPdfWriter straight from session data
+(never from screen captures), so text and traces stay sharp at any zoom
+and rendering can run on a QThreadPool worker while the dashboard keeps
+updating. The data is copied into a ReportData on the GUI thread first,
+which takes well under a millisecond.
+
+Batch mode renders reports for many recordings in parallel, headless:
+
+    python report.py ~/NeuroTrack/recordings/* --output-dir reports
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+from PyQt6.QtCore import QObject, QPointF, QRectF, QRunnable, QThreadPool, Qt, pyqtSignal
+from PyQt6.QtGui import QColor, QFont, QPageSize, QPainter, QPainterPath, QPdfWriter, QPen, QPolygonF
+
+from model import STATE_COLORS
+
+EXCERPT_SECONDS = 10 # Length of the waveform excerpt
+TREND_POINTS = 600 # Buckets of the trend chart
+MAX_EXCERPT_CHANNELS = 8
+PDF_RESOLUTION = 300
+
+class ReportData:
+    """Everything a report shows, copied out of the model or a recording."""
+    def __init__(self, patient_name, patient_id, created, session_time, sample_rate, waveform,
+                 band_names, band_powers, alpha_beta_ratio, cognitive_state,
+                 trend_times, trend_mean, trend_min, trend_max, state_log):
+        self.patient_name = patient_name
+        self.patient_id = patient_id
+        self.created = created
+        self.session_time = session_time # Milliseconds
+        self.sample_rate = sample_rate
+        self.waveform = waveform # Channels x samples excerpt
+        self.band_names = band_names
+        self.band_powers = band_powers
+        self.alpha_beta_ratio = alpha_beta_ratio
+        self.cognitive_state = cognitive_state
+        self.trend_times = trend_times # Seconds
+        self.trend_mean = trend_mean
+        self.trend_min = trend_min
+        self.trend_max = trend_max
+        self.state_log = state_log # [(session time in ms, state name)], one entry per change
+
+    @classmethod
+    def from_model(cls, model):
+        """Copies the live session; call on the thread that owns the model."""
+        # Raw, like the excerpt of a recording, and longer than the live window
+        waveform = model.samples.latest(EXCERPT_SECONDS * model.sample_rate)[:MAX_EXCERPT_CHANNELS]
+        series = model.trend.query(0, model.session_time / 1000, max_points=TREND_POINTS)
+        return cls(model.patient_name, model.patient_id, datetime.now(), model.session_time, model.sample_rate,
+                   np.array(waveform), tuple(model.band_names), np.array(model.band_powers),
+                   model.alpha_beta_ratio, model.cognitive_state, np.array(series.times),
+                   np.array(series.mean[0]), np.array(series.minimum[0]), np.array(series.maximum[0]),
+                   list(model.state_log))
+
+    @classmethod
+    def from_recording(cls, recording):
+        """Summarizes a stored session without loading more of it than needed."""
+        metrics = recording.metrics
+        excerpt = recording.samples[-EXCERPT_SECONDS * recording.sample_rate:, :MAX_EXCERPT_CHANNELS]
+        created = datetime.fromisoformat(recording.index.get("startedAt", datetime.now().isoformat()))
+        names = recording.state_names
+        if len(metrics) == 0:
+            empty = np.empty(0)
+            return cls("", recording.index.get("patientId", ""), created, 0.0, recording.sample_rate,
+                       np.asarray(excerpt, dtype=np.float64).T, tuple(recording.index["bands"]),
+                       np.zeros(len(recording.index["bands"])), 1.0, "Idle", empty, empty, empty, empty, [])
+
+        # Min/mean/max of the ratio over equal-sized buckets of metric records
+        bucket = max(1, len(metrics) // TREND_POINTS)
+        usable = len(metrics) // bucket * bucket
+        ratio = np.asarray(metrics['ratio'][:usable], dtype=np.float64).reshape(-1, bucket)
+        times = np.asarray(metrics['session_time'][:usable:bucket]) / 1000
+
+        states = np.asarray(metrics['state'])
+        changes = np.concatenate(([0], np.flatnonzero(np.diff(states)) + 1))
+        state_log = [(float(metrics['session_time'][i]), names[states[i]] if states[i] < len(names) else "Idle")
+                     for i in changes]
+
+        last = metrics[-1]
+        return cls("", recording.index.get("patientId", ""), created, float(last['session_time']),
+                   recording.sample_rate, np.asarray(excerpt, dtype=np.float64).T,
+                   tuple(recording.index["bands"]), np.asarray(last['band_powers'], dtype=np.float64),
+                   float(last['ratio']), state_log[-1][1], times, ratio.mean(axis=1),
+                   ratio.min(axis=1), ratio.max(axis=1), state_log)
+
+# --- Rendering ---
+
+def _format_duration(ms):
+    seconds = int(ms / 1000)
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+def _polyline(x, y, rect, x_range, y_range):
+    """Maps data points into `rect` as a QPolygonF (y grows upwards)."""
+    (x0, x1), (y0, y1) = x_range, y_range
+    px = rect.left() + (np.asarray(x, dtype=np.float64) - x0) / ((x1 - x0) or 1) * rect.width()
+    py = rect.bottom() - (np.asarray(y, dtype=np.float64) - y0) / ((y1 - y0) or 1) * rect.height()
+    return QPolygonF([QPointF(a, b) for a, b in zip(px.tolist(), py.tolist())])
+
+class ReportRenderer:
+    """Lays out and draws one report onto a QPdfWriter."""
+    def __init__(self, data):
+        self.data = data
+
+    def write(self, path):
+        writer = QPdfWriter(path)
+        writer.setPageSize(QPageSize(QPageSize.PageSizeId.A4))
+        writer.setResolution(PDF_RESOLUTION)
+        writer.setTitle(f"NeuroTrack Session Report {self.data.patient_id}")
+        writer.setCreator("NeuroTrack")
+
+        painter = QPainter(writer)
+        try:
+            page = QRectF(writer.pageLayout().paintRectPixels(writer.resolution()))
+            page.moveTo(0, 0)
+            self.render(painter, page)
+        finally:
+            painter.end()
+
+    def render(self, painter, page):
+        """Draws the report into `page` on any paint device."""
+        self._unit = page.width() / 180 # About one millimetre
+        top = self._draw_header(painter, page)
+        sections = [(self._draw_waveform, 60), (self._draw_band_powers, 45),
+                    (self._draw_trend, 50), (self._draw_state_timeline, 22)]
+        for draw, height in sections:
+            rect = QRectF(page.left(), top, page.width(), height * self._unit)
+            draw(painter, rect)
+            top = rect.bottom() + 6 * self._unit
+
+    # --- Drawing helpers ---
+
+    def _font(self, size_mm, bold=False):
+        font = QFont("Helvetica")
+        font.setPixelSize(max(1, round(size_mm * self._unit)))
+        font.setBold(bold)
+        return font
+
+    def _pen(self, color, width_mm=0.3):
+        return QPen(QColor(color), width_mm * self._unit)
+
+    def _section(self, painter, rect, title):
+        """Draws the section title and frame; returns the plot area inside it."""
+        painter.setFont(self._font(4, bold=True))
+        painter.setPen(QColor("#1F2937"))
+        title_height = 7 * self._unit
+        painter.drawText(QRectF(rect.left(), rect.top(), rect.width(), title_height),
+                         Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, title)
+        plot = QRectF(rect.left(), rect.top() + title_height, rect.width(), rect.height() - title_height)
+        painter.setPen(self._pen("#E5E7EB"))
+        painter.drawRect(plot)
+        return plot.adjusted(2 * self._unit, 2 * self._unit, -2 * self._unit, -2 * self._unit)
+
+    def _draw_header(self, painter, page):
+        data = self.data
+        painter.setPen(QColor("#1F2937"))
+        painter.setFont(self._font(8, bold=True))
+        painter.drawText(QRectF(page.left(), page.top(), page.width(), 12 * self._unit),
+                         Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, "NeuroTrack Session Report")
+
+        lines = [
+            ("Patient", f"{data.patient_name} ({data.patient_id})" if data.patient_name else data.patient_id),
+            ("Session", f"{data.created:%Y-%m-%d %H:%M}, duration {_format_duration(data.session_time)}"),
+            ("Final state", f"{data.cognitive_state}, alpha/beta ratio {data.alpha_beta_ratio:.2f}"),
+        ]
+        top = page.top() + 14 * self._unit
+        for label, value in lines:
+            painter.setFont(self._font(3.5))
+            painter.setPen(QColor("#4B5563"))
+            painter.drawText(QPointF(page.left(), top), f"{label}:")
+            painter.setFont(self._font(3.5, bold=True))
+            painter.setPen(QColor("#111827"))
+            painter.drawText(QPointF(page.left() + 28 * self._unit, top), value)
+            top += 6 * self._unit
+        return top + 2 * self._unit
+
+    def _draw_waveform(self, painter, rect):
+        waveform = self.data.waveform
+        plot = self._section(painter, rect, f"EEG Waveform (last {waveform.shape[1] / self.data.sample_rate:.0f} s)")
+        if waveform.size == 0:
+            return
+        channels, samples = waveform.shape
+        lane = plot.height() / channels
+        t = np.arange(samples) / self.data.sample_rate
+        painter.setPen(self._pen("#3B82F6", 0.2))
+        for channel in range(channels):
+            trace = waveform[channel] - np.median(waveform[channel])
+            limit = max(np.abs(trace).max(), 1e-9)
+            lane_rect = QRectF(plot.left(), plot.top() + channel * lane, plot.width(), lane)
+            painter.drawPolyline(_polyline(t, trace, lane_rect, (0, t[-1]), (-limit, limit)))
+
+    def _draw_band_powers(self, painter, rect):
+        data = self.data
+        plot = self._section(painter, rect, "Band Power")
+        powers = np.asarray(data.band_powers, dtype=np.float64)
+        top_power = max(powers.max(), 1e-12)
+        slot = plot.width() / len(powers)
+        label_height = 6 * self._unit
+        bar_area = plot.height() - 2 * label_height
+        painter.setFont(self._font(3))
+        for i, (name, power) in enumerate(zip(data.band_names, powers)):
+            height = power / top_power * bar_area
+            bar = QRectF(plot.left() + (i + 0.2) * slot, plot.top() + label_height + bar_area - height, 0.6 * slot, height)
+            painter.fillRect(bar, QColor("#6366F1"))
+            painter.setPen(QColor("#111827"))
+            painter.drawText(QRectF(bar.left(), bar.top() - label_height, bar.width(), label_height),
+                             Qt.AlignmentFlag.AlignCenter, f"{power:.3g}")
+            painter.setPen(QColor("#4B5563"))
+            painter.drawText(QRectF(plot.left() + i * slot, plot.bottom() - label_height, slot, label_height),
+                             Qt.AlignmentFlag.AlignCenter, name)
+
+    def _draw_trend(self, painter, rect):
+        data = self.data
+        plot = self._section(painter, rect, "Alpha/Beta Ratio Trend")
+        if len(data.trend_times) < 2:
+            return
+        x_range = (0, max(data.trend_times[-1], 1e-9))
+        y_range = (min(data.trend_min.min(), 0), max(data.trend_max.max(), 1e-9))
+
+        envelope = QPainterPath()
+        envelope.addPolygon(_polyline(np.concatenate((data.trend_times, data.trend_times[::-1])),
+                                      np.concatenate((data.trend_max, data.trend_min[::-1])), plot, x_range, y_range))
+        painter.fillPath(envelope, QColor("#E0E7FF"))
+        painter.setPen(self._pen("#6366F1", 0.4))
+        painter.drawPolyline(_polyline(data.trend_times, data.trend_mean, plot, x_range, y_range))
+
+        painter.setPen(QColor("#4B5563"))
+        painter.setFont(self._font(2.8))
+        painter.drawText(plot, Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignLeft,
+                         f"{y_range[1]:.2f}")
+        painter.drawText(plot, Qt.AlignmentFlag.AlignBottom | Qt.AlignmentFlag.AlignRight,
+                         _format_duration(x_range[1] * 1000))
+
+    def _draw_state_timeline(self, painter, rect):
+        data = self.data
+        plot = self._section(painter, rect, "Cognitive State Timeline")
+        if not data.state_log or data.session_time <= 0:
+            return
+        bar = QRectF(plot.left(), plot.top(), plot.width(), plot.height() * 0.45)
+        scale = bar.width() / data.session_time
+        ends = [start for start, _ in data.state_log[1:]] + [data.session_time]
+        for (start, state), end in zip(data.state_log, ends):
+            segment = QRectF(bar.left() + start * scale, bar.top(), max((end - start) * scale, 0.2 * self._unit), bar.height())
+            painter.fillRect(segment, QColor(STATE_COLORS.get(state, STATE_COLORS["Idle"])))
+
+        # Legend of the states that occurred
+        painter.setFont(self._font(2.8))
+        x = plot.left()
+        legend_top = bar.bottom() + 2 * self._unit
+        swatch = 3 * self._unit
+        states = list(dict.fromkeys(state for _, state in data.state_log))
+        slot = min(45 * self._unit, plot.width() / len(states))
+        for state in states:
+            painter.fillRect(QRectF(x, legend_top, swatch, swatch), QColor(STATE_COLORS.get(state, STATE_COLORS["Idle"])))
+            painter.setPen(QColor("#111827"))
+            text_rect = QRectF(x + swatch + self._unit, legend_top - self._unit, slot - swatch - self._unit, swatch + 2 * self._unit)
+            painter.drawText(text_rect, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, state)
+            x += slot
+
+# --- Background rendering ---
+
+class _ReportSignals(QObject):
+    finished = pyqtSignal(str) # Output path
+    failed = pyqtSignal(str, str) # Output path, error message
+
+class ReportTask(QRunnable):
+    """Renders one report on a QThreadPool thread."""
+    def __init__(self, data, path):
+        super().__init__()
+        self.data = data
+        self.path = path
+        self.error = None
+        self.signals = _ReportSignals()
+
+    def run(self):
+        try:
+            ReportRenderer(self.data).write(self.path)
+        except Exception as error: # Reported back to the GUI thread instead of lost in the pool
+            self.error = str(error)
+            self.signals.failed.emit(self.path, self.error)
+        else:
+            self.signals.finished.emit(self.path)
+
+def generate_batch(recording_paths, output_dir, pool=None):
+    """
+    Renders a report for every recording in parallel and waits for all of
+    them. Returns a list of (recording path, report path, error or None).
+    """
+    from recording import Recording
+
+    pool = pool or QThreadPool.globalInstance()
+    os.makedirs(output_dir, exist_ok=True)
+    results = []
+    tasks = []
+    for recording_path in recording_paths:
+        report_path = os.path.join(output_dir, os.path.basename(os.path.normpath(recording_path)) + ".pdf")
+        try:
+            data = ReportData.from_recording(Recording(recording_path))
+        except (OSError, ValueError, KeyError) as error:
+            results.append((recording_path, report_path, str(error)))
+            continue
+        task = ReportTask(data, report_path)
+        task.setAutoDelete(False)
+        tasks.append((recording_path, task))
+        pool.start(task)
+    pool.waitForDone()
+    results += [(recording_path, task.path, task.error) for recording_path, task in tasks]
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render PDF reports for recorded NeuroTrack sessions")
+    parser.add_argument('recordings', nargs='+', help="Recording directories")
+    parser.add_argument('--output-dir', default='reports', help="Where to write the PDFs (default: %(default)s)")
+    parser.add_argument('--threads', type=int, help="Reports rendered at once (default: one per core)")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtGui import QGuiApplication
+    app = QGuiApplication(sys.argv[:1]) # Fonts need a GUI application, but no window is shown
+
+    pool = QThreadPool()
+    if args.threads:
+        pool.setMaxThreadCount(args.threads)
+    failures = 0
+    for recording_path, report_path, error in generate_batch(args.recordings, args.output_dir, pool):
+        if error:
+            failures += 1
+            print(f"FAILED {recording_path}: {error}")
+        else:
+            print(f"{recording_path} -> {report_path}")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
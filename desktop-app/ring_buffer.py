@@ -0,0 +1,80 @@
+import numpy as np
+
+
+class RingBuffer:
+    """
+    A preallocated circular buffer holding the most recent `capacity` samples.
+
+    Samples are written linearly into a backing store twice the window size.
+    When the store fills up, the live window is folded back to the front, so
+    appending never allocates and the window is always one contiguous slice
+    that consumers can read without copying.
+
+    With `channels` set, the buffer is a channels x samples array and every
+    operation applies to all channels at once.
+
+    Appends only write past the end of the current window, so a view keeps
+    its contents until the next fold or reset. Both bump `generation`,
+    which lets readers detect that an older view may have been overwritten.
+    """
+    def __init__(self, capacity, dtype=np.float64, fill=0.0, channels=None):
+        self.capacity = int(capacity)
+        self.channels = channels
+        self.fill = fill
+        shape = (2 * self.capacity,) if channels is None else (channels, 2 * self.capacity)
+        self._store = np.full(shape, fill, dtype=dtype)
+        self._end = self.capacity  # The window is _store[_end - capacity:_end]
+        self.total_written = 0
+        self.generation = 0
+
+    def append_block(self, samples):
+        """
+        Appends a whole block of samples in one vectorized copy.
+        Multi-channel buffers take a channels x samples block.
+        """
+        samples = np.asarray(samples, dtype=self._store.dtype)
+        if self.channels is None:
+            samples = samples.ravel()
+        else:
+            samples = samples.reshape(self.channels, -1)
+        count = samples.shape[-1]
+        if count == 0:
+            return
+
+        store = self._store
+        if count >= self.capacity:
+            # Only the newest `capacity` samples survive, so start over
+            self.generation += 1
+            store[..., :self.capacity] = samples[..., -self.capacity:]
+            self._end = self.capacity
+        else:
+            if self._end + count > store.shape[-1]:
+                # Fold the samples that stay in the window back to the front
+                keep = self.capacity - count
+                self.generation += 1
+                store[..., :keep] = store[..., self._end - keep:self._end]
+                self._end = keep
+            store[..., self._end:self._end + count] = samples
+            self._end += count
+
+        self.total_written += count
+
+    def view(self):
+        """Returns the current window, oldest sample first, as a read-only view."""
+        window = self._store[..., self._end - self.capacity:self._end]
+        window.flags.writeable = False
+        return window
+
+    def latest(self):
+        """Returns the most recently appended sample (one per channel)."""
+        return self._store[..., self._end - 1]
+
+    def reset(self):
+        """Refills the buffer with its initial value without reallocating."""
+        self.generation += 1
+        self._store.fill(self.fill)
+        self._end = self.capacity
+        self.total_written = 0
+
+    def __len__(self):
+        return self.capacity
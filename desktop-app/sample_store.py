@@ -0,0 +1,158 @@
+"""
+Compressed in-memory storage of whole-session samples.
+
+A day of 16-channel EEG at 250 Hz is 2.8 GB as float64. Here samples are
+quantized to int16 at the ADC's resolution and collected in fixed-size
+chunks. Each closed chunk is delta-encoded along time and
+zlib-compressed. EEG changes little from one sample to the next, so the
+deltas are small numbers that compress far better than the samples
+themselves. Only the open chunk (the hot tail) stays uncompressed. Reads
+decompress just the chunks they touch and keep the most recently decoded
+ones in an LRU cache.
+"""
+import zlib
+from collections import OrderedDict, deque
+
+import numpy as np
+
+ADC_RESOLUTION_UV = 1.0 # One ADC count; device samples are stored losslessly
+CHUNK_SAMPLES = 4096 # Per channel; 16 s at 250 Hz
+CACHE_CHUNKS = 16 # Decoded chunks kept for repeated reads
+COMPRESSION_LEVEL = 1 # zlib; higher levels gain little on delta-encoded EEG
+DEFAULT_RETENTION_S = 24 * 3600
+
+def _encode(quantized):
+    """Delta-encodes a channels x samples int16 chunk and compresses it."""
+    delta = np.empty_like(quantized)
+    delta[:, 0] = quantized[:, 0]
+    np.subtract(quantized[:, 1:], quantized[:, :-1], out=delta[:, 1:]) # Wraps around, as decoding does
+    return zlib.compress(delta.tobytes(), COMPRESSION_LEVEL)
+
+def _decode(data, channels):
+    delta = np.frombuffer(zlib.decompress(data), dtype=np.int16).reshape(channels, -1)
+    return np.cumsum(delta, axis=1, dtype=np.int16)
+
+class CompressedSampleStore:
+    """
+    All samples of a session, as channels x samples blocks, with random
+    access by absolute sample index.
+
+    Samples outside ±32767 * resolution are clipped. The oldest chunks are
+    dropped once more than `retention_s` is held, so memory stays bounded
+    however long the application runs.
+
+    Args:
+        resolution: μV per stored step.
+        retention_s: How much of the session is kept (at `sample_rate`).
+    """
+    def __init__(self, channels, sample_rate, resolution=ADC_RESOLUTION_UV, chunk_samples=CHUNK_SAMPLES,
+                 cache_chunks=CACHE_CHUNKS, retention_s=DEFAULT_RETENTION_S):
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.resolution = resolution
+        self.chunk_samples = chunk_samples
+        self.max_chunks = max(1, int(retention_s * sample_rate) // chunk_samples)
+        self._chunks = deque() # Compressed closed chunks, oldest first
+        self._first_chunk = 0 # Index of _chunks[0] since the start of the session
+        self._tail = np.empty((channels, chunk_samples), dtype=np.int16)
+        self._tail_length = 0
+        self._cache = OrderedDict() # Chunk index -> decoded int16 chunk
+        self._cache_chunks = cache_chunks
+        self.compressed_bytes = 0
+
+    @property
+    def total(self):
+        """Index one past the newest sample."""
+        return (self._first_chunk + len(self._chunks)) * self.chunk_samples + self._tail_length
+
+    @property
+    def oldest(self):
+        """Index of the oldest sample still held."""
+        return self._first_chunk * self.chunk_samples
+
+    @property
+    def nbytes(self):
+        """Memory used by the samples, compressed chunks and tail together."""
+        return self.compressed_bytes + self._tail.nbytes
+
+    def append(self, samples):
+        """Adds a channels x samples block (in μV)."""
+        samples = np.asarray(samples, dtype=np.float64).reshape(self.channels, -1)
+        quantized = np.clip(np.round(samples / self.resolution), -32767, 32767).astype(np.int16)
+        while quantized.shape[1]:
+            take = min(quantized.shape[1], self.chunk_samples - self._tail_length)
+            self._tail[:, self._tail_length:self._tail_length + take] = quantized[:, :take]
+            self._tail_length += take
+            quantized = quantized[:, take:]
+            if self._tail_length == self.chunk_samples:
+                self._close_chunk()
+
+    def _close_chunk(self):
+        index = self._first_chunk + len(self._chunks)
+        data = _encode(self._tail)
+        self._chunks.append(data)
+        self.compressed_bytes += len(data)
+        # The chunk just closed is the likeliest to be read next
+        self._remember(index, self._tail.copy())
+        self._tail_length = 0
+        if len(self._chunks) > self.max_chunks:
+            self.compressed_bytes -= len(self._chunks.popleft())
+            self._cache.pop(self._first_chunk, None)
+            self._first_chunk += 1
+
+    def _remember(self, index, chunk):
+        self._cache[index] = chunk
+        self._cache.move_to_end(index)
+        while len(self._cache) > self._cache_chunks:
+            self._cache.popitem(last=False)
+
+    def _chunk(self, index):
+        """Returns closed chunk `index` decoded, from the cache if possible."""
+        chunk = self._cache.get(index)
+        if chunk is None:
+            chunk = _decode(self._chunks[index - self._first_chunk], self.channels)
+            self._remember(index, chunk)
+        else:
+            self._cache.move_to_end(index)
+        return chunk
+
+    def read(self, start, end):
+        """
+        Returns samples [start, end) as a channels x samples float64 array
+        in μV, clipped to what is held.
+        """
+        start, end = max(int(start), self.oldest), min(int(end), self.total)
+        out = np.empty((self.channels, max(end - start, 0)))
+        position = start
+        while position < end:
+            index, offset = divmod(position, self.chunk_samples)
+            if index < self._first_chunk + len(self._chunks):
+                source = self._chunk(index)
+            else:
+                source = self._tail[:, :self._tail_length]
+            take = min(end - position, source.shape[1] - offset)
+            np.multiply(source[:, offset:offset + take], self.resolution, out=out[:, position - start:position - start + take])
+            position += take
+        return out
+
+    def latest(self, count):
+        """Returns the newest `count` samples (fewer if not that many are held)."""
+        return self.read(self.total - count, self.total)
+
+    def reset(self):
+        self._chunks.clear()
+        self._first_chunk = 0
+        self._tail_length = 0
+        self._cache.clear()
+        self.compressed_bytes = 0
+
+    def stats(self):
+        """Returns the store's size and compression as a dictionary."""
+        held = self.total - self.oldest
+        return {
+            "samples": held,
+            "chunks": len(self._chunks),
+            "compressedBytes": self.compressed_bytes,
+            "bytesPerSample": self.nbytes / max(held * self.channels, 1),
+            "cachedChunks": len(self._cache),
+        }
@@ -0,0 +1,168 @@
+"""
+Clock-driven pacing of sample streams.
+
+Timers cannot be trusted to fire on time: a 4 ms Qt timer on a busy GUI
+thread fires late or not at all, and a stream that produces one sample
+per tick falls behind. Here the number of samples is derived from the
+monotonic clock instead. Every wake-up produces all the samples that have
+become due since the previous one, as one batch, so after t seconds of
+running there are always t * sample_rate samples, however irregular the
+wake-ups were.
+"""
+import threading
+import time
+
+from acquisition import SampleQueue
+
+DEFAULT_INTERVAL_S = 0.01 # Nominal wake-up period of the acquisition thread
+METRIC_SMOOTHING = 0.05 # Weight of the newest wake-up in the averaged jitter and lag
+
+class ClockScheduler:
+    """
+    Counts the samples due at `sample_rate` by the monotonic clock, and
+    measures how regularly it is asked.
+
+    Metrics, in seconds:
+        jitter: How far the time between two wake-ups was from `interval_s`.
+        lag: How long the oldest sample of a batch had been due when the
+            batch was produced.
+    Each is kept as the latest value, a running average and a maximum.
+    """
+    def __init__(self, sample_rate, interval_s=DEFAULT_INTERVAL_S, clock=time.monotonic):
+        self.sample_rate = sample_rate
+        self.interval_s = interval_s
+        self._clock = clock
+        self.produced = 0
+        self._origin = None # Clock time of sample 0, shifted by any pauses
+        self._last_wake = None
+        self.wakeups = 0
+        self.jitter = self.mean_jitter = self.max_jitter = 0.0
+        self.lag = self.mean_lag = self.max_lag = 0.0
+
+    @property
+    def running(self):
+        return self._origin is not None
+
+    def start(self):
+        """Starts or resumes the count; time spent paused is not made up for."""
+        self._origin = self._clock() - self.produced / self.sample_rate
+        self._last_wake = None
+
+    def pause(self):
+        self._origin = None
+
+    def due(self):
+        """Returns how many samples have become due since the last call (0 while paused)."""
+        if self._origin is None:
+            return 0
+        now = self._clock()
+        self.wakeups += 1
+        if self._last_wake is not None:
+            self.jitter = abs(now - self._last_wake - self.interval_s)
+            self.mean_jitter += METRIC_SMOOTHING * (self.jitter - self.mean_jitter)
+            self.max_jitter = max(self.max_jitter, self.jitter)
+        self._last_wake = now
+
+        target = int((now - self._origin) * self.sample_rate)
+        count = target - self.produced
+        if count <= 0:
+            return 0
+        self.lag = now - (self._origin + (self.produced + 1) / self.sample_rate)
+        self.mean_lag += METRIC_SMOOTHING * (self.lag - self.mean_lag)
+        self.max_lag = max(self.max_lag, self.lag)
+        self.produced = target
+        return count
+
+    def stats(self):
+        """Returns the pacing metrics as a dictionary, in milliseconds."""
+        return {
+            "wakeups": self.wakeups,
+            "samplesDue": self.produced,
+            "jitterMs": self.mean_jitter * 1000,
+            "maxJitterMs": self.max_jitter * 1000,
+            "lagMs": self.mean_lag * 1000,
+            "maxLagMs": self.max_lag * 1000,
+        }
+
+class SimulatedAcquisition(threading.Thread):
+    """
+    Generates simulated EEG on a dedicated thread, paced by a ClockScheduler.
+
+    Has the same interface as `acquisition.SerialAcquisition`: samples are
+    pushed into `queue`, which the GUI thread drains on its own schedule, so
+    a busy GUI delays samples but never loses or slows them.
+
+    Args:
+        signal: The sample source, e.g. a simulator.SimulatedSignal; its
+            `generate(count)` is only ever called from this thread.
+        speed: Multiple of real time to produce samples at, or None for
+            unbounded: as fast as the consumer drains them, keeping the
+            queue half full (for load tests; nothing is dropped).
+    """
+    port = "SIMULATED"
+
+    def __init__(self, signal, interval_s=DEFAULT_INTERVAL_S, queue_capacity=8192, speed=1.0):
+        super().__init__(name="SimulatedAcquisition", daemon=True)
+        self.signal = signal
+        self.speed = speed
+        self.scheduler = ClockScheduler(signal.sample_rate * (speed or 1.0), interval_s)
+        self.queue = SampleQueue(queue_capacity, channels=signal.channels)
+        self.error = None
+
+        self._stop_event = threading.Event()
+        self._forwarding = threading.Event()
+        self._restart = threading.Event()
+
+    def set_forwarding(self, enabled):
+        """Starts or pauses the stream; paused time produces no samples."""
+        if enabled:
+            self._forwarding.set()
+        else:
+            self._forwarding.clear()
+
+    def restart(self):
+        """Restarts the signal from its beginning before the next samples, e.g. for a new session."""
+        self._restart.set()
+
+    def stop(self):
+        """Asks the thread to exit after its current wake-up."""
+        self._stop_event.set()
+
+    def run(self):
+        interval = self.scheduler.interval_s
+        next_wake = time.monotonic()
+        while not self._stop_event.is_set():
+            if self._restart.is_set():
+                # Only this thread touches the signal
+                self._restart.clear()
+                self.signal.reset()
+            generation = self.queue.generation # Before the forwarding check, see SampleQueue
+            forwarding = self._forwarding.is_set()
+            if forwarding != self.scheduler.running:
+                if forwarding:
+                    self.scheduler.start()
+                else:
+                    self.scheduler.pause()
+            count = self.scheduler.due()
+            if self.speed is None:
+                count = max(self.queue.capacity // 2 - len(self.queue), 0) if forwarding else 0
+            if count:
+                self.queue.push(self.signal.generate(count), generation)
+
+            next_wake += interval
+            delay = next_wake - time.monotonic()
+            if delay < 0:
+                # Overslept: the scheduler has already caught up on samples,
+                # so do not also try to catch up on wake-ups
+                next_wake -= delay
+            self._stop_event.wait(max(delay, 0.0))
+
+    def stats(self):
+        """Returns the acquisition counters and pacing metrics as a dictionary."""
+        return {
+            **self.scheduler.stats(),
+            "overflowEvents": self.queue.overflow_events,
+            "droppedSamples": self.queue.dropped_samples,
+            "queued": len(self.queue),
+            "error": self.error,
+        }
@@ -0,0 +1,263 @@
+"""
+Deterministic, scripted EEG simulation for demos, load and regression tests.
+
+A scenario scripts how the alpha and beta rhythms evolve (keyframes of
+their amplitude over session time) and which artifacts occur: eye blinks,
+mains interference and electrode pops. `SimulatedSignal` renders a
+scenario block by block with vectorized NumPy. All randomness comes from
+Generators seeded from one seed, and is drawn so that the samples do not
+depend on how the session is cut into blocks. The same seed therefore
+gives the same session at any speed and with any acquisition timing.
+
+    python simulator.py --list
+    python simulator.py --scenario acute-drop --channels 32 --seconds 600 --seed 7
+    python simulator.py --scenario blinks --realtime --seconds 30
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+DEFAULT_SAMPLE_RATE = 250
+ALPHA_HZ = 10
+BETA_HZ = 22
+ALPHA_UV = 15.0 # Rhythm amplitudes at a keyframe multiplier of 1
+BETA_UV = 8.0
+NOISE_UV = 3.0 # Standard deviation of the background noise
+MAINS_HZ = 50
+
+# Artifact shapes
+BLINK_UV = (100.0, 200.0) # Range of blink amplitudes on the most frontal channel
+BLINK_WIDTH_S = 0.08 # Standard deviation of the Gaussian deflection
+POP_UV = (200.0, 600.0) # Range of electrode pop step sizes
+POP_DECAY_S = 0.3 # Time constant of the decay back to baseline
+
+class Scenario:
+    """
+    A scripted session.
+
+    Args:
+        alpha, beta: Keyframes [(session time in s, amplitude multiplier)],
+            linearly interpolated and held after the last one.
+        alpha_modulation, beta_modulation: (depth, period in s) of a slow
+            sinusoidal waxing and waning on top of the keyframes.
+        blink_interval_s, pop_interval_s: Mean time between blinks and
+            between electrode pops (None for none); actual intervals vary
+            randomly by ±50%.
+        line_noise_uv: Amplitude of mains interference.
+    """
+    def __init__(self, description, alpha=((0, 1.0),), beta=((0, 1.0),), alpha_modulation=(0.1, 8.0),
+                 beta_modulation=(0.1, 5.0), blink_interval_s=None, pop_interval_s=None, line_noise_uv=0.0):
+        self.description = description
+        self.alpha = np.array(alpha, dtype=np.float64).T
+        self.beta = np.array(beta, dtype=np.float64).T
+        self.alpha_modulation = alpha_modulation
+        self.beta_modulation = beta_modulation
+        self.blink_interval_s = blink_interval_s
+        self.pop_interval_s = pop_interval_s
+        self.line_noise_uv = line_noise_uv
+
+# A relaxed patient: strong alpha, little beta
+_REST = dict(alpha=((0, 1.3),), beta=((0, 0.75),))
+
+SCENARIOS = {
+    "default": Scenario("Alpha and beta wax and wane, cycling through the cognitive states",
+                        alpha_modulation=(10 / 15, 10 * np.pi), beta_modulation=(6 / 8, 3 * np.pi)),
+    "rest": Scenario("Steady relaxed rest", **_REST),
+    "stress": Scenario("Rest, then from 30 s alpha fades and beta grows over three minutes",
+                       alpha=((0, 1.3), (30, 1.3), (210, 0.4)), beta=((0, 0.75), (30, 0.75), (210, 1.6))),
+    "acute-drop": Scenario("Rest, an abrupt alpha drop at 60 s, recovery from 120 s",
+                           alpha=((0, 1.3), (60, 1.3), (61, 0.3), (120, 0.3), (125, 1.3)), beta=((0, 0.75),)),
+    "blinks": Scenario("Rest with an eye blink every few seconds", blink_interval_s=4.0, **_REST),
+    "line-noise": Scenario(f"Rest with strong {MAINS_HZ} Hz mains interference", line_noise_uv=30.0, **_REST),
+    "electrode-pop": Scenario("Rest with an electrode pop on a random channel every ~15 s",
+                              pop_interval_s=15.0, **_REST),
+}
+
+class _EventTrain:
+    """
+    Randomly timed artifacts (blinks or pops) and their contribution to
+    each block. Events are drawn from their own Generator in time order,
+    independent of the block size.
+    """
+    def __init__(self, rng, interval_s, channels, before_s, after_s, pop):
+        self._rng = rng
+        self._interval_s = interval_s
+        self._channels = channels
+        self._before_s = before_s # Extent of an event's shape before and after its time
+        self._after_s = after_s
+        self._pop = pop
+        # Blinks are strongest on the front of the head, i.e. the first channels
+        self._frontal = np.linspace(1.0, 0.2, channels)
+        self._events = [] # (time, per-channel amplitude)
+        self._next = interval_s * rng.uniform(0.5, 1.5)
+
+    def add_to(self, block, t):
+        """Adds the events that overlap block times `t` to the channels x samples `block`."""
+        start, end = t[0], t[-1]
+        while self._next <= end + self._before_s:
+            if self._pop:
+                amplitude = np.zeros(self._channels)
+                amplitude[self._rng.integers(self._channels)] = self._rng.uniform(*POP_UV) * self._rng.choice((-1, 1))
+            else:
+                amplitude = self._frontal * self._rng.uniform(*BLINK_UV)
+            self._events.append((self._next, amplitude))
+            self._next += self._interval_s * self._rng.uniform(0.5, 1.5)
+        self._events = [event for event in self._events if event[0] + self._after_s >= start]
+
+        for event_time, amplitude in self._events:
+            if event_time - self._before_s > end:
+                break
+            # Only the samples within the event's extent, whatever the block
+            first, last = np.searchsorted(t, (event_time - self._before_s, event_time + self._after_s))
+            offset = t[first:last] - event_time
+            if self._pop:
+                shape = np.exp(-offset / POP_DECAY_S)
+            else:
+                shape = np.exp(-0.5 * (offset / BLINK_WIDTH_S) ** 2)
+            block[:, first:last] += amplitude[:, np.newaxis] * shape
+
+class SimulatedSignal:
+    """
+    Renders a scenario as channels x samples blocks of μV.
+
+    It keeps its own clock, so an acquisition thread can own one. `reset()`
+    restarts the same session from its beginning.
+
+    Args:
+        scenario: A name from SCENARIOS, or a Scenario.
+        seed: Seed of all randomness; None picks one at random, available
+            afterwards as `seed` so the session can be reproduced.
+    """
+    def __init__(self, sample_rate=DEFAULT_SAMPLE_RATE, channels=1, scenario="default", seed=None):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.scenario = SCENARIOS[scenario] if isinstance(scenario, str) else scenario
+        self.seed = np.random.SeedSequence(seed).entropy
+        # Simulated channels differ slightly in amplitude and phase. As
+        # g * sin(x + p) = g cos(p) sin(x) + g sin(p) cos(x), every channel is
+        # a mix of the same two waveforms, which are computed only once.
+        gains = np.linspace(1.0, 0.6, channels)
+        phases = np.linspace(0, np.pi / 2, channels)
+        self._mix = np.stack((gains * np.cos(phases), gains * np.sin(phases)), axis=1) # channels x 2
+        self._line_gains = np.linspace(1.0, 0.5, channels)[:, np.newaxis]
+        self.reset()
+
+    def reset(self):
+        noise, blinks, pops = np.random.SeedSequence(self.seed).spawn(3)
+        self._noise = np.random.default_rng(noise)
+        scenario = self.scenario
+        self._blinks = None if scenario.blink_interval_s is None else _EventTrain(
+            np.random.default_rng(blinks), scenario.blink_interval_s, self.channels, 4 * BLINK_WIDTH_S, 4 * BLINK_WIDTH_S, pop=False)
+        self._pops = None if scenario.pop_interval_s is None else _EventTrain(
+            np.random.default_rng(pops), scenario.pop_interval_s, self.channels, 0.0, 10 * POP_DECAY_S, pop=True)
+        self.position = 0 # Samples generated so far
+
+    @property
+    def time(self):
+        """Session time of the next sample, in seconds."""
+        return self.position / self.sample_rate
+
+    def generate(self, count):
+        """Returns the next `count` samples per channel as a channels x samples block."""
+        t = (self.position + np.arange(1, count + 1)) / self.sample_rate
+        self.position += count
+        scenario = self.scenario
+
+        alpha = ALPHA_UV * self._envelope(t, scenario.alpha, scenario.alpha_modulation)
+        beta = BETA_UV * self._envelope(t, scenario.beta, scenario.beta_modulation)
+        alpha_phase = 2 * np.pi * ALPHA_HZ * t
+        beta_phase = 2 * np.pi * BETA_HZ * t
+        waves = np.stack((alpha * np.sin(alpha_phase) + beta * np.sin(beta_phase),
+                          alpha * np.cos(alpha_phase) + beta * np.cos(beta_phase)))
+        block = self._mix @ waves
+        # Drawn sample by sample (all channels of a sample together), so the
+        # stream does not depend on where one block ends and the next starts
+        block += NOISE_UV * self._noise.standard_normal((count, self.channels)).T
+
+        if scenario.line_noise_uv:
+            block += scenario.line_noise_uv * self._line_gains * np.sin(2 * np.pi * MAINS_HZ * t)
+        if self._blinks is not None:
+            self._blinks.add_to(block, t)
+        if self._pops is not None:
+            self._pops.add_to(block, t)
+        return block
+
+    @staticmethod
+    def _envelope(t, keyframes, modulation):
+        times, values = keyframes
+        depth, period = modulation
+        return np.interp(t, times, values) * (1 + depth * np.sin(2 * np.pi * t / period))
+
+def run(scenario, channels, seconds, sample_rate=DEFAULT_SAMPLE_RATE, seed=None, realtime=False):
+    """
+    Plays a scenario through a NeuroDataModel, one analysis update at a time.
+
+    Args:
+        realtime: Pace the samples by the clock, as a device would deliver
+            them; otherwise run as fast as the analysis allows.
+
+    Returns:
+        (model, signal, elapsed wall-clock seconds, seconds with artifacts flagged)
+    """
+    from model import NeuroDataModel
+    from scheduler import ClockScheduler
+
+    model = NeuroDataModel(channel_count=channels, sample_rate=sample_rate)
+    signal = SimulatedSignal(sample_rate, channels, scenario, seed)
+    hop = model.analysis_hop
+    total = int(seconds * sample_rate)
+    clock = ClockScheduler(sample_rate) if realtime else None
+    artifact_samples = 0
+    started = time.perf_counter()
+    if clock is not None:
+        clock.start()
+    while signal.position < total:
+        count = min(hop, total - signal.position)
+        if clock is not None:
+            count = min(clock.due(), total - signal.position)
+            if not count:
+                time.sleep(clock.interval_s)
+                continue
+        model.append_block(signal.generate(count))
+        if model.artifacts.active:
+            artifact_samples += count
+    return model, signal, time.perf_counter() - started, artifact_samples / sample_rate
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play a simulated scenario through the NeuroTrack analysis")
+    parser.add_argument('--scenario', choices=list(SCENARIOS), default='default')
+    parser.add_argument('--channels', type=int, default=1)
+    parser.add_argument('--sample-rate', type=int, default=DEFAULT_SAMPLE_RATE)
+    parser.add_argument('--seconds', type=float, default=300, help="Simulated session length (default: %(default)s)")
+    parser.add_argument('--seed', type=int, help="Seed for a reproducible session (default: random, and printed)")
+    parser.add_argument('--realtime', action='store_true', help="Pace the samples in real time instead of running flat out")
+    parser.add_argument('--list', action='store_true', help="List the scenarios and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, scenario in SCENARIOS.items():
+            print(f"{name:<14} {scenario.description}")
+        return 0
+    model, signal, elapsed, artifact_s = run(args.scenario, args.channels, args.seconds, args.sample_rate,
+                                             args.seed, args.realtime)
+    print(json.dumps({
+        "scenario": args.scenario,
+        "seed": signal.seed,
+        "channels": args.channels,
+        "sampleRate": args.sample_rate,
+        "durationS": model.session_time / 1000,
+        "elapsedS": elapsed,
+        "realtimeFactor": model.session_time / 1000 / elapsed if elapsed else None,
+        "acuteEvents": [round(event.time, 1) for event in model.event_log
+                        if event.field == "Alpha/Beta Ratio" and event.direction < 0],
+        "changeEvents": len(model.event_log),
+        "artifactS": artifact_s,
+        "stateSeconds": model.state_durations(),
+    }))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,47 @@
+class DataSnapshot:
+    """
+    The model state at one update, as handed to the View and other consumers.
+
+    Arrays are read-only views of model buffers, not copies. The waveform
+    view stays intact until its ring buffer next folds or resets, which
+    bumps the buffer's `generation`; `is_valid()` tells a consumer on
+    another thread whether what it just read can still be trusted.
+    `version` increases with every snapshot and `samples_written` only when
+    new samples arrive, so consumers can cheaply skip unchanged data.
+    """
+    __slots__ = (
+        'version', 'generation', 'samples_written', '_buffer',
+        'patient_name', 'patient_id', 'session_time', 'eeg_waveform',
+        'band_names', 'band_powers', 'alpha_beta_ratio', 'channel_ratios',
+        'cognitive_state', 'state_color', 'acute_event', 'sample_rate', 'artifacts',
+    )
+
+    def __init__(self, version, waveform_buffer, patient_name, patient_id, session_time,
+                 band_names, band_powers, alpha_beta_ratio, channel_ratios,
+                 cognitive_state, state_color, acute_event, sample_rate, artifacts=()):
+        self.version = version
+        self._buffer = waveform_buffer
+        self.generation = waveform_buffer.generation
+        self.samples_written = waveform_buffer.total_written
+        self.eeg_waveform = waveform_buffer.view()
+        self.patient_name = patient_name
+        self.patient_id = patient_id
+        self.session_time = session_time
+        self.band_names = band_names
+        self.band_powers = band_powers
+        self.alpha_beta_ratio = alpha_beta_ratio
+        self.channel_ratios = channel_ratios
+        self.cognitive_state = cognitive_state
+        self.state_color = state_color
+        self.acute_event = acute_event
+        self.sample_rate = sample_rate # Of `eeg_waveform`, in Hz
+        self.artifacts = artifacts # Names of the artifacts flagged right now, e.g. ("Blink",)
+
+    def is_valid(self):
+        """True while `eeg_waveform` has not been overwritten by newer samples."""
+        return self._buffer.generation == self.generation
+
+    @property
+    def fft_data(self):
+        """Channel-averaged band powers keyed by band name."""
+        return dict(zip(self.band_names, self.band_powers.tolist()))
@@ -0,0 +1,82 @@
+"""
+Rolling time-frequency image of the session.
+
+Every band power update contributes one column: the channel-averaged
+power spectrum of the newest analysis segment, in dB. Columns are written
+into a circular image buffer that is divided into tiles of TILE_COLUMNS
+columns, each a contiguous block of rows. A display can show every tile
+as its own image and, as columns arrive, re-render only the tile being
+written. Older tiles never change until the buffer wraps around and they
+are reused for new columns.
+"""
+import numpy as np
+
+DEFAULT_WINDOW_S = 300 # Time span kept, and shown, by the spectrogram
+MAX_FREQUENCY_HZ = 40 # EEG content of interest; higher bins are left out
+TILE_COLUMNS = 64
+POWER_FLOOR = 1e-6 # Below this, power is shown as this (in μV²/Hz), avoiding log(0)
+
+class Spectrogram:
+    """
+    A circular buffer of spectrum columns, one per `interval_s` of session time.
+
+    `image` is columns x frequencies (float32 dB, NaN where nothing was
+    written), the column-major layout pyqtgraph's ImageItem expects. Column
+    c of the session is row c % capacity. Columns are addressed by their
+    absolute index (session time / interval_s), so a skipped analysis update
+    leaves a gap rather than shifting what follows.
+
+    Args:
+        frequencies: Frequency of each bin of the spectra passed to `append`.
+        interval_s: Session time between two columns.
+    """
+    def __init__(self, frequencies, interval_s, window_s=DEFAULT_WINDOW_S, max_frequency=MAX_FREQUENCY_HZ):
+        frequencies = np.asarray(frequencies)
+        self.bins = int(np.searchsorted(frequencies, max_frequency, side='right'))
+        self.frequencies = frequencies[:self.bins]
+        self.interval_s = interval_s
+        self.window_s = window_s
+        # One tile more than the window, so the tile being written never overwrites a visible one
+        self.tiles = -(-int(np.ceil(window_s / interval_s)) // TILE_COLUMNS) + 1
+        self.capacity = self.tiles * TILE_COLUMNS
+        self.image = np.full((self.capacity, self.bins), np.nan, dtype=np.float32)
+        self.newest = -1 # Absolute index of the newest column
+        self.version = 0
+
+    def append(self, time, power):
+        """
+        Adds the spectrum computed at session `time` (seconds).
+
+        Args:
+            power: Power per frequency bin (at least `bins` of them).
+        """
+        column = int(round(time / self.interval_s))
+        if column <= self.newest:
+            column = self.newest + 1 # Never go back; late updates take the next column
+        first_tile = self.newest // TILE_COLUMNS + 1
+        # Tiles entered for the first time hold columns from a lap ago; clear them
+        for tile in range(max(first_tile, column // TILE_COLUMNS - self.tiles + 1), column // TILE_COLUMNS + 1):
+            self.tile_image(tile).fill(np.nan)
+        row = column % self.capacity
+        np.log10(np.maximum(power[:self.bins], POWER_FLOOR), out=self.image[row])
+        self.image[row] *= 10
+        self.newest = column
+        self.version += 1
+
+    def tile_image(self, tile):
+        """The rows of the image that hold tile `tile` (columns tile * TILE_COLUMNS onwards)."""
+        start = (tile % self.tiles) * TILE_COLUMNS
+        return self.image[start:start + TILE_COLUMNS]
+
+    def tile_start(self, tile):
+        """Session time, in seconds, at the left edge of tile `tile`'s first column."""
+        return (tile * TILE_COLUMNS - 0.5) * self.interval_s
+
+    @property
+    def newest_time(self):
+        return self.newest * self.interval_s
+
+    def reset(self):
+        self.image.fill(np.nan)
+        self.newest = -1
+        self.version += 1
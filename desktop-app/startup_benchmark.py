@@ -0,0 +1,114 @@
+"""
+Startup-time benchmark of the dashboard.
+
+Launches main_app.py in fresh interpreter processes and measures how long
+it takes until the window's first frame is painted and until the charts
+are up. The first run starts with an empty icon cache (a cold start as
+after installation); the remaining runs reuse it.
+
+    python startup_benchmark.py --runs 5 --output startup.json
+    python startup_benchmark.py --eager-charts          # without deferred charts
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from PyQt6.QtCore import QEvent, QObject, QTimer
+from PyQt6.QtWidgets import QApplication
+
+PROBE_PREFIX = "STARTUP "
+
+class StartupProbe(QObject):
+    """
+    Installed by main_app.py --startup-probe. Records when the window is
+    first painted and when it is first painted with charts, prints the
+    timings as one JSON line and quits.
+    """
+    def __init__(self, view, started, imported):
+        super().__init__(view)
+        self._view = view
+        self._started = started
+        self.marks = {"importsS": imported - started, "windowCreatedS": time.perf_counter() - started}
+        view.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if obj is self._view and event.type() == QEvent.Type.Paint:
+            elapsed = time.perf_counter() - self._started
+            self.marks.setdefault("firstFrameS", elapsed)
+            if self._view.charts_ready and "chartsReadyS" not in self.marks:
+                self.marks["chartsReadyS"] = elapsed
+                print(PROBE_PREFIX + json.dumps(self.marks), flush=True)
+                QTimer.singleShot(0, QApplication.instance().quit)
+            elif not self._view.charts_ready:
+                # Make sure there is another paint once the charts exist
+                QTimer.singleShot(0, self._view.update)
+        return False
+
+def run_once(extra_args, env):
+    """Starts the app once and returns its marks plus the whole process lifetime up to them."""
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "main_app.py", "--startup-probe", *extra_args],
+                               cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    marks = None
+    for line in process.stdout:
+        if line.startswith(PROBE_PREFIX):
+            marks = json.loads(line[len(PROBE_PREFIX):])
+            marks["processToChartsS"] = time.perf_counter() - started
+            break
+    process.wait(timeout=60)
+    if marks is None:
+        raise RuntimeError(f"main_app.py exited with code {process.returncode} before its first frame")
+    return marks
+
+def summarize(runs):
+    keys = runs[0].keys()
+    return {key: {"min": min(run[key] for run in runs), "median": sorted(run[key] for run in runs)[len(runs) // 2]}
+            for key in keys}
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="NeuroTrack cold/warm startup benchmark")
+    parser.add_argument('--runs', type=int, default=5, help="Warm runs after the cold one")
+    parser.add_argument('--platform', default='offscreen', help="QT_QPA_PLATFORM for the app (default: %(default)s)")
+    parser.add_argument('--eager-charts', action='store_true', help="Benchmark without deferred chart creation")
+    parser.add_argument('--output', default='startup_results.json', help="Where to write the JSON results")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    extra_args = ['--no-record'] + (['--eager-charts'] if args.eager_charts else [])
+
+    with tempfile.TemporaryDirectory() as icon_cache:
+        env = dict(os.environ, QT_QPA_PLATFORM=args.platform, NEUROTRACK_ICON_CACHE=icon_cache)
+        cold = run_once(extra_args, env)
+        warm = [run_once(extra_args, env) for _ in range(args.runs)]
+
+    for label, marks in [("cold", cold)] + [(f"warm {i + 1}", run) for i, run in enumerate(warm)]:
+        print(f"{label:>7}: imports {marks['importsS'] * 1000:7.1f} ms  window {marks['windowCreatedS'] * 1000:7.1f} ms  "
+              f"first frame {marks['firstFrameS'] * 1000:7.1f} ms  charts {marks['chartsReadyS'] * 1000:7.1f} ms  process {marks['processToChartsS'] * 1000:7.1f} ms")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "qtPlatform": args.platform,
+            "eagerCharts": args.eager_charts,
+        },
+        "cold": cold,
+        "warm": summarize(warm) if warm else None,
+        "runs": warm,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,488 @@
+"""
+Live streaming of a session to remote viewers over TCP.
+
+The StreamServer runs an asyncio event loop on its own thread. The GUI
+thread only copies each update's new samples and metrics and hands them
+over about every FRAME_INTERVAL_S; encoding and sending happen on the loop.
+Every client has its own bounded frame queue and writer task, so a
+viewer on a slow link never holds up the dashboard or the other viewers:
+when its queue fills up it is switched to decimated frames (and its oldest
+frames are dropped) until it has caught up again. Viewers acknowledge the
+frames they have consumed and at most SEND_WINDOW frames are in flight,
+so a lagging viewer is noticed within a fraction of a second rather than
+once the operating system's socket buffers are full.
+
+Wire format: every message is a little-endian u32 length followed by the
+payload. The first message is a JSON hello (kind HELLO); all others are
+binary frames (kind FRAME). Viewers send back ACK messages holding the
+number of frames they have consumed so far.
+
+    FRAME_HEADER  kind, flags, decimation, state index, channels, samples
+                  per channel, samples they stand for (before decimation),
+                  index of the first sample, session time (ms)
+    metrics       only with FLAG_METRICS: ratio and band powers as f4;
+                  sent when they changed since the previous frame
+    samples       quantized to QUANTUM_UV: the first sample of each channel
+                  as i4, then the channels x (samples - 1) differences as
+                  i2 (i4 with FLAG_WIDE)
+
+Frames are self-contained, so a dropped frame only leaves a gap, which
+the receiver can see from the sample index. A FLAG_RESET is never lost
+with a dropped frame: it is carried over to the next frame the viewer
+gets.
+
+Headless client, e.g. for testing a lagging nurse-station viewer:
+
+    python streaming.py --connect 127.0.0.1:8765 --seconds 10 --delay-ms 50
+"""
+import argparse
+import asyncio
+import json
+import struct
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from recording import STATE_NAMES, UNKNOWN_STATE
+
+DEFAULT_HOST = "127.0.0.1" # Use 0.0.0.0 to serve the LAN
+DEFAULT_PORT = 8765
+PROTOCOL_VERSION = 1
+FRAME_INTERVAL_S = 0.02 # Updates are coalesced into at most ~50 frames per second
+QUEUE_FRAMES = 50 # Per client; about a second of frames
+RESUME_FRAMES = QUEUE_FRAMES // 5 # A decimated client returns to full rate below this
+SEND_WINDOW = 10 # Frames sent but not yet acknowledged
+DECIMATION = 4 # Sample and frame rate reduction for lagging clients
+QUANTUM_UV = 0.01 # Resolution of the transmitted samples
+
+HELLO, FRAME = 0, 1
+FLAG_METRICS = 0x01
+FLAG_WIDE = 0x02
+FLAG_ACUTE = 0x04
+FLAG_RESET = 0x08 # A new session started; clear what was received so far
+FLAG_BLINK = 0x10
+FLAG_CLIPPING = 0x20
+
+LENGTH = struct.Struct('<I')
+ACK = struct.Struct('<Q')
+FRAME_HEADER = struct.Struct('<BBBBHHHQd')
+
+class _Update:
+    """The data of one frame, copied off the model on the GUI thread."""
+    __slots__ = ('first_sample', 'samples', 'session_time', 'metrics', 'state', 'flags')
+
+    def __init__(self, first_sample, samples, session_time, metrics, state, flags):
+        self.first_sample = first_sample
+        self.samples = samples # Channels x samples, float64 μV
+        self.session_time = session_time
+        self.metrics = metrics # (ratio, *band powers), or None if unchanged
+        self.state = state
+        self.flags = flags
+
+def encode_frame(update, decimation=1):
+    """Encodes an _Update as a length-prefixed FRAME, keeping every `decimation`-th sample average."""
+    samples = update.samples
+    if decimation > 1 and samples.shape[1]:
+        starts = np.arange(0, samples.shape[1], decimation)
+        counts = np.diff(np.append(starts, samples.shape[1]))
+        samples = np.add.reduceat(samples, starts, axis=1) / counts
+    flags = update.flags
+    parts = []
+    if update.metrics is not None:
+        flags |= FLAG_METRICS
+        parts.append(np.asarray(update.metrics, dtype='<f4').tobytes())
+    if samples.shape[1]:
+        quantized = np.round(samples / QUANTUM_UV).astype(np.int64)
+        deltas = np.diff(quantized, axis=1)
+        wide = deltas.size and (deltas.min() < -32768 or deltas.max() > 32767)
+        if wide:
+            flags |= FLAG_WIDE
+        parts.append(quantized[:, 0].astype('<i4').tobytes())
+        parts.append(deltas.astype('<i4' if wide else '<i2').tobytes())
+    payload = FRAME_HEADER.pack(FRAME, flags, decimation, update.state, samples.shape[0], samples.shape[1],
+                                update.samples.shape[1], update.first_sample, update.session_time) + b"".join(parts)
+    return LENGTH.pack(len(payload)) + payload
+
+class StreamFrame:
+    """A decoded FRAME."""
+    __slots__ = ('flags', 'decimation', 'state', 'first_sample', 'span', 'session_time', 'metrics', 'samples')
+
+    def __init__(self, flags, decimation, state, first_sample, span, session_time, metrics, samples):
+        self.flags = flags
+        self.decimation = decimation
+        self.state = state
+        self.first_sample = first_sample
+        self.span = span # Samples per channel this frame covers at the full sample rate
+        self.session_time = session_time
+        self.metrics = metrics # (ratio, *band powers) as float32, or None
+        self.samples = samples # Channels x samples, in μV
+
+def decode_frame(payload, band_count):
+    kind, flags, decimation, state, channels, count, span, first_sample, session_time = FRAME_HEADER.unpack_from(payload)
+    offset = FRAME_HEADER.size
+    metrics = None
+    if flags & FLAG_METRICS:
+        metrics = np.frombuffer(payload, '<f4', 1 + band_count, offset)
+        offset += metrics.nbytes
+    samples = np.zeros((channels, count))
+    if count:
+        first = np.frombuffer(payload, '<i4', channels, offset)
+        offset += first.nbytes
+        deltas = np.frombuffer(payload, '<i4' if flags & FLAG_WIDE else '<i2', channels * (count - 1), offset)
+        quantized = np.empty((channels, count), dtype=np.int64)
+        quantized[:, 0] = first
+        np.cumsum(deltas.reshape(channels, count - 1), axis=1, out=quantized[:, 1:])
+        quantized[:, 1:] += quantized[:, :1]
+        samples = quantized * QUANTUM_UV
+    state_name = STATE_NAMES[state] if state < len(STATE_NAMES) else None
+    return StreamFrame(flags, decimation, state_name, first_sample, span, session_time, metrics, samples)
+
+def _merge(updates):
+    """Combines consecutive updates into one, as if they had been published together."""
+    for start in range(len(updates) - 1, -1, -1):
+        if updates[start].flags & FLAG_RESET:
+            updates = updates[start:] # Samples from before a reset belong to the old session
+            break
+    latest = updates[-1]
+    metrics = next((update.metrics for update in reversed(updates) if update.metrics is not None), None)
+    samples = np.concatenate([update.samples for update in updates], axis=1)
+    first_sample = next((update.first_sample for update in updates if update.samples.shape[1]), latest.first_sample)
+    return _Update(first_sample, samples, latest.session_time, metrics, latest.state,
+                   latest.flags | (updates[0].flags & FLAG_RESET))
+
+def _flags(frame):
+    """The flags of an encoded FRAME."""
+    return frame[LENGTH.size + 1]
+
+def _with_reset(frame):
+    """Returns a copy of an encoded FRAME with FLAG_RESET set."""
+    frame = bytearray(frame)
+    frame[LENGTH.size + 1] |= FLAG_RESET
+    return bytes(frame)
+
+class _Client:
+    """One connected viewer: its bounded frame queue and rate."""
+    def __init__(self, writer, peer):
+        self.writer = writer
+        self.peer = peer
+        self.frames = deque()
+        self.ready = asyncio.Event()
+        self.decimated = False
+        self.dropped = 0
+        self.sent = 0
+        self.acknowledged = 0
+        self.reset_pending = False # A reset was dropped and must go out with the next frame
+
+    def push(self, frame):
+        if len(self.frames) >= QUEUE_FRAMES:
+            if self.decimated:
+                self._drop(self.frames.popleft())
+            else:
+                # Skip the backlog and carry on at the reduced rate from here
+                for dropped in self.frames:
+                    self._drop(dropped)
+                self.frames.clear()
+                self._drop(frame)
+                self.decimated = True
+                return
+        if self.reset_pending:
+            frame = _with_reset(frame)
+            self.reset_pending = False
+        self.frames.append(frame)
+        self.ready.set()
+
+    def _drop(self, frame):
+        self.dropped += 1
+        if _flags(frame) & FLAG_RESET:
+            self.reset_pending = True
+
+class StreamServer:
+    """
+    Publishes model snapshots to TCP clients. Connect `publish` to the
+    model's `data_updated` signal; call `start` before and `stop` after.
+
+    Args:
+        model: The NeuroDataModel being streamed, for the session details in the hello.
+        host, port: Where to listen; port 0 picks a free port (see `port`).
+    """
+    def __init__(self, model, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self._model = model
+        self.host = host
+        self.port = port
+        self._loop = None
+        self._thread = None
+        self._server = None
+        self._clients = set()
+        self._last_metrics = None # Sent to viewers as they join
+        self._reduced_pending = [] # Updates not yet merged into a decimated frame
+        # GUI-thread side: what was already handed to the loop
+        self._published = 0
+        self._pending = []
+        self._pending_first = 0
+        self._sent_metrics = None
+        self._reset = False
+        self._last_dispatch = 0.0
+
+    # --- GUI thread ---
+
+    def start(self):
+        """Starts listening on a background thread. Raises OSError if the port is taken."""
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+        error = []
+        self._thread = threading.Thread(target=self._run, args=(started, error), name="stream-server", daemon=True)
+        self._thread.start()
+        started.wait()
+        if error:
+            self._thread.join()
+            self._loop = None
+            raise error[0]
+
+    def stop(self):
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
+
+    @property
+    def client_count(self):
+        return len(self._clients)
+
+    def publish(self, data):
+        """Queues the new samples and changed metrics of a DataSnapshot for the viewers."""
+        if self._loop is None:
+            return
+        if data.samples_written < self._published:
+            # The model was reset: start over with the new session
+            self._published = 0
+            self._pending.clear()
+            self._sent_metrics = None
+            self._reset = True
+        new = min(data.samples_written - self._published, data.eeg_waveform.shape[1])
+        if new > 0:
+            if not self._pending:
+                self._pending_first = data.samples_written - new
+            # Copied now, since the ring buffer is overwritten by later samples
+            self._pending.append(np.array(data.eeg_waveform[:, -new:]))
+            self._published = data.samples_written
+
+        now = time.monotonic()
+        if now - self._last_dispatch < FRAME_INTERVAL_S and not self._reset:
+            return
+        metrics = (data.alpha_beta_ratio, *data.band_powers.tolist())
+        if not self._pending and metrics == self._sent_metrics and not self._reset:
+            return
+        self._last_dispatch = now
+        state = STATE_NAMES.index(data.cognitive_state) if data.cognitive_state in STATE_NAMES else UNKNOWN_STATE
+        flags = ((FLAG_ACUTE if data.acute_event else 0) | (FLAG_RESET if self._reset else 0) |
+                 (FLAG_BLINK if "Blink" in data.artifacts else 0) | (FLAG_CLIPPING if "Clipping" in data.artifacts else 0))
+        if self._pending:
+            samples = np.concatenate(self._pending, axis=1)
+        else:
+            samples = np.zeros((data.eeg_waveform.shape[0], 0))
+        update = _Update(self._pending_first, samples, data.session_time,
+                         metrics if metrics != self._sent_metrics else None, state, flags)
+        self._sent_metrics = metrics
+        self._pending = []
+        self._reset = False
+        self._loop.call_soon_threadsafe(self._dispatch, update)
+
+    # --- Event loop thread ---
+
+    def _hello(self):
+        hello = {
+            "version": PROTOCOL_VERSION,
+            "sampleRate": self._model.sample_rate,
+            "channels": self._model.channel_count,
+            "bandNames": list(self._model.band_names),
+            "states": STATE_NAMES,
+            "patientName": self._model.patient_name,
+            "patientId": self._model.patient_id,
+            "quantumUv": QUANTUM_UV,
+        }
+        payload = bytes([HELLO]) + json.dumps(hello).encode('utf-8')
+        return LENGTH.pack(len(payload)) + payload
+
+    def _run(self, started, error):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._serve_client, self.host, self.port))
+        except OSError as e:
+            error.append(e)
+            started.set()
+            self._loop.close()
+            return
+        self.port = self._server.sockets[0].getsockname()[1]
+        started.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            for client in list(self._clients):
+                client.writer.close()
+            tasks = asyncio.all_tasks(self._loop)
+            for task in tasks:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._loop.close()
+
+    def _dispatch(self, update):
+        """Encodes an update once per rate and queues it for every viewer."""
+        if update.metrics is not None:
+            self._last_metrics = update
+        # Lagging viewers get one frame per DECIMATION updates, at a reduced sample rate
+        self._reduced_pending.append(update)
+        reduced = None
+        if len(self._reduced_pending) >= DECIMATION:
+            if any(client.decimated for client in self._clients):
+                reduced = encode_frame(_merge(self._reduced_pending), DECIMATION)
+            self._reduced_pending = []
+
+        full = None
+        for client in self._clients:
+            if not client.decimated:
+                full = full or encode_frame(update)
+                client.push(full)
+            elif reduced is not None:
+                client.push(reduced)
+            elif update.flags & FLAG_RESET:
+                # Merged into a later reduced frame, unless the viewer returns
+                # to full rate first and never gets that frame
+                client.reset_pending = True
+
+    async def _serve_client(self, reader, writer):
+        client = _Client(writer, writer.get_extra_info('peername'))
+        writer.write(self._hello())
+        if self._last_metrics is not None:
+            # The current metrics, so the viewer need not wait for them to change
+            last = self._last_metrics
+            writer.write(encode_frame(_Update(last.first_sample, last.samples[:, :0], last.session_time,
+                                              last.metrics, last.state, last.flags & ~FLAG_RESET)))
+            client.sent += 1
+        self._clients.add(client)
+        acks = asyncio.ensure_future(self._read_acks(reader, client)) # Completes on disconnect
+        try:
+            while not acks.done():
+                if client.frames and client.sent - client.acknowledged < SEND_WINDOW:
+                    writer.write(client.frames.popleft())
+                    client.sent += 1
+                    await writer.drain()
+                    if client.decimated and len(client.frames) < RESUME_FRAMES:
+                        client.decimated = False
+                    continue
+                client.ready.clear()
+                ready = asyncio.ensure_future(client.ready.wait())
+                await asyncio.wait((ready, acks), return_when=asyncio.FIRST_COMPLETED)
+                ready.cancel()
+        except (ConnectionError, asyncio.CancelledError):
+            pass # The viewer left, or the server is stopping
+        finally:
+            self._clients.discard(client)
+            acks.cancel()
+            writer.close()
+
+    @staticmethod
+    async def _read_acks(reader, client):
+        try:
+            while True:
+                client.acknowledged, = ACK.unpack(await reader.readexactly(ACK.size))
+                client.ready.set()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+# --- Headless client ---
+
+class StreamClient:
+    """
+    Minimal viewer: connects, decodes every frame and keeps statistics.
+    `on_frame(frame)` is called for each decoded StreamFrame.
+    """
+    def __init__(self, host, port, on_frame=None, delay_s=0.0):
+        self.host = host
+        self.port = port
+        self.on_frame = on_frame
+        self.delay_s = delay_s # Simulates a slow viewer
+        self.hello = None
+        self.frames = 0
+        self.decimated_frames = 0
+        self.samples = 0
+        self.gaps = 0
+        self.bytes = 0
+        self.resets = 0
+        self.latest = None
+        self._next_sample = None
+
+    async def run(self, seconds=None):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            await asyncio.wait_for(self._receive(reader, writer), seconds)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass # Watched long enough, or the server stopped
+        finally:
+            writer.close()
+
+    async def _receive(self, reader, writer):
+        while True:
+            length, = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+            payload = await reader.readexactly(length)
+            self.bytes += LENGTH.size + length
+            if payload[0] == HELLO:
+                self.hello = json.loads(payload[1:].decode('utf-8'))
+                continue
+            frame = decode_frame(payload, len(self.hello["bandNames"]))
+            self._count(frame)
+            if self.on_frame is not None:
+                self.on_frame(frame)
+            if self.delay_s:
+                await asyncio.sleep(self.delay_s)
+            writer.write(ACK.pack(self.frames))
+
+    def _count(self, frame):
+        self.frames += 1
+        self.latest = frame
+        if frame.flags & FLAG_RESET:
+            self.resets += 1
+            self._next_sample = None
+        if frame.decimation > 1:
+            self.decimated_frames += 1
+        if frame.span:
+            if self._next_sample is not None and frame.first_sample != self._next_sample:
+                self.gaps += 1
+            self._next_sample = frame.first_sample + frame.span
+            self.samples += frame.span
+
+    def summary(self):
+        return {
+            "frames": self.frames,
+            "decimatedFrames": self.decimated_frames,
+            "samples": self.samples,
+            "gaps": self.gaps,
+            "resets": self.resets,
+            "bytes": self.bytes,
+            "state": self.latest.state if self.latest else None,
+        }
+
+def parse_address(text):
+    """'HOST:PORT', 'HOST:', ':PORT', 'PORT' or '' -> (host, port), filling in the defaults."""
+    host, _, port = text.rpartition(':') if ':' in text else ('', '', text)
+    return host or DEFAULT_HOST, int(port) if port else DEFAULT_PORT
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless NeuroTrack stream viewer")
+    parser.add_argument('--connect', default=f"{DEFAULT_HOST}:{DEFAULT_PORT}", help="Server address (default: %(default)s)")
+    parser.add_argument('--seconds', type=float, default=10.0, help="How long to watch")
+    parser.add_argument('--delay-ms', type=float, default=0.0, help="Pause after every frame, to simulate a slow viewer")
+    args = parser.parse_args(argv)
+
+    client = StreamClient(*parse_address(args.connect), delay_s=args.delay_ms / 1000)
+    asyncio.run(client.run(args.seconds))
+    print(json.dumps(client.summary(), indent=2))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
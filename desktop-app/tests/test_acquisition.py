@@ -0,0 +1,38 @@
+import numpy as np
+
+from acquisition import SampleQueue
+
+def test_pop_all_returns_pushed_samples_in_order():
+    queue = SampleQueue(capacity=16, channels=2)
+    for block in range(5):
+        queue.push(np.full((2, 3), block))
+        np.testing.assert_array_equal(queue.pop_all(), np.full((2, 3), block))
+    assert queue.push(np.zeros((2, 20))) == 16
+    assert queue.overflow_events == 1 and queue.dropped_samples == 4 and len(queue) == 16
+
+def test_block_decided_on_before_a_clear_is_discarded():
+    queue = SampleQueue(capacity=16)
+    generation = queue.generation
+    queue.clear()
+    assert queue.push(np.ones(4), generation) == 0
+    assert queue.pop_all().size == 0
+
+class _ClearedWhilePushed:
+    """A block during whose push the consumer clears the queue."""
+    def __init__(self, queue, samples):
+        self._queue = queue
+        self._samples = samples
+
+    def reshape(self, *shape):
+        self._queue.clear()
+        return self._samples.reshape(*shape)
+
+def test_block_published_after_a_clear_is_discarded():
+    queue = SampleQueue(capacity=16)
+    queue.push(np.ones(4))
+    generation = queue.generation
+    queue.push(_ClearedWhilePushed(queue, np.full(4, 2.0)), generation)
+    assert queue.pop_all().size == 0
+    # The next session's samples come through, without the stale ones before them
+    queue.push(np.full(3, 3.0), queue.generation)
+    np.testing.assert_array_equal(queue.pop_all(), [[3.0, 3.0, 3.0]])
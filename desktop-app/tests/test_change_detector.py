@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from change_detector import DROP, RISE, WARMUP_S, ChangeDetector
+
+NOISE = 0.1 # Spread of the log values between windows
+
+def _run(seconds, rate_hz=10, level=lambda t: np.zeros_like(t), seed=0):
+    """
+    Feeds a log-normal series to a one-field detector. The noise is drawn once
+    per one-second window and interpolated, so like the model's overlapping
+    windows it does not get any rougher at a higher update rate.
+    """
+    knots = np.random.default_rng(seed).normal(0, NOISE, int(seconds) + 2)
+    detector = ChangeDetector(("Ratio",))
+    for t in np.arange(1, int(seconds * rate_hz) + 1) / rate_hz:
+        detector.update(t, [np.exp(level(t) + np.interp(t, np.arange(knots.size), knots))])
+    return detector
+
+def _step(start, end, size):
+    return lambda t: np.where((start <= t) & (t < end), size, 0.0)
+
+def test_step_drop_raises_one_event_that_ends_after_the_recovery():
+    detector = _run(240, level=_step(60, 120, np.log(0.4)))
+    assert len(detector.events) == 1
+    event = detector.events[0]
+    assert event.direction == DROP and 60 < event.time < 63
+    # Hysteresis: the event lasts through the drop and ends soon after it
+    assert 120 < event.end < 140
+    assert not detector.is_active("Ratio", DROP)
+
+def test_ongoing_event_is_reported_as_active():
+    detector = _run(100, level=_step(60, 200, np.log(0.4)))
+    assert detector.is_active("Ratio", DROP) and detector.events[0].end is None
+
+def test_rise_is_detected_in_its_own_direction():
+    detector = _run(120, level=_step(60, 200, np.log(2.5)))
+    assert [event.direction for event in detector.events] == [RISE]
+
+@pytest.mark.parametrize("seed", range(3))
+def test_noise_without_a_step_raises_nothing(seed):
+    assert _run(1200, seed=seed).events == []
+
+def test_nothing_is_raised_during_the_warm_up():
+    detector = _run(20, level=_step(1, 200, np.log(0.2)))
+    assert all(event.time >= WARMUP_S for event in detector.events)
+
+def test_evidence_cap_bounds_how_long_an_event_outlasts_a_long_drop():
+    short = _run(200, level=_step(60, 90, np.log(0.4))).events[0]
+    long = _run(800, level=_step(60, 660, np.log(0.4))).events[0]
+    assert long.end - 660 <= short.end - 90 + 1
+
+def test_result_does_not_depend_on_the_update_rate():
+    level = _step(60, 120, np.log(0.4))
+    runs = [_run(240, rate_hz, level).events for rate_hz in (2, 10, 25)]
+    assert all(len(events) == 1 for events in runs)
+    starts = [events[0].time for events in runs]
+    ends = [events[0].end for events in runs]
+    assert max(starts) - min(starts) <= 1.0
+    assert max(ends) - min(ends) <= 1.5
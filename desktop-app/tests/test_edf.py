@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from edf import MAX_PENDING_ANNOTATIONS, RESOLUTION_UV, EdfFile, EdfWriter, review
+
+@pytest.mark.parametrize("count", [0, 250, 2100, 2500])
+def test_reads_back_exactly_the_samples_written(tmp_path, count):
+    path = tmp_path / "session.edf"
+    samples = np.random.default_rng(count).uniform(-500, 500, (3, count))
+    writer = EdfWriter(str(path), 250, channels=3, patient_id="PID-1")
+    for start in range(0, count, 37):
+        writer.append(samples[:, start:start + 37])
+    writer.close()
+
+    edf = EdfFile(str(path))
+    assert edf.sample_count == count
+    assert edf.duration == count / 250
+    assert edf.patient_id == "PID-1"
+    read = np.concatenate(list(edf.chunks(chunk_records=2)), axis=1) if count else edf.read(0, 1)
+    assert read.shape == (3, count)
+    np.testing.assert_allclose(read, samples, atol=RESOLUTION_UV / 2 + 1e-9)
+    assert edf.read(count - 10, 100).shape == (3, min(count, 10))
+
+def test_leftover_annotations_add_no_samples(tmp_path):
+    path = tmp_path / "session.edf"
+    writer = EdfWriter(str(path), 250)
+    writer.append(np.zeros((1, 300)))
+    for i in range(20): # More than fit into the annotation space of one record
+        writer.annotate(1.0, f"Note {i}")
+    writer.close()
+
+    edf = EdfFile(str(path))
+    assert edf.sample_count == 300
+    assert [annotation.text for annotation in edf.annotations] == [f"Note {i}" for i in range(20)]
+
+def test_file_is_readable_while_written(tmp_path):
+    path = tmp_path / "session.edf"
+    writer = EdfWriter(str(path), 250)
+    writer.append(np.ones((1, 600)))
+    assert EdfFile(str(path)).sample_count == 500 # Whole records only, until closed
+    writer.close()
+    assert EdfFile(str(path)).sample_count == 600
+
+def test_long_annotation_is_truncated_to_fit_a_record(tmp_path):
+    path = tmp_path / "session.edf"
+    writer = EdfWriter(str(path), 250)
+    writer.append(np.zeros((1, 250)))
+    writer.annotate(1.0, "x" * 150)
+    writer.annotate(1.5, "é" * 100) # Not cut inside a character
+    writer.annotate(2.0, "After")
+    writer.close()
+
+    edf = EdfFile(str(path))
+    assert edf.record_count == 3
+    texts = [annotation.text for annotation in edf.annotations]
+    assert texts[0] == "x" * len(texts[0]) and 90 < len(texts[0]) < 150
+    assert texts[1] == "é" * len(texts[1]) and len(texts[1]) > 40
+    assert texts[2] == "After"
+
+def test_annotation_backlog_is_bounded(tmp_path):
+    writer = EdfWriter(str(tmp_path / "session.edf"), 250)
+    for i in range(MAX_PENDING_ANNOTATIONS + 10):
+        writer.annotate(0.5, f"State {i}")
+    assert writer.dropped_annotations == 10
+    writer.close()
+    assert len(EdfFile(str(tmp_path / "session.edf")).annotations) == MAX_PENDING_ANNOTATIONS
+
+def test_review_reports_progress_up_to_one(tmp_path):
+    path = tmp_path / "session.edf"
+    writer = EdfWriter(str(path), 250)
+    writer.append(np.zeros((1, 250 * 70)))
+    writer.close()
+    fractions = []
+    review(str(path), progress=fractions.append)
+    assert fractions[-1] == 1.0 and all(0 < fraction <= 1.0 for fraction in fractions)
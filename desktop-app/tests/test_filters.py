@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from filters import FilterChain
+from model import NeuroDataModel
+from simulator import SimulatedSignal
+
+def _filter_in_blocks(chain, samples, seed):
+    sizes = np.random.default_rng(seed).integers(1, 300, samples.shape[1])
+    bounds = np.concatenate(([0], np.cumsum(sizes)))
+    bounds = bounds[bounds < samples.shape[1]]
+    return np.concatenate([chain.process(samples[:, start:end])
+                           for start, end in zip(bounds, np.append(bounds[1:], samples.shape[1]))], axis=1)
+
+@pytest.mark.parametrize("bandpass", [None, (1.0, 40.0)])
+def test_chain_matches_sosfilt_across_block_splits(bandpass):
+    signal = pytest.importorskip("scipy.signal")
+    samples = SimulatedSignal(250, 3, "line-noise", seed=2).generate(250 * 20) + 800.0 # With a DC offset
+    sos = FilterChain(250, bandpass=bandpass).sos
+    # Sample by sample, from the steady state for the first sample, as the chain starts
+    reference = np.stack([signal.sosfilt(sos, channel, zi=signal.sosfilt_zi(sos) * channel[0])[0]
+                          for channel in samples])
+    for seed in range(3):
+        filtered = _filter_in_blocks(FilterChain(250, 3, bandpass=bandpass), samples, seed)
+        # Rounding differences, mainly in the DC offset the high-pass removes
+        np.testing.assert_allclose(filtered, reference, rtol=0, atol=1e-9 * np.abs(samples).max())
+
+def test_chain_output_does_not_depend_on_block_size():
+    samples = SimulatedSignal(250, 2, "blinks", seed=4).generate(250 * 10)
+    whole = FilterChain(250, 2).process(samples)
+    np.testing.assert_allclose(_filter_in_blocks(FilterChain(250, 2), samples, 0), whole,
+                               rtol=0, atol=1e-9 * np.abs(samples).max())
+
+def test_blink_is_kept_out_of_the_baseline_until_it_leaves_the_welch_average():
+    model = NeuroDataModel(channel_count=1)
+    signal = SimulatedSignal(250, 1, "rest", seed=1)
+    hop = model.analysis_hop
+    model.start_calibration()
+    blink_end = 10 * 250 # The blink is in the block ending here
+    gate, flagged = {}, {}
+    position = 0
+    while position < 16 * 250:
+        block = signal.generate(hop)
+        position += hop
+        if position == blink_end:
+            block += 300 * np.hanning(hop)
+        count = model._calibration.stats.count
+        model.append_block(block)
+        gate[position] = model._calibration.stats.count > count
+        flagged[position] = bool(model.artifacts.active)
+
+    # The average spans 8 one-second segments a hop apart
+    reopen = blink_end + 250 + 7 * hop
+    assert all(gate[end] for end in range(reopen - 1000, blink_end, hop))
+    assert not any(gate[end] for end in range(blink_end, reopen, hop))
+    assert all(gate[end] for end in range(reopen, position + 1, hop))
+    # The flag drops well before the contaminated segment leaves the average
+    assert flagged[blink_end] and not flagged[reopen - hop]
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from norms import NormTable, write_norm_table
+
+FIELDS = ("Alpha/Beta Ratio",)
+
+@pytest.fixture
+def table(tmp_path):
+    reference = np.random.default_rng(0).lognormal(0.5, 0.3, (1, 200))
+    strata = [((0, 200), 'U', 'multi', reference), ((18, 40), 'U', 'multi', reference * 2),
+              ((40, 65), 'M', 'multi', reference * 3), ((65, 120), 'M', 'multi', reference * 4)]
+    path = tmp_path / "norms.bin"
+    write_norm_table(str(path), FIELDS, strata)
+    return NormTable(str(path))
+
+def _selected(stratum):
+    return stratum.description, stratum.approximate
+
+def test_narrowest_band_containing_the_age_wins(table):
+    assert _selected(table.select(30, 'M', 'multi')) == ("multi, U, age 18-40", False)
+    assert _selected(table.select(50, 'M', 'multi')) == ("multi, M, age 40-65", False)
+    assert _selected(table.select(None, 'F', 'multi')) == ("multi, U, age 0-200", False)
+
+def test_age_outside_every_sex_specific_band_falls_back_to_the_pooled_sex(table):
+    assert _selected(table.select(150, 'M', 'multi')) == ("multi, U, age 0-200", False)
+
+def test_age_outside_every_band_uses_the_nearest(table):
+    assert _selected(table.select(300, 'M', 'multi')) == ("multi, U, age 0-200", True)
+    assert _selected(table.select(-3, 'F', 'multi')) == ("multi, U, age 0-200", True)
+
+def test_unknown_montage_has_no_norms(table):
+    assert table.select(30, 'M', 'frontal-1ch') is None
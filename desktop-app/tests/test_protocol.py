@@ -0,0 +1,46 @@
+import numpy as np
+
+from protocol import FRAME_SAMPLES, FRAME_SIZE, FrameDecoder, encode_frames
+
+def _samples(frames, seed=0):
+    return np.random.default_rng(seed).integers(-2048, 2048, frames * FRAME_SAMPLES).astype(np.int16)
+
+def _feed_in_pieces(decoder, data, seed=0):
+    rng = np.random.default_rng(seed)
+    blocks = []
+    position = 0
+    while position < len(data):
+        size = int(rng.integers(1, 3 * FRAME_SIZE))
+        blocks.append(decoder.feed(data[position:position + size]))
+        position += size
+    return np.concatenate(blocks)
+
+def test_round_trip_in_arbitrary_pieces():
+    samples = _samples(200)
+    decoder = FrameDecoder()
+    np.testing.assert_array_equal(_feed_in_pieces(decoder, encode_frames(samples)), samples)
+    assert decoder.stats() == {"framesDecoded": 200, "framesLost": 0, "samplesLost": 0,
+                               "corruptFrames": 0, "bytesSkipped": 0}
+
+def test_sequence_numbers_wrap_without_loss():
+    decoder = FrameDecoder()
+    decoder.feed(encode_frames(_samples(20), start_seq=65530))
+    assert decoder.frames_decoded == 20 and decoder.frames_lost == 0
+
+def test_lost_frames_are_counted():
+    data = encode_frames(_samples(10))
+    decoder = FrameDecoder()
+    samples = decoder.feed(data[:3 * FRAME_SIZE] + data[5 * FRAME_SIZE:])
+    assert samples.size == 8 * FRAME_SAMPLES
+    assert decoder.frames_lost == 2
+
+def test_corrupt_frame_is_rejected_and_the_stream_resynchronizes():
+    samples = _samples(10)
+    data = bytearray(encode_frames(samples))
+    data[4 * FRAME_SIZE + 10] ^= 0xFF # A flipped byte in frame 4's samples
+    decoder = FrameDecoder()
+    decoded = _feed_in_pieces(decoder, bytes(b"\x01\x02\x03" + data))
+    expected = np.concatenate((samples[:4 * FRAME_SAMPLES], samples[5 * FRAME_SAMPLES:]))
+    np.testing.assert_array_equal(decoded, expected)
+    assert decoder.corrupt_frames >= 1
+    assert decoder.frames_lost == 1
@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from band_power import BANDS
+from recording import Recording, ReplaySource, SessionRecorder
+
+def _record(path, updates=300, block=25, channels=2):
+    recorder = SessionRecorder(str(path), 250, channels=channels, sample_chunk=256, metric_chunk=16)
+    samples = np.random.default_rng(0).normal(0, 10, (channels, updates * block))
+    for update in range(updates):
+        data = SimpleNamespace(session_time=(update + 1) * block * 4.0, band_powers=np.ones(len(BANDS)),
+                               alpha_beta_ratio=1.0, cognitive_state="Calm", acute_event=False)
+        recorder.append(samples[:, update * block:(update + 1) * block], data)
+    recorder.close()
+    return samples
+
+def test_samples_read_back(tmp_path):
+    samples = _record(tmp_path)
+    recording = Recording(str(tmp_path))
+    assert recording.sample_count == samples.shape[1]
+    np.testing.assert_allclose(recording.read(1000, 700), samples[:, 1000:1700], rtol=1e-6)
+
+def test_metrics_between_matches_a_full_search(tmp_path):
+    _record(tmp_path)
+    recording = Recording(str(tmp_path))
+    times = np.asarray(recording.metrics['session_time'])
+    for start, end in [(0, 100), (-50, 1e9), (100, 100.5), (6300, 6500), (6400, 6401), (29000, 31000), (5e4, 6e4)]:
+        first, last = np.searchsorted(times, [start, end])
+        np.testing.assert_array_equal(recording.metrics_between(start, end)['session_time'], times[first:last])
+
+class _Model:
+    analysis_hop = 25
+
+    def __init__(self):
+        self.blocks = []
+
+    def append_block(self, block):
+        self.blocks.append(block)
+
+def test_replay_rewinds_for_a_new_session(tmp_path):
+    _record(tmp_path)
+    model = _Model()
+    replay = ReplaySource(Recording(str(tmp_path)), model, speed=None)
+    while replay.advance():
+        pass
+    first = np.concatenate(model.blocks, axis=1)
+    model.blocks.clear()
+    replay.rewind()
+    while replay.advance():
+        pass
+    np.testing.assert_array_equal(np.concatenate(model.blocks, axis=1), first)
+
+def test_fast_replay_feeds_analysis_sized_blocks(tmp_path, monkeypatch):
+    samples = _record(tmp_path)
+    clock = [0.0]
+    monkeypatch.setattr("recording.time.monotonic", lambda: clock[0])
+    model = _Model()
+    replay = ReplaySource(Recording(str(tmp_path)), model, speed=10)
+    while replay.advance():
+        clock[0] += 0.02 # 50 samples due per tick
+    # No block spans more than one band power update
+    assert max(block.shape[1] for block in model.blocks) == model.analysis_hop
+    np.testing.assert_allclose(np.concatenate(model.blocks, axis=1), samples, rtol=1e-6)
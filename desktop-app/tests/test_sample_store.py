@@ -0,0 +1,40 @@
+import numpy as np
+
+from sample_store import CompressedSampleStore
+
+def _signal(channels, count, seed=0):
+    # Integral μV values, which the default resolution stores losslessly
+    return np.round(np.cumsum(np.random.default_rng(seed).normal(0, 5, (channels, count)), axis=1))
+
+def test_reads_back_any_range_across_chunks():
+    samples = _signal(4, 10000)
+    store = CompressedSampleStore(4, 250, chunk_samples=1024, cache_chunks=2)
+    rng = np.random.default_rng(1)
+    position = 0
+    while position < samples.shape[1]:
+        size = int(rng.integers(1, 700))
+        store.append(samples[:, position:position + size])
+        position += size
+    assert store.total == 10000 and store.oldest == 0
+    for start, end in [(0, 10000), (1000, 1030), (1023, 1025), (5000, 9999), (9990, 10000)]:
+        np.testing.assert_array_equal(store.read(start, end), samples[:, start:end])
+    np.testing.assert_array_equal(store.latest(300), samples[:, -300:])
+    assert store.nbytes < samples.size * 2 # Smaller than even uncompressed int16
+
+def test_quantizes_to_resolution_and_clips():
+    store = CompressedSampleStore(1, 250, resolution=0.5)
+    store.append([[0.26, -1.1, 1e6]])
+    np.testing.assert_array_equal(store.read(0, 3), [[0.5, -1.0, 32767 * 0.5]])
+
+def test_retention_drops_the_oldest_chunks():
+    store = CompressedSampleStore(1, 100, chunk_samples=100, retention_s=3)
+    samples = _signal(1, 1050)
+    store.append(samples)
+    assert store.oldest == 700 and store.total == 1050
+    np.testing.assert_array_equal(store.read(0, 1050), samples[:, 700:])
+
+def test_reset_empties_the_store():
+    store = CompressedSampleStore(2, 250, chunk_samples=64)
+    store.append(_signal(2, 500))
+    store.reset()
+    assert store.total == 0 and store.read(0, 10).shape == (2, 0)
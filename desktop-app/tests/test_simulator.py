@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from simulator import SCENARIOS, SimulatedSignal, run
+
+@pytest.mark.parametrize("scenario", list(SCENARIOS))
+def test_samples_do_not_depend_on_block_size(scenario):
+    whole = SimulatedSignal(250, 4, scenario, seed=3).generate(250 * 40)
+    signal = SimulatedSignal(250, 4, scenario, seed=3)
+    sizes = np.random.default_rng(0).integers(1, 700, 200)
+    blocks = []
+    position = 0
+    for size in sizes:
+        size = min(int(size), whole.shape[1] - position)
+        if size <= 0:
+            break
+        blocks.append(signal.generate(size))
+        position += size
+    np.testing.assert_array_equal(np.concatenate(blocks, axis=1), whole[:, :position])
+
+def test_reset_replays_the_session_and_seeds_differ():
+    signal = SimulatedSignal(250, 2, "blinks", seed=7)
+    first = signal.generate(2500)
+    signal.reset()
+    np.testing.assert_array_equal(signal.generate(2500), first)
+    assert not np.array_equal(SimulatedSignal(250, 2, "blinks", seed=8).generate(2500), first)
+
+def test_unseeded_session_can_be_reproduced_from_its_seed():
+    signal = SimulatedSignal(250, 1, "electrode-pop")
+    np.testing.assert_array_equal(SimulatedSignal(250, 1, "electrode-pop", seed=signal.seed).generate(5000),
+                                  signal.generate(5000))
+
+def _acute_events(model):
+    return [event.time for event in model.event_log if event.field == "Alpha/Beta Ratio" and event.direction < 0]
+
+def test_acute_drop_raises_an_acute_event():
+    model, *_ = run("acute-drop", channels=2, seconds=120, seed=1)
+    events = _acute_events(model)
+    assert len(events) == 1 and 60 <= events[0] <= 70
+
+@pytest.mark.parametrize("scenario", ["rest", "blinks", "electrode-pop"])
+def test_steady_scenarios_raise_no_acute_event(scenario):
+    model, _, _, artifact_s = run(scenario, channels=2, seconds=120, seed=1)
+    assert _acute_events(model) == []
+    assert (artifact_s > 0) == (scenario != "rest")
@@ -0,0 +1,53 @@
+import numpy as np
+
+from streaming import (FLAG_RESET, FLAG_WIDE, LENGTH, QUANTUM_UV, QUEUE_FRAMES, _Client, _Update,
+                       decode_frame, encode_frame)
+
+def _frame(first_sample, flags=0):
+    return encode_frame(_Update(first_sample, np.zeros((1, 5)), 0.0, None, 0, flags))
+
+def _decode(frame):
+    return decode_frame(frame[LENGTH.size:], band_count=4)
+
+def test_reset_survives_a_skipped_backlog():
+    client = _Client(writer=None, peer=None)
+    for index in range(QUEUE_FRAMES):
+        client.push(_frame(index * 5, FLAG_RESET if index == 10 else 0))
+    client.push(_frame(QUEUE_FRAMES * 5)) # Overflows: the backlog, reset included, is dropped
+    assert not client.frames and client.decimated
+
+    client.push(_frame(0))
+    assert _decode(client.frames[-1]).flags & FLAG_RESET
+    client.push(_frame(5))
+    assert not _decode(client.frames[-1]).flags & FLAG_RESET
+
+def test_reset_survives_dropping_the_oldest_frame():
+    client = _Client(writer=None, peer=None)
+    client.decimated = True
+    client.push(_frame(0, FLAG_RESET))
+    for index in range(1, QUEUE_FRAMES + 1):
+        client.push(_frame(index * 5))
+    assert [_decode(frame).flags & FLAG_RESET for frame in client.frames].count(FLAG_RESET) == 1
+    assert _decode(client.frames[-1]).flags & FLAG_RESET
+
+def test_codec_round_trip():
+    rng = np.random.default_rng(1)
+    samples = np.cumsum(rng.normal(0, 20, (3, 40)), axis=1)
+    metrics = (2.5, 1.0, 2.0, 3.0, 4.0)
+    frame = encode_frame(_Update(1000, samples, 4000.0, metrics, 2, 0))
+    decoded = _decode(frame)
+    assert decoded.first_sample == 1000 and decoded.span == 40 and decoded.session_time == 4000.0
+    np.testing.assert_allclose(decoded.metrics, metrics)
+    np.testing.assert_allclose(decoded.samples, samples, atol=QUANTUM_UV / 2 + 1e-9)
+
+def test_codec_widens_large_steps():
+    samples = np.array([[0.0, 500.0, -500.0, 0.0]])
+    decoded = _decode(encode_frame(_Update(0, samples, 0.0, None, 0, 0)))
+    assert decoded.flags & FLAG_WIDE and decoded.metrics is None
+    np.testing.assert_allclose(decoded.samples, samples)
+
+def test_codec_decimates_by_averaging():
+    samples = np.arange(10, dtype=np.float64).reshape(1, 10)
+    decoded = _decode(encode_frame(_Update(0, samples, 0.0, None, 0, 0), decimation=4))
+    assert decoded.decimation == 4 and decoded.span == 10
+    np.testing.assert_allclose(decoded.samples, [[1.5, 5.5, 8.5]])
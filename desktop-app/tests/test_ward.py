@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from ward import SEQUENCE, BedBuffer, BedSpec
+
+@pytest.fixture
+def buffer():
+    buffer = BedBuffer(BedSpec("Bed 1", channels=2, window_samples=50))
+    yield buffer
+    buffer.close(unlink=True)
+
+class _PublishedDuringRead:
+    """Channel ratios whose copy is interrupted by the worker publishing new samples."""
+    def __init__(self, buffer):
+        self._buffer = buffer
+        self._ratios = buffer.ratios
+
+    def copy(self):
+        self._buffer.waveform += 1.0
+        self._buffer.header[SEQUENCE] += 2
+        return self._ratios.copy()
+
+def test_read_copies_a_consistent_state(buffer):
+    buffer.waveform[:] = np.arange(100).reshape(2, 50)
+    buffer.metrics[:] = 1.5
+    waveform = np.zeros((2, 50))
+    state = buffer.read(waveform)
+    assert state.sequence == 0 and state.alpha_beta_ratio == 1.5
+    np.testing.assert_array_equal(waveform, buffer.waveform)
+
+def test_torn_read_leaves_the_callers_waveform_alone(buffer):
+    buffer.ratios = _PublishedDuringRead(buffer)
+    waveform = np.full((2, 50), -7.0)
+    assert buffer.read(waveform) is None
+    np.testing.assert_array_equal(waveform, -7.0)
+
+def test_read_while_a_write_is_in_progress_returns_none(buffer):
+    buffer.header[SEQUENCE] = 1
+    waveform = np.full((2, 50), -7.0)
+    assert buffer.read(waveform) is None
+    np.testing.assert_array_equal(waveform, -7.0)
@@ -0,0 +1,154 @@
+import numpy as np
+
+from ring_buffer import RingBuffer
+
+# Bucket widths of the decimated levels, in seconds
+SECOND = 1
+MINUTE = 60
+
+class TrendSeries:
+    """The part of one trend level that covers a queried time range."""
+    __slots__ = ('level', 'times', 'mean', 'minimum', 'maximum')
+
+    def __init__(self, level, times, mean, minimum, maximum):
+        self.level = level
+        self.times = times
+        self.mean = mean # Fields x points
+        self.minimum = minimum
+        self.maximum = maximum
+
+class _TrendLevel:
+    """Fixed-capacity time series of per-bucket min/mean/max for every field."""
+    def __init__(self, name, fields, capacity):
+        self.name = name
+        self.capacity = capacity
+        self.times = RingBuffer(capacity, fill=-np.inf)
+        self.mean = RingBuffer(capacity, dtype=np.float32, channels=fields)
+        self.minimum = RingBuffer(capacity, dtype=np.float32, channels=fields)
+        self.maximum = RingBuffer(capacity, dtype=np.float32, channels=fields)
+
+    def append(self, time, mean, minimum, maximum):
+        self.times.append_block(time)
+        self.mean.append_block(mean)
+        self.minimum.append_block(minimum)
+        self.maximum.append_block(maximum)
+
+    def __len__(self):
+        return min(self.times.total_written, self.capacity)
+
+    @property
+    def oldest(self):
+        """Time of the oldest point still held, or inf if the level is empty."""
+        return self.times.view()[-len(self)] if len(self) else np.inf
+
+    def query(self, start, end):
+        times = self.times.view()
+        first, last = np.searchsorted(times, [start, end])
+        first = max(first, self.capacity - len(self))
+        return TrendSeries(self.name, times[first:last], self.mean.view()[:, first:last],
+                           self.minimum.view()[:, first:last], self.maximum.view()[:, first:last])
+
+class _BucketAccumulator:
+    """Running min/sum/max of the values that fall into the current bucket."""
+    def __init__(self, fields, width):
+        self.width = width
+        self.bucket = None
+        self.count = 0
+        self.total = np.zeros(fields)
+        self.minimum = np.empty(fields)
+        self.maximum = np.empty(fields)
+
+    def add(self, bucket, mean, minimum, maximum, weight):
+        """Adds values to the open bucket; returns the closed bucket's stats when a new one starts."""
+        closed = None
+        if bucket != self.bucket:
+            if self.count:
+                closed = (self.bucket * self.width, self.total / self.count, self.minimum.copy(), self.maximum.copy())
+            self.bucket = bucket
+            self.count = 0
+            self.total.fill(0)
+            self.minimum.fill(np.inf)
+            self.maximum.fill(-np.inf)
+        self.count += weight
+        self.total += mean * weight
+        np.minimum(self.minimum, minimum, out=self.minimum)
+        np.maximum(self.maximum, maximum, out=self.maximum)
+        return closed
+
+    def reset(self):
+        self.bucket = None
+        self.count = 0
+
+class TrendStore:
+    """
+    Session-long trends of the alpha/beta ratio and band powers.
+
+    Values are kept at three resolutions, built as a decimation pyramid:
+    raw analysis updates, per-second and per-minute min/mean/max. Each
+    level is a fixed-capacity ring, so memory stays bounded however long
+    the session runs, and `query` answers from the finest level that holds
+    the requested range at no more than the requested number of points.
+    """
+    def __init__(self, field_names, raw_capacity=9000, second_capacity=6 * 3600, minute_capacity=24 * 60):
+        self.field_names = tuple(field_names)
+        fields = len(self.field_names)
+        self.levels = [
+            _TrendLevel('raw', fields, raw_capacity),
+            _TrendLevel('second', fields, second_capacity),
+            _TrendLevel('minute', fields, minute_capacity),
+        ]
+        self._seconds = _BucketAccumulator(fields, SECOND)
+        self._minutes = _BucketAccumulator(fields, MINUTE)
+        self.version = 0
+
+    def append(self, time, values):
+        """
+        Adds one analysis result.
+
+        Args:
+            time: Session time in seconds; must not decrease.
+            values: One value per field, in `field_names` order.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        self.levels[0].append(time, values, values, values)
+
+        closed = self._seconds.add(int(time // SECOND), values, values, values, 1)
+        if closed is not None:
+            self._close_second(*closed)
+        self.version += 1
+
+    def _close_second(self, start, mean, minimum, maximum):
+        self.levels[1].append(start, mean, minimum, maximum)
+        closed = self._minutes.add(int(start // MINUTE), mean, minimum, maximum, 1)
+        if closed is not None:
+            self.levels[2].append(*closed)
+
+    def query(self, start, end, max_points=2000):
+        """
+        Returns the trend between `start` and `end` seconds as a TrendSeries.
+        Picks the finest level that still reaches back to `start` and whose
+        resolution keeps the result within `max_points`.
+        """
+        span = max(end - start, 0)
+        # Raw updates arrive at a fixed analysis rate; estimate it from the data
+        raw = self.levels[0]
+        raw_times = raw.times.view()
+        raw_spacing = (raw_times[-1] - raw_times[-len(raw)]) / (len(raw) - 1) if len(raw) > 1 else SECOND
+        resolutions = [raw_spacing, SECOND, MINUTE]
+
+        for level, resolution in zip(self.levels, resolutions):
+            reaches_start = level.oldest <= max(start, 0) + resolution
+            if len(level) and reaches_start and span / resolution <= max_points:
+                return level.query(start, end)
+        # Nothing fits; fall back to the coarsest level holding any data
+        filled = [level for level in self.levels if len(level)] or self.levels
+        return filled[-1].query(start, end)
+
+    def reset(self):
+        """Empties every level without reallocating."""
+        for level in self.levels:
+            for buffer in (level.times, level.mean, level.minimum, level.maximum):
+                buffer.reset()
+        self._seconds.reset()
+        self._minutes.reset()
+        self.version += 1
@@ -2,10 +2,27 @@ from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
     QGridLayout, QLabel, QPushButton, QDialog, QFrame
 )
-from PyQt6.QtCore import Qt, QSize
+from PyQt6.QtCore import Qt, QRectF, QSize, QTimer
 from PyQt6.QtGui import QIcon, QPixmap
-import pyqtgraph as pg
+import bisect
+import time
+import numpy as np
+from change_detector import DROP
+from spectrogram import TILE_COLUMNS
 from icons import create_icon_from_svg
+from waveform_lod import DEFAULT_HISTORY_S, WaveformRenderer
+
+# pyqtgraph is the slowest import of the dashboard, so it is only loaded
+# when the charts are built (see NeuroTrackView.build_charts)
+pg = None
+
+CHANNEL_SPACING = 100 # μV between stacked EEG traces
+TREND_REFRESH_S = 1.0 # How often the live trend chart is re-queried
+TREND_MAX_POINTS = 2000
+TREND_MAX_EVENT_MARKERS = 50 # The newest change events in range are marked
+ACUTE_MARKER_COLOR = "#E74C3C"
+SPECTROGRAM_LEVELS_DB = (-20, 30) # Power range of the spectrogram colour scale, in dB re 1 μV²/Hz
+EVENT_MARKER_COLOR = "#9CA3AF"
 
 # --- Custom Stylesheet ---
 STYLESHEET = """
@@ -76,6 +93,11 @@ STYLESHEET = """
     #PrintButton:disabled {
         background-color: #D1D5DB;
     }
+    #StatsButton {
+        background-color: #9CA3AF;
+        padding: 4px 10px;
+        font-size: 12px;
+    }
     #PauseButton {
         background-color: #F59E0B;
     }
@@ -94,7 +116,13 @@ class NeuroTrackView(QMainWindow):
     """
     The View in MVC. Creates and manages all UI widgets.
     """
-    def __init__(self):
+    def __init__(self, defer_charts=False, waveform_history_s=DEFAULT_HISTORY_S):
+        """
+        Args:
+            defer_charts: Leave the charts out until `build_charts()` is
+                called, so the window can be shown before pyqtgraph loads.
+            waveform_history_s: How far back the EEG chart can be scrolled.
+        """
         super().__init__()
         self.setWindowTitle("🧠 NeuroTrack Dashboard")
         self.setStyleSheet(STYLESHEET)
@@ -109,15 +137,35 @@ class NeuroTrackView(QMainWindow):
         self.pause_icon = create_icon_from_svg("pause", "white")
         self.print_icon = create_icon_from_svg("printer", "white")
 
+        # Last values pushed to each widget, used to skip redundant updates
+        self._displayed = {}
+        self.charts_ready = False
+        self._charts_deferred = defer_charts
+        self._waveform_history_s = waveform_history_s
+        self._channel_layout = None # (channels,) the EEG chart is laid out for
+        self._trend_source = None
+        self._trend_refreshed = (None, 0.0) # (store version, monotonic time)
+        self._event_source = None
+        self._event_markers = [] # Reused InfiniteLines, one per marked change event
+        self._spectrogram_source = None
+        self._spectrogram_newest = -1 # Newest spectrogram column on screen
+        self._spectrogram_tiles = [] # One ImageItem per tile of the source's circular image buffer
+
         self._create_widgets()
         self._configure_layout()
-        
+        if not defer_charts:
+            self.build_charts()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self._charts_deferred and not self.charts_ready:
+            # The first frame is on screen; now pay for the charts
+            QTimer.singleShot(0, self.build_charts)
+
     def _create_widgets(self):
         self._create_header()
         self._create_patient_panel()
         self._create_vitals_panel()
-        self._create_eeg_chart()
-        self._create_fft_chart()
         self._create_status_bar()
         self._create_calibration_overlay()
 
@@ -128,10 +176,32 @@ class NeuroTrackView(QMainWindow):
         
         self.main_layout.addLayout(self.header_layout)
         self.main_layout.addLayout(top_row_layout)
-        self.main_layout.addWidget(self.eeg_plot_widget)
-        self.main_layout.addWidget(self.fft_plot_widget)
+        # Filled by build_charts
+        self.charts_layout = QVBoxLayout()
+        self.main_layout.addLayout(self.charts_layout, 1)
         self.main_layout.addWidget(self.status_bar_panel)
 
+    def build_charts(self):
+        """Imports pyqtgraph and creates the charts; does nothing the second time."""
+        global pg
+        if self.charts_ready:
+            return
+        if pg is None:
+            import pyqtgraph
+            pg = pyqtgraph
+        self._create_eeg_chart()
+        self._create_fft_chart()
+        self._create_spectrogram_chart()
+        self._create_trend_chart()
+
+        bottom_row_layout = QHBoxLayout()
+        bottom_row_layout.addWidget(self.fft_plot_widget, 1)
+        bottom_row_layout.addWidget(self.spectrogram_plot_widget, 2)
+        bottom_row_layout.addWidget(self.trend_plot_widget, 2)
+        self.charts_layout.addWidget(self.eeg_plot_widget)
+        self.charts_layout.addLayout(bottom_row_layout)
+        self.charts_ready = True
+
     def _create_header(self):
         self.header_layout = QHBoxLayout()
         title = QLabel("🧠 NeuroTrack Dashboard")
@@ -211,11 +281,14 @@ class NeuroTrackView(QMainWindow):
         self.eeg_plot_widget.setBackground('w')
         self.eeg_plot_widget.setTitle("Live EEG Waveform", color="#1F2937", size="16pt")
         self.eeg_plot_widget.setLabel('left', 'Amplitude (μV)', color='#4B5563')
-        self.eeg_plot_widget.setLabel('bottom', 'Time (Samples)', color='#4B5563')
+        self.eeg_plot_widget.setLabel('bottom', 'Time (s)', color='#4B5563')
         self.eeg_plot_widget.showGrid(x=True, y=True, alpha=0.3)
         self.eeg_plot_widget.setYRange(-50, 50)
         pen = pg.mkPen(color="#3B82F6", width=2)
+        # All channels are drawn as stacked traces of this single curve,
+        # at the level of detail that fits the visible range
         self.eeg_curve = self.eeg_plot_widget.plot(pen=pen)
+        self.waveform_renderer = WaveformRenderer(self.eeg_plot_widget, self.eeg_curve, self._waveform_history_s)
 
     def _create_fft_chart(self):
         self.fft_plot_widget = pg.PlotWidget()
@@ -228,6 +301,34 @@ class NeuroTrackView(QMainWindow):
         self.fft_bargraph = pg.BarGraphItem(x=range(4), height=[0,0,0,0], width=0.6, brush='#6366F1')
         self.fft_plot_widget.addItem(self.fft_bargraph)
 
+    def _create_spectrogram_chart(self):
+        self.spectrogram_plot_widget = pg.PlotWidget()
+        self.spectrogram_plot_widget.setBackground('w')
+        self.spectrogram_plot_widget.setTitle("Spectrogram", color="#1F2937", size="16pt")
+        self.spectrogram_plot_widget.setLabel('left', 'Frequency (Hz)', color='#4B5563')
+        self.spectrogram_plot_widget.setLabel('bottom', 'Session Time (s)', color='#4B5563')
+        # Always shows the newest window of the source
+        self.spectrogram_plot_widget.setMouseEnabled(x=False, y=False)
+        self.spectrogram_plot_widget.hideButtons()
+        self._spectrogram_lut = pg.colormap.get('viridis').getLookupTable(nPts=256)
+
+    def _create_trend_chart(self):
+        self.trend_plot_widget = pg.PlotWidget()
+        self.trend_plot_widget.setBackground('w')
+        self.trend_plot_widget.setTitle("Alpha/Beta Ratio Trend", color="#1F2937", size="16pt")
+        self.trend_plot_widget.setLabel('left', 'Ratio', color='#4B5563')
+        self.trend_plot_widget.setLabel('bottom', 'Session Time (s)', color='#4B5563')
+        self.trend_plot_widget.showGrid(x=True, y=True, alpha=0.3)
+        # Min/max envelope of the decimated level, with the mean on top
+        self.trend_min_curve = self.trend_plot_widget.plot(pen=pg.mkPen(color="#C7D2FE"))
+        self.trend_max_curve = self.trend_plot_widget.plot(pen=pg.mkPen(color="#C7D2FE"))
+        self.trend_plot_widget.addItem(pg.FillBetweenItem(self.trend_min_curve, self.trend_max_curve, brush="#E0E7FF"))
+        self.trend_mean_curve = self.trend_plot_widget.plot(pen=pg.mkPen(color="#6366F1", width=2))
+
+        # While the x axis auto-ranges the chart follows the whole session;
+        # once the user pans or zooms, it shows whatever range is visible.
+        self.trend_plot_widget.getViewBox().sigXRangeChanged.connect(self._on_trend_range_changed)
+
     def _create_status_bar(self):
         self.status_bar_panel = QFrame()
         self.status_bar_panel.setObjectName("Panel")
@@ -238,8 +339,25 @@ class NeuroTrackView(QMainWindow):
         self.connection_status_label.setObjectName("StatusBar")
         self.session_time_label = QLabel("SESSION TIME: 00:00:00")
         self.session_time_label.setObjectName("StatusBar")
+        # Blinks and clipping currently flagged by the model's artifact detector
+        self.artifact_label = QLabel()
+        self.artifact_label.setObjectName("StatusBar")
+        self.artifact_label.setStyleSheet("color: #DC2626;")
+        self.artifact_label.setVisible(False)
+
+        # Live performance stats, only shown when instrumentation is enabled
+        self.performance_stats_label = QLabel()
+        self.performance_stats_label.setObjectName("StatusBar")
+        self.performance_stats_label.setVisible(False)
+        self.export_stats_button = QPushButton("Export Stats")
+        self.export_stats_button.setObjectName("StatsButton")
+        self.export_stats_button.setVisible(False)
         
         layout.addWidget(self.connection_status_label)
+        layout.addWidget(self.artifact_label)
+        layout.addStretch()
+        layout.addWidget(self.performance_stats_label)
+        layout.addWidget(self.export_stats_button)
         layout.addStretch()
         layout.addWidget(self.session_time_label)
         
@@ -248,26 +366,191 @@ class NeuroTrackView(QMainWindow):
         self.calibration_overlay.hide()
 
     def update_view(self, data):
-        self.patient_name_value.setText(data["patientName"])
-        self.patient_id_value.setText(data["patientId"])
+        # Only touch widgets whose displayed value actually changed;
+        # setText and especially setStyleSheet are expensive to repeat.
+        self._update_if_changed('patientName', data.patient_name, self.patient_name_value.setText)
+        self._update_if_changed('patientId', data.patient_id, self.patient_id_value.setText)
         
-        self.cognitive_state_label.setText(data["cognitiveState"])
-        self.alpha_beta_ratio_label.setText(f"{data['alphaBetaRatio']:.2f}")
+        self._update_if_changed('cognitiveState', data.cognitive_state, self.cognitive_state_label.setText)
+        self._update_if_changed('ratioText', f"{data.alpha_beta_ratio:.2f}", self.alpha_beta_ratio_label.setText)
         
-        bg_color = data['stateColor'] + '33'
-        self.cognitive_state_label.setStyleSheet(f"background-color: {bg_color}; color: {'#DC2626' if data['acuteEvent'] else '#111827'}; border-radius: 8px; padding: 8px;")
-        
-        self.vitals_panel.setStyleSheet(f"#Panel {{ border: 2px solid {'#EF4444' if data['acuteEvent'] else '#E5E7EB'}; background-color: {'#FEE2E2' if data['acuteEvent'] else 'white'}; border-radius: 16px; }}")
+        self._update_if_changed('stateStyle', (data.state_color, data.acute_event), self._apply_state_style)
+        self._update_if_changed('artifacts', data.artifacts, self._show_artifacts)
 
-        self.eeg_curve.setData(data["eegWaveform"])
-        fft_values = list(data["fftData"].values())
-        self.fft_bargraph.setOpts(height=fft_values)
+        if self.charts_ready:
+            # The waveform only needs redrawing when new samples have arrived
+            self._update_if_changed('waveform', (data.generation, data.samples_written),
+                                    lambda _: self._set_waveform(data))
+            self._update_if_changed('fftValues', tuple(data.band_powers.tolist()),
+                                    lambda values: self.fft_bargraph.setOpts(height=list(values)))
+            self._refresh_trend_if_due()
+            self._refresh_spectrogram()
 
-        ms = data["sessionTime"]
+        ms = data.session_time
         seconds = int((ms/1000)%60)
         minutes = int((ms/(1000*60))%60)
         hours = int((ms/(1000*60*60))%24)
-        self.session_time_label.setText(f"SESSION TIME: {hours:02d}:{minutes:02d}:{seconds:02d}")
+        self._update_if_changed('sessionTime', f"SESSION TIME: {hours:02d}:{minutes:02d}:{seconds:02d}",
+                                self.session_time_label.setText)
+
+    def _set_waveform(self, data):
+        """Adds the new samples to the stacked traces of the EEG chart."""
+        channels = data.eeg_waveform.shape[0]
+        if self._channel_layout != channels:
+            self._configure_channels(channels)
+        if not self.waveform_renderer.update(data):
+            # Overwritten while being copied; a newer snapshot is already on its way
+            self._displayed.pop('waveform', None)
+
+    def _configure_channels(self, channels):
+        """Lays out the stacked traces for a new montage."""
+        self._channel_layout = channels
+        self.waveform_renderer.set_channel_offsets(-CHANNEL_SPACING * np.arange(channels))
+        self.eeg_plot_widget.setYRange(-CHANNEL_SPACING * (channels - 1) - 50, 50)
+        if channels > 1:
+            self.eeg_plot_widget.setLabel('left', 'Channel', color='#4B5563')
+            self.eeg_plot_widget.getAxis('left').setTicks([
+                [(-CHANNEL_SPACING * i, f"Ch{i + 1}") for i in range(channels)]
+            ])
+        else:
+            self.eeg_plot_widget.setLabel('left', 'Amplitude (μV)', color='#4B5563')
+            self.eeg_plot_widget.getAxis('left').setTicks(None)
+
+    def _show_artifacts(self, artifacts):
+        self.artifact_label.setText("ARTIFACTS: " + ", ".join(artifacts).upper())
+        self.artifact_label.setVisible(bool(artifacts))
+
+    def clear_display(self):
+        """Forgets what is on screen, so the next update redraws everything (e.g. for another patient)."""
+        self._displayed.clear()
+        if self.charts_ready:
+            self.waveform_renderer.reset()
+
+    def set_trend_source(self, trend_store):
+        """Sets the TrendStore that the trend chart queries."""
+        self._trend_source = trend_store
+        self._trend_refreshed = (None, 0.0)
+
+    def set_event_source(self, events):
+        """Sets the time-ordered list of ChangeEvents marked on the trend chart."""
+        self._event_source = events
+
+    def set_spectrogram_source(self, spectrogram):
+        """Sets the spectrogram.Spectrogram shown in the spectrogram chart (None for none)."""
+        self._spectrogram_source = spectrogram
+        self._spectrogram_newest = -1
+        for item in self._spectrogram_tiles:
+            item.hide()
+
+    def _refresh_spectrogram(self):
+        """
+        Renders the spectrogram columns added since the last frame. Only the
+        tiles they fall into are re-rendered; the others are left as they are.
+        """
+        source = self._spectrogram_source
+        if source is None or source.newest == self._spectrogram_newest:
+            return
+        if len(self._spectrogram_tiles) != source.tiles:
+            self._create_spectrogram_tiles(source.tiles)
+        if source.newest < self._spectrogram_newest:
+            # Reset: nothing on screen is current any more
+            self.set_spectrogram_source(source)
+        newest_tile = source.newest // TILE_COLUMNS
+        first_tile = max(self._spectrogram_newest // TILE_COLUMNS, newest_tile - source.tiles + 1, 0)
+        bin_width = source.frequencies[1] - source.frequencies[0]
+        for tile in range(first_tile, newest_tile + 1):
+            item = self._spectrogram_tiles[tile % source.tiles]
+            item.setImage(source.tile_image(tile), autoLevels=False, levels=SPECTROGRAM_LEVELS_DB)
+            item.setRect(QRectF(source.tile_start(tile), -bin_width / 2,
+                                TILE_COLUMNS * source.interval_s, source.bins * bin_width))
+            item.show()
+        self._spectrogram_newest = source.newest
+
+        end = source.newest_time
+        self.spectrogram_plot_widget.setXRange(max(end - source.window_s, 0), max(end, source.window_s), padding=0)
+        self.spectrogram_plot_widget.setYRange(0, source.frequencies[-1], padding=0)
+
+    def _create_spectrogram_tiles(self, count):
+        for item in self._spectrogram_tiles:
+            self.spectrogram_plot_widget.removeItem(item)
+        self._spectrogram_tiles = []
+        for _ in range(count):
+            item = pg.ImageItem(axisOrder='col-major', lut=self._spectrogram_lut)
+            item.hide()
+            self.spectrogram_plot_widget.addItem(item)
+            self._spectrogram_tiles.append(item)
+
+    def _trend_follows_live(self):
+        return self.trend_plot_widget.getViewBox().autoRangeEnabled()[0]
+
+    def _refresh_trend_if_due(self):
+        if self._trend_source is None or not self._trend_follows_live():
+            return
+        version, refreshed_at = self._trend_refreshed
+        now = time.monotonic()
+        if version != self._trend_source.version and now - refreshed_at >= TREND_REFRESH_S:
+            self._trend_refreshed = (self._trend_source.version, now)
+            self._show_trend(0, np.inf)
+
+    def _on_trend_range_changed(self, _, x_range):
+        if self._trend_source is not None and not self._trend_follows_live():
+            self._show_trend(*x_range)
+
+    def _show_trend(self, start, end):
+        """Plots the trend level that matches the resolution of the given range."""
+        if end == np.inf:
+            newest = self._trend_source.levels[0].times.latest()
+            end = newest if np.isfinite(newest) else 0
+        series = self._trend_source.query(start, end, max_points=TREND_MAX_POINTS)
+        # Copy, since the store keeps writing into the buffers behind these views
+        times = np.array(series.times)
+        self.trend_mean_curve.setData(times, np.array(series.mean[0]))
+        self.trend_min_curve.setData(times, np.array(series.minimum[0]))
+        self.trend_max_curve.setData(times, np.array(series.maximum[0]))
+        self._show_events(start, end)
+
+    def _show_events(self, start, end):
+        """Marks the change events within [start, end] seconds with vertical lines."""
+        events = self._event_source or []
+        first = bisect.bisect_left(events, start, key=lambda event: event.time)
+        last = bisect.bisect_right(events, end, key=lambda event: event.time)
+        shown = events[max(first, last - TREND_MAX_EVENT_MARKERS):last]
+        while len(self._event_markers) < len(shown):
+            marker = pg.InfiniteLine(angle=90, movable=False)
+            self.trend_plot_widget.addItem(marker, ignoreBounds=True)
+            self._event_markers.append(marker)
+        for marker, event in zip(self._event_markers, shown):
+            acute = event.field == "Alpha/Beta Ratio" and event.direction == DROP
+            marker.setPen(pg.mkPen(ACUTE_MARKER_COLOR if acute else EVENT_MARKER_COLOR,
+                                   width=2 if acute else 1, style=Qt.PenStyle.DashLine))
+            marker.setValue(event.time)
+            marker.setToolTip(f"{event.field} {'drop' if event.direction == DROP else 'rise'} at {event.time:.0f} s")
+            marker.show()
+        for marker in self._event_markers[len(shown):]:
+            marker.hide()
+
+    def _update_if_changed(self, key, value, apply):
+        """Calls `apply(value)` only if `value` differs from what is on screen."""
+        if self._displayed.get(key) != value:
+            self._displayed[key] = value
+            apply(value)
+
+    def _apply_state_style(self, style_key):
+        state_color, acute_event = style_key
+        bg_color = state_color + '33'
+        self.cognitive_state_label.setStyleSheet(f"background-color: {bg_color}; color: {'#DC2626' if acute_event else '#111827'}; border-radius: 8px; padding: 8px;")
+        
+        self.vitals_panel.setStyleSheet(f"#Panel {{ border: 2px solid {'#EF4444' if acute_event else '#E5E7EB'}; background-color: {'#FEE2E2' if acute_event else 'white'}; border-radius: 16px; }}")
+
+    def set_connection_status(self, text):
+        self._update_if_changed('connectionStatus', text, self.connection_status_label.setText)
+
+    def show_performance_stats(self, visible):
+        self.performance_stats_label.setVisible(visible)
+        self.export_stats_button.setVisible(visible)
+
+    def set_performance_stats(self, text):
+        self.performance_stats_label.setText(text)
 
     def update_pause_resume_button_state(self, is_running):
         if is_running:
@@ -317,7 +600,7 @@ class ModeSelectionDialog(QDialog):
         layout = QHBoxLayout(button)
         
         icon_widget = QLabel()
-        icon_pixmap = create_icon_from_svg(icon_key, "#3B82F6").pixmap(QSize(32, 32))
+        icon_pixmap = create_icon_from_svg(icon_key, "#3B82F6", 32).pixmap(QSize(32, 32))
         icon_widget.setPixmap(icon_pixmap)
         icon_widget.setFixedSize(48, 48)
         icon_widget.setAlignment(Qt.AlignmentFlag.AlignCenter)
@@ -0,0 +1,270 @@
+"""
+Multi-bed monitoring backend.
+
+Every bed runs its own acquisition and NeuroDataModel, but not on the GUI
+thread: beds are spread over a pool of worker processes, one per core by
+default, so analysis scales with the number of cores instead of sharing
+one interpreter lock with the GUI.
+
+Each bed has one `multiprocessing.shared_memory` block that its worker
+publishes into and the GUI reads from:
+
+    header     int64 x HEADER_FIELDS   sequence number, counters, state
+    metrics    float64 x METRIC_FIELDS  session time, ratio, band powers
+    ratios     float64 x channels       per-channel alpha/beta ratios
+    waveform   float64 x channels x window
+
+Nothing is pickled after startup. The sequence number works as a seqlock:
+the worker makes it odd while it writes and even when done, and a reader
+that sees it change (or odd) while copying simply tries again.
+"""
+import multiprocessing as mp
+import os
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from band_power import BANDS
+from recording import STATE_NAMES, UNKNOWN_STATE
+from scheduler import ClockScheduler
+
+PUBLISH_INTERVAL_S = 0.02 # How often workers acquire, analyze and publish
+READ_ATTEMPTS = 4
+STALE_AFTER_S = 1.0 # A bed that published nothing for this long is shown without values
+MAX_RESTARTS = 3 # Per worker; one that keeps crashing is left down
+
+# Header fields
+SEQUENCE, SAMPLES_WRITTEN, ANALYSIS_COUNT, STATE, ACUTE, FAILED = range(6)
+HEADER_FIELDS = 8
+# Metric fields
+SESSION_TIME, RATIO = range(2)
+BAND_POWERS = slice(2, 2 + len(BANDS))
+METRIC_FIELDS = 2 + len(BANDS)
+
+_STATE_CODES = {name: code for code, name in enumerate(STATE_NAMES)}
+
+class BedSpec:
+    """What a bed monitors; picklable, so it can be handed to a worker."""
+    def __init__(self, name, channels=1, port=None, baudrate=115200, protocol='binary',
+                 sample_rate=250, window_samples=500, scenario="default", seed=None):
+        self.name = name
+        self.channels = channels
+        self.port = port
+        self.baudrate = baudrate
+        self.protocol = protocol
+        self.sample_rate = sample_rate
+        self.window_samples = window_samples
+        self.scenario = scenario # Simulated beds only; see simulator.SCENARIOS
+        self.seed = seed
+
+class BedState:
+    """A consistent copy of one bed's published state."""
+    __slots__ = ('sequence', 'samples_written', 'analysis_count', 'cognitive_state', 'acute_event',
+                 'failed', 'session_time', 'alpha_beta_ratio', 'band_powers', 'channel_ratios')
+
+class BedBuffer:
+    """Typed views of one bed's shared memory block."""
+    def __init__(self, spec, name=None):
+        self.spec = spec
+        layout = [(HEADER_FIELDS, np.int64), (METRIC_FIELDS, np.float64), (spec.channels, np.float64),
+                  (spec.channels * spec.window_samples, np.float64)]
+        size = sum(count * np.dtype(dtype).itemsize for count, dtype in layout)
+        self._shm = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        self.name = self._shm.name
+
+        offset = 0
+        views = []
+        for count, dtype in layout:
+            views.append(np.ndarray((count,), dtype=dtype, buffer=self._shm.buf, offset=offset))
+            offset += count * np.dtype(dtype).itemsize
+        self.header, self.metrics, self.ratios, waveform = views
+        self.waveform = waveform.reshape(spec.channels, spec.window_samples)
+        self._scratch = None # Waveform copy of a read, until it is known to be consistent
+
+    def publish(self, data, analysis_count, failed=False):
+        """Writes a DataSnapshot of the bed's model (worker side)."""
+        header = self.header
+        header[SEQUENCE] += 1 # Odd: write in progress
+        if header[SAMPLES_WRITTEN] != data.samples_written:
+            self.waveform[:] = data.eeg_waveform
+        header[SAMPLES_WRITTEN] = data.samples_written
+        header[ANALYSIS_COUNT] = analysis_count
+        header[STATE] = _STATE_CODES.get(data.cognitive_state, UNKNOWN_STATE)
+        header[ACUTE] = data.acute_event
+        header[FAILED] = failed
+        self.metrics[SESSION_TIME] = data.session_time
+        self.metrics[RATIO] = data.alpha_beta_ratio
+        self.metrics[BAND_POWERS] = data.band_powers
+        self.ratios[:] = data.channel_ratios
+        header[SEQUENCE] += 1 # Even: consistent again
+
+    def read(self, waveform_out=None):
+        """
+        Copies a consistent state (GUI side). The waveform is copied into
+        `waveform_out` when given; it is left untouched unless the read
+        succeeds. Returns None if the worker kept writing during every attempt.
+        """
+        header = self.header
+        if waveform_out is not None and self._scratch is None:
+            self._scratch = np.empty_like(self.waveform)
+        for _ in range(READ_ATTEMPTS):
+            sequence = int(header[SEQUENCE])
+            if sequence % 2:
+                time.sleep(0)
+                continue
+            state = BedState()
+            state.sequence = sequence
+            state.samples_written = int(header[SAMPLES_WRITTEN])
+            state.analysis_count = int(header[ANALYSIS_COUNT])
+            code = int(header[STATE])
+            state.cognitive_state = STATE_NAMES[code] if code < len(STATE_NAMES) else "Idle"
+            state.acute_event = bool(header[ACUTE])
+            state.failed = bool(header[FAILED])
+            state.session_time = float(self.metrics[SESSION_TIME])
+            state.alpha_beta_ratio = float(self.metrics[RATIO])
+            state.band_powers = self.metrics[BAND_POWERS].copy()
+            state.channel_ratios = self.ratios.copy()
+            if waveform_out is not None:
+                np.copyto(self._scratch, self.waveform)
+            if int(header[SEQUENCE]) == sequence:
+                if waveform_out is not None:
+                    np.copyto(waveform_out, self._scratch)
+                return state
+        return None
+
+    def close(self, unlink=False):
+        # The views must be released before the mapping can be closed
+        self.header = self.metrics = self.ratios = self.waveform = self._scratch = None
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
+
+# --- Worker process ---
+
+class _BedRunner:
+    """One bed inside a worker: its source of samples, model and shared buffer."""
+    def __init__(self, spec, buffer_name):
+        from model import NeuroDataModel
+        from simulator import SimulatedSignal
+
+        self.buffer = BedBuffer(spec, buffer_name)
+        if self.buffer.header[SEQUENCE] % 2:
+            self.buffer.header[SEQUENCE] += 1 # A crashed worker was interrupted while writing
+        self.model = NeuroDataModel(channel_count=spec.channels, sample_rate=spec.sample_rate,
+                                    window_samples=spec.window_samples)
+        self.model.patient_name = spec.name
+        self.signal = None # Source of the samples when the bed has no device
+        self.acquisition = None
+        if spec.port:
+            from acquisition import SerialAcquisition
+            self.acquisition = SerialAcquisition(spec.port, baudrate=spec.baudrate, protocol=spec.protocol)
+            self.acquisition.start()
+            self.acquisition.set_forwarding(True)
+        else:
+            self.signal = SimulatedSignal(spec.sample_rate, spec.channels, spec.scenario, spec.seed)
+        self._clock = ClockScheduler(spec.sample_rate, PUBLISH_INTERVAL_S)
+        self._clock.start()
+
+    def step(self):
+        failed = False
+        if self.acquisition is None:
+            due = self._clock.due()
+            if due:
+                self.model.append_block(self.signal.generate(due))
+        else:
+            samples = self.acquisition.queue.pop_all()
+            if samples.size:
+                self.model.append_block(samples)
+            failed = self.acquisition.error is not None
+        # Band powers are re-estimated once per hop; the trend gains a point each time
+        self.buffer.publish(self.model.get_data_snapshot(), self.model.trend.version, failed)
+
+    def close(self):
+        if self.acquisition is not None:
+            self.acquisition.stop()
+            self.acquisition.join()
+        self.buffer.close()
+
+def _run_worker(beds, stop_flag):
+    """Entry point of a worker process: advances its beds until `stop_flag` is set."""
+    runners = [_BedRunner(spec, buffer_name) for spec, buffer_name in beds]
+    try:
+        next_step = time.monotonic()
+        while not stop_flag.value:
+            for runner in runners:
+                runner.step()
+            next_step += PUBLISH_INTERVAL_S
+            time.sleep(max(0.0, next_step - time.monotonic()))
+    finally:
+        for runner in runners:
+            runner.close()
+
+class WardManager:
+    """
+    Hosts N concurrent bed streams in a pool of worker processes.
+
+    The GUI process owns the shared memory; workers only attach to it. A
+    worker that dies is restarted (up to MAX_RESTARTS times) by
+    `check_workers`, and its beds start a new session.
+    """
+    def __init__(self, specs, workers=None):
+        self.specs = list(specs)
+        self.workers = max(1, min(workers or os.cpu_count() or 1, len(self.specs)))
+        self.buffers = []
+        self.restarts = [0] * self.workers
+        self._processes = []
+        self._context = None
+        self._stop_flag = None
+
+    def start(self):
+        self._context = mp.get_context('spawn') # Never fork a process that has a QApplication
+        # Lock-free, unlike an Event, which a worker killed while waiting on it would leave unusable
+        self._stop_flag = self._context.RawValue('b', 0)
+        self.buffers = [BedBuffer(spec) for spec in self.specs]
+        self._processes = [self._start_worker(worker) for worker in range(self.workers)]
+
+    def _start_worker(self, worker):
+        beds = [(spec, buffer.name) for spec, buffer in
+                zip(self.specs[worker::self.workers], self.buffers[worker::self.workers])]
+        process = self._context.Process(target=_run_worker, args=(beds, self._stop_flag),
+                                        name=f"ward-worker-{worker}", daemon=True)
+        process.start()
+        return process
+
+    def beds_of(self, worker):
+        """Indices of the beds a worker runs."""
+        return list(range(worker, len(self.specs), self.workers))
+
+    def check_workers(self):
+        """
+        Restarts workers that have exited, unless they used up their
+        restarts. Returns (worker, exit code, restarted) for each worker
+        found dead; a worker left down stays in the result on later calls.
+        """
+        dead = []
+        for worker, process in enumerate(self._processes):
+            if process.is_alive():
+                continue
+            restarted = self.restarts[worker] < MAX_RESTARTS
+            if restarted:
+                self.restarts[worker] += 1
+                self._processes[worker] = self._start_worker(worker)
+            dead.append((worker, process.exitcode, restarted))
+        return dead
+
+    def read(self, bed, waveform_out=None):
+        return self.buffers[bed].read(waveform_out)
+
+    def shutdown(self, timeout=5.0):
+        """Stops the workers and releases the shared memory."""
+        if self._stop_flag is not None:
+            self._stop_flag.value = 1
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        for buffer in self.buffers:
+            buffer.close(unlink=True)
+        self.buffers = []
@@ -0,0 +1,158 @@
+import time
+
+import numpy as np
+from PyQt6.QtCore import QTimer
+
+from change_detector import DROP, ChangeEvent
+from model import STATE_COLORS
+from render_scheduler import DEFAULT_FPS
+from snapshot import DataSnapshot
+from trend_store import TrendStore
+from view import NeuroTrackView
+from ward import STALE_AFTER_S
+
+class _BedDisplay:
+    """
+    GUI-side copy of one bed, shaped like the model's waveform RingBuffer so
+    it can be wrapped in a DataSnapshot for the drill-down view.
+    """
+    def __init__(self, spec, band_names):
+        self.spec = spec
+        self.waveform = np.zeros((spec.channels, spec.window_samples))
+        self._read_only = self.waveform.view()
+        self._read_only.flags.writeable = False
+        self.generation = 0
+        self.total_written = 0
+        self.trend = TrendStore(("Alpha/Beta Ratio",) + band_names)
+        # Acute events as published by the worker, rebuilt from the bed's acute flag
+        self.events = []
+        self.state = None
+        self.updated = time.monotonic() # When the worker last published
+        self.stale = None # Why the tile shows no values, while it does
+
+    def view(self):
+        return self._read_only
+
+class WardController:
+    """
+    Polls every bed's shared memory once per frame, refreshes the tiles and
+    feeds the drill-down NeuroTrackView of the selected bed.
+    """
+    def __init__(self, manager, view, band_names, fps=DEFAULT_FPS):
+        self._manager = manager
+        self._view = view
+        self._band_names = tuple(band_names)
+        self._beds = [_BedDisplay(spec, self._band_names) for spec in manager.specs]
+        self._snapshot_version = 0
+        self._down = set() # Beds whose worker crashed too often to be restarted
+        self._status = f"{len(manager.specs)} BEDS | {manager.workers} WORKER PROCESSES"
+        self._worker_notes = {} # Worker -> what happened to it
+
+        self._detail_view = None
+        self._detail_bed = None
+        for tile in self._view.tiles:
+            tile.clicked.connect(self.show_bed)
+
+        self.frame_timer = QTimer()
+        self.frame_timer.timeout.connect(self._refresh)
+        self.frame_timer.start(max(1, round(1000 / fps)))
+        self._view.set_status(self._status)
+
+    def _check_workers(self):
+        dead = self._manager.check_workers()
+        for worker, exitcode, restarted in dead:
+            if restarted:
+                note = f"WORKER {worker + 1} RESTARTED {self._manager.restarts[worker]}x (EXIT CODE {exitcode})"
+            else:
+                self._down.update(self._manager.beds_of(worker))
+                note = f"WORKER {worker + 1} DOWN (EXIT CODE {exitcode})"
+            self._worker_notes[worker] = note
+        if dead:
+            self._view.set_status(" | ".join([self._status] + [self._worker_notes[w] for w in sorted(self._worker_notes)]))
+
+    def _refresh(self):
+        self._check_workers()
+        now = time.monotonic()
+        for bed, (display, tile) in enumerate(zip(self._beds, self._view.tiles)):
+            previous = display.state
+            state = self._manager.read(bed, display.waveform)
+            if state is None or (previous is not None and state.sequence == previous.sequence):
+                # Frozen values would look like a stable patient; show none instead
+                if bed in self._down:
+                    self._mark_stale(bed, display, tile, "WORKER DOWN")
+                elif now - display.updated > STALE_AFTER_S:
+                    self._mark_stale(bed, display, tile, "NO DATA")
+                continue
+            display.state = state
+            display.updated = now
+            waveform_changed = previous is None or state.samples_written != previous.samples_written or display.stale
+            if display.stale and bed == self._detail_bed and self._detail_view.isVisible():
+                self._detail_view.set_connection_status(f"CONNECTION: {display.spec.port or 'SIMULATED'}")
+            display.stale = None
+            if waveform_changed:
+                display.generation += 1
+                display.total_written = state.samples_written
+            if previous is not None and state.session_time < previous.session_time:
+                display.trend.reset()
+                display.events.clear()
+            if previous is None or state.analysis_count != previous.analysis_count:
+                display.trend.append(state.session_time / 1000, (state.alpha_beta_ratio, *state.band_powers))
+            self._track_acute_event(display, state)
+
+            tile.update_tile(state, STATE_COLORS.get(state.cognitive_state, STATE_COLORS["Idle"]),
+                             display.waveform[0], waveform_changed)
+            if bed == self._detail_bed and self._detail_view.isVisible():
+                self._detail_view.update_view(self._snapshot(display))
+
+    def _mark_stale(self, bed, display, tile, reason):
+        if display.stale == reason:
+            return
+        display.stale = reason
+        tile.show_stale(reason, STATE_COLORS["Idle"])
+        if bed == self._detail_bed and self._detail_view.isVisible():
+            self._detail_view.set_connection_status(f"CONNECTION: {reason}")
+
+    @staticmethod
+    def _track_acute_event(display, state):
+        ongoing = display.events[-1] if display.events and display.events[-1].end is None else None
+        if state.acute_event and ongoing is None:
+            display.events.append(ChangeEvent(state.session_time / 1000, "Alpha/Beta Ratio", DROP))
+        elif not state.acute_event and ongoing is not None:
+            ongoing.end = state.session_time / 1000
+
+    def _snapshot(self, display):
+        state = display.state
+        self._snapshot_version += 1
+        return DataSnapshot(
+            self._snapshot_version, display, display.spec.name, display.spec.port or "SIMULATED",
+            state.session_time, self._band_names, state.band_powers, state.alpha_beta_ratio,
+            state.channel_ratios, state.cognitive_state, STATE_COLORS.get(state.cognitive_state, STATE_COLORS["Idle"]),
+            state.acute_event, display.spec.sample_rate,
+        )
+
+    def show_bed(self, bed):
+        """Drills down into one bed with the full single-patient dashboard."""
+        if self._detail_view is None:
+            self._detail_view = NeuroTrackView()
+            # Sessions are managed per bed by the workers, not from this window
+            self._detail_view.new_session_button.setVisible(False)
+            self._detail_view.print_button.setVisible(False)
+            self._detail_view.pause_resume_button.setVisible(False)
+            self._detail_view.resize(1280, 800)
+        display = self._beds[bed]
+        self._detail_bed = bed
+        self._detail_view.clear_display()
+        self._detail_view.setWindowTitle(f"🧠 NeuroTrack - {display.spec.name}")
+        self._detail_view.set_connection_status(f"CONNECTION: {display.spec.port or 'SIMULATED'}")
+        self._detail_view.set_trend_source(display.trend)
+        self._detail_view.set_event_source(display.events)
+        if display.state is not None:
+            self._detail_view.update_view(self._snapshot(display))
+        self._detail_view.show()
+        self._detail_view.raise_()
+
+    def shutdown(self):
+        self.frame_timer.stop()
+        if self._detail_view is not None:
+            self._detail_view.close()
+        self._manager.shutdown()
@@ -0,0 +1,138 @@
+import math
+
+from PyQt6.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, QFrame
+from PyQt6.QtCore import Qt, pyqtSignal
+import pyqtgraph as pg
+
+from view import STYLESHEET
+
+TILE_STYLESHEET = STYLESHEET + """
+    #TileName {
+        font-size: 16px;
+        font-weight: bold;
+        color: #1F2937;
+    }
+    #TileRatio {
+        font-size: 28px;
+        font-weight: bold;
+        color: #1F2937;
+    }
+    #TileState {
+        font-size: 13px;
+        font-weight: bold;
+        padding: 4px;
+        border-radius: 6px;
+    }
+"""
+TILE_WAVEFORM_STEP = 2 # Tiles draw every second sample of the first channel
+
+class BedTile(QFrame):
+    """Compact summary of one bed: state, ratio and a small waveform. Click to drill down."""
+    clicked = pyqtSignal(int)
+
+    def __init__(self, bed, name, parent=None):
+        super().__init__(parent)
+        self.bed = bed
+        self.setObjectName("Panel")
+        self.setCursor(Qt.CursorShape.PointingHandCursor)
+        self._displayed = {}
+
+        layout = QVBoxLayout(self)
+        top_row = QHBoxLayout()
+        name_label = QLabel(name)
+        name_label.setObjectName("TileName")
+        self.ratio_label = QLabel("-")
+        self.ratio_label.setObjectName("TileRatio")
+        top_row.addWidget(name_label)
+        top_row.addStretch()
+        top_row.addWidget(self.ratio_label)
+
+        self.state_label = QLabel("Idle")
+        self.state_label.setObjectName("TileState")
+        self.state_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+
+        self.plot_widget = pg.PlotWidget()
+        self.plot_widget.setBackground('w')
+        self.plot_widget.setMinimumHeight(80)
+        self.plot_widget.hideAxis('left')
+        self.plot_widget.hideAxis('bottom')
+        self.plot_widget.setMouseEnabled(x=False, y=False)
+        self.plot_widget.hideButtons()
+        self.plot_widget.setYRange(-50, 50)
+        self.curve = self.plot_widget.plot(pen=pg.mkPen(color="#3B82F6", width=1))
+        # Clicks on the plot should drill down too, not start a pan
+        self.plot_widget.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+
+        layout.addLayout(top_row)
+        layout.addWidget(self.state_label)
+        layout.addWidget(self.plot_widget)
+
+    def mousePressEvent(self, event):
+        self.clicked.emit(self.bed)
+        super().mousePressEvent(event)
+
+    def update_tile(self, state, state_color, waveform, waveform_changed):
+        """
+        Args:
+            state: The bed's BedState.
+            state_color: Color of its cognitive state.
+            waveform: The first channel's samples.
+            waveform_changed: False if the waveform is the same as last time.
+        """
+        state_text = "NO SIGNAL" if state.failed else state.cognitive_state
+        self._update_if_changed('state', state_text, self.state_label.setText)
+        self._update_if_changed('ratio', f"{state.alpha_beta_ratio:.2f}", self.ratio_label.setText)
+        self._update_if_changed('style', (state_color, state.acute_event), self._apply_style)
+        if waveform_changed:
+            self.curve.setData(waveform[::TILE_WAVEFORM_STEP])
+
+    def show_stale(self, reason, color):
+        """Replaces the values with `reason` while the bed's worker publishes nothing."""
+        self._update_if_changed('state', reason, self.state_label.setText)
+        self._update_if_changed('ratio', "-", self.ratio_label.setText)
+        self._update_if_changed('style', (color, False), self._apply_style)
+        self.curve.setData([])
+
+    def _apply_style(self, style_key):
+        state_color, acute_event = style_key
+        self.state_label.setStyleSheet(f"background-color: {state_color}33; color: {'#DC2626' if acute_event else '#111827'};")
+        self.setStyleSheet(f"#Panel {{ border: 2px solid {'#EF4444' if acute_event else '#E5E7EB'}; background-color: {'#FEE2E2' if acute_event else 'white'}; border-radius: 16px; }}")
+
+    def _update_if_changed(self, key, value, apply):
+        if self._displayed.get(key) != value:
+            self._displayed[key] = value
+            apply(value)
+
+class WardView(QMainWindow):
+    """A grid of bed tiles for watching many patients from one station."""
+    def __init__(self, bed_names):
+        super().__init__()
+        self.setWindowTitle("🧠 NeuroTrack Ward")
+        self.setStyleSheet(TILE_STYLESHEET)
+
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+        layout = QVBoxLayout(central_widget)
+
+        title = QLabel("🧠 NeuroTrack Ward")
+        title.setObjectName("HeaderLabel")
+        self.status_label = QLabel()
+        self.status_label.setObjectName("StatusBar")
+        header_layout = QHBoxLayout()
+        header_layout.addWidget(title)
+        header_layout.addStretch()
+        header_layout.addWidget(self.status_label)
+
+        grid = QGridLayout()
+        columns = math.ceil(math.sqrt(len(bed_names)))
+        self.tiles = []
+        for bed, name in enumerate(bed_names):
+            tile = BedTile(bed, name)
+            grid.addWidget(tile, bed // columns, bed % columns)
+            self.tiles.append(tile)
+
+        layout.addLayout(header_layout)
+        layout.addLayout(grid)
+
+    def set_status(self, text):
+        self.status_label.setText(text)
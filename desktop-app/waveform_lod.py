@@ -0,0 +1,299 @@
+"""
+Level-of-detail rendering of long, scrollable EEG waveforms.
+
+A screen can show at most one distinct value per pixel column, yet a few
+minutes of multi-channel EEG is hundreds of thousands of samples. The
+history is therefore kept at several resolutions: the raw samples plus
+per-bucket min/max levels, each LOD_FACTOR times coarser than the one
+below, built incrementally as samples arrive (only the new segment is
+reduced). To draw a range, the renderer picks the coarsest level that is
+still finer than a pixel, reduces it to one min/max pair per pixel column
+and draws that envelope, so the number of points on screen depends on the
+plot width and not on how much time is visible.
+"""
+import numpy as np
+
+from ring_buffer import RingBuffer
+
+DEFAULT_HISTORY_S = 300 # Waveform history that can be scrolled back through
+LOD_FACTOR = 8 # Samples per bucket of the first min/max level, and between levels
+LOD_LEVELS = 4
+RAW_SAMPLES_PER_PIXEL = 2.0 # Up to this density the samples are drawn as they are
+LIVE_EDGE_TOLERANCE = 0.02 # Fraction of the visible span; a view ending this close to the newest sample follows it
+MIN_COLUMNS = 100 # Pixel columns assumed before the plot has a size
+
+class _MinMaxLevel:
+    """Per-bucket min/max of every channel, for buckets of `factor` samples."""
+    def __init__(self, factor, channels, capacity):
+        self.factor = factor
+        self.minimum = RingBuffer(capacity, dtype=np.float32, fill=np.nan, channels=channels)
+        self.maximum = RingBuffer(capacity, dtype=np.float32, fill=np.nan, channels=channels)
+        # Values of the finer level that do not fill a bucket yet
+        self._pending_min = np.empty((channels, 0), dtype=np.float32)
+        self._pending_max = np.empty((channels, 0), dtype=np.float32)
+
+    @property
+    def count(self):
+        """Number of completed buckets since the start."""
+        return self.minimum.total_written
+
+    def add(self, minimum, maximum, ratio):
+        """
+        Adds the min/max of the next values of the finer level, `ratio` of
+        which make one bucket here. Returns the buckets completed by them.
+        """
+        minimum = np.concatenate((self._pending_min, minimum), axis=1)
+        maximum = np.concatenate((self._pending_max, maximum), axis=1)
+        complete = minimum.shape[1] // ratio * ratio
+        channels = minimum.shape[0]
+        # fmin/fmax skip the NaNs that stand for lost samples
+        closed_min = np.fmin.reduce(minimum[:, :complete].reshape(channels, -1, ratio), axis=2)
+        closed_max = np.fmax.reduce(maximum[:, :complete].reshape(channels, -1, ratio), axis=2)
+        self._pending_min = minimum[:, complete:]
+        self._pending_max = maximum[:, complete:]
+        self.minimum.append_block(closed_min)
+        self.maximum.append_block(closed_max)
+        return closed_min, closed_max
+
+    def buckets(self, first, last):
+        """Returns the min and max of buckets [first, last) as channels x buckets views."""
+        offset = self.minimum.capacity - self.count # View index of bucket 0
+        return (self.minimum.view()[:, first + offset:last + offset],
+                self.maximum.view()[:, first + offset:last + offset])
+
+    def reset(self):
+        self.minimum.reset()
+        self.maximum.reset()
+        self._pending_min = self._pending_min[:, :0]
+        self._pending_max = self._pending_max[:, :0]
+
+class WaveformHistory:
+    """
+    The newest `capacity` samples of every channel, with a min/max pyramid.
+
+    Samples are addressed by their absolute index since the start of the
+    session. Memory is fixed: each level is a RingBuffer, like the levels of
+    `trend_store.TrendStore`.
+    """
+    def __init__(self, channels, capacity, levels=LOD_LEVELS):
+        self.channels = channels
+        self.capacity = int(capacity)
+        self.samples = RingBuffer(self.capacity, dtype=np.float32, fill=np.nan, channels=channels)
+        self.levels = [_MinMaxLevel(LOD_FACTOR ** (k + 1), channels, self.capacity // LOD_FACTOR ** (k + 1) + 1)
+                       for k in range(levels)]
+
+    @property
+    def total(self):
+        """Index one past the newest sample."""
+        return self.samples.total_written
+
+    @property
+    def oldest(self):
+        """Index of the oldest sample still held."""
+        return max(0, self.total - self.capacity)
+
+    def append(self, block):
+        """Adds a channels x samples block; NaNs mark samples that were lost."""
+        block = np.asarray(block, dtype=np.float32).reshape(self.channels, -1)
+        if block.shape[1] == 0:
+            return
+        self.samples.append_block(block)
+        minimum = maximum = block
+        for level in self.levels:
+            minimum, maximum = level.add(minimum, maximum, LOD_FACTOR)
+            if minimum.shape[1] == 0:
+                break
+
+    def append_gap(self, count):
+        """Records `count` lost samples, so later samples keep their index."""
+        self.append(np.full((self.channels, count), np.nan, dtype=np.float32))
+
+    def reset(self):
+        self.samples.reset()
+        for level in self.levels:
+            level.reset()
+
+    def raw(self, start, end):
+        """Returns samples [start, end) as a channels x samples view (indices must be held)."""
+        offset = self.capacity - self.total
+        return self.samples.view()[:, start + offset:end + offset]
+
+    def envelope(self, start, end, columns):
+        """
+        Returns what to draw of samples [start, end) at `columns` pixels.
+
+        Returns:
+            (indices, minimum, maximum): the sample index where each column
+            starts and the channels x columns min/max within it. At
+            RAW_SAMPLES_PER_PIXEL or less, every sample is its own column
+            (and minimum is maximum). None if nothing in range is held.
+        """
+        start, end = max(int(start), self.oldest), min(int(np.ceil(end)), self.total)
+        if end <= start:
+            return None
+        if (end - start) / columns <= RAW_SAMPLES_PER_PIXEL:
+            values = self.raw(start, end)
+            return np.arange(start, end), values, values
+
+        # The coarsest level with buckets no wider than a column, completed
+        # by the samples of its bucket that is still open
+        samples_per_column = (end - start) / columns
+        source = None
+        for level in self.levels:
+            if level.factor > samples_per_column:
+                break
+            source = level
+        if source is None:
+            positions = np.arange(start, end)
+            minimum = maximum = self.raw(start, end)
+        else:
+            factor = source.factor
+            first = start // factor
+            last = min(-(-end // factor), source.count)
+            tail = max(last * factor, start)
+            bucket_min, bucket_max = source.buckets(first, last)
+            tail_values = self.raw(tail, end)
+            positions = np.concatenate((np.arange(first, last) * factor, np.arange(tail, end)))
+            minimum = np.concatenate((bucket_min, tail_values), axis=1)
+            maximum = np.concatenate((bucket_max, tail_values), axis=1)
+
+        edges = start + (end - start) * np.arange(columns) / columns
+        column_starts = np.unique(np.searchsorted(positions, edges))
+        column_starts = column_starts[column_starts < len(positions)]
+        return (np.maximum(positions[column_starts], start),
+                np.fmin.reduceat(minimum, column_starts, axis=1),
+                np.fmax.reduceat(maximum, column_starts, axis=1))
+
+class WaveformRenderer:
+    """
+    Draws the stacked channels of a WaveformHistory into one plot curve,
+    for the visible x range only and at the plot's pixel resolution.
+
+    The x axis is in seconds. While following live data the view scrolls
+    with the newest sample, keeping the span the user zoomed to; panning
+    away from the newest sample (or zooming so that it leaves the view)
+    scrolls back through the history, and a double-click returns to live.
+
+    Args:
+        plot_widget: The pyqtgraph PlotWidget to draw in.
+        curve: The PlotDataItem holding all stacked traces.
+        channel_offsets: Vertical offset of each channel's trace.
+        history_s: How much waveform can be scrolled back through.
+    """
+    def __init__(self, plot_widget, curve, history_s=DEFAULT_HISTORY_S):
+        self.plot_widget = plot_widget
+        self.curve = curve
+        self.history_s = history_s
+        self.history = None
+        self.sample_rate = None
+        self.follow_live = True
+        self.live_span_s = None # Set from the first snapshot's window
+        self._channel_offsets = None
+        self._setting_range = False
+
+        viewbox = plot_widget.getViewBox()
+        viewbox.setMouseEnabled(x=True, y=False)
+        plot_widget.hideButtons() # Auto-range would fit only what is drawn
+        viewbox.sigXRangeChanged.connect(self._on_range_changed)
+        viewbox.sigRangeChangedManually.connect(self._on_range_changed_manually)
+        viewbox.sigResized.connect(lambda *_: self.redraw())
+        plot_widget.scene().sigMouseClicked.connect(self._on_mouse_clicked)
+        self._viewbox = viewbox
+
+    def set_channel_offsets(self, offsets):
+        self._channel_offsets = np.asarray(offsets, dtype=np.float32).reshape(-1, 1)
+
+    def reset(self):
+        """Forgets the history, e.g. for a new session or another patient."""
+        if self.history is not None:
+            self.history.reset()
+        self.follow_live = True
+        self.curve.setData([], [])
+
+    def update(self, data):
+        """
+        Adds the samples that are new in the DataSnapshot `data` and redraws
+        if they are in view. Returns False if the snapshot was overwritten
+        while being read, in which case nothing was added.
+        """
+        waveform = data.eeg_waveform
+        channels, window = waveform.shape
+        if (self.history is None or self.history.channels != channels
+                or self.sample_rate != data.sample_rate):
+            self.sample_rate = data.sample_rate
+            self.history = WaveformHistory(channels, self.history_s * data.sample_rate)
+            self.live_span_s = window / data.sample_rate
+            self.follow_live = True
+        elif data.samples_written < self.history.total:
+            self.reset()
+
+        new = data.samples_written - self.history.total
+        block = np.array(waveform[:, window - min(new, window):])
+        if not data.is_valid():
+            return False
+        if new > window:
+            self.history.append_gap(new - window)
+        self.history.append(block)
+
+        if self.follow_live:
+            self._show_live()
+        elif new and self._view_range()[1] * self.sample_rate >= self.history.total - new:
+            self.redraw()
+        return True
+
+    def _view_range(self):
+        return self._viewbox.viewRange()[0]
+
+    def _show_live(self):
+        newest = self.history.total / self.sample_rate
+        self._setting_range = True
+        try:
+            self._viewbox.setXRange(newest - self.live_span_s, newest, padding=0)
+        finally:
+            self._setting_range = False
+        self.redraw()
+
+    def _on_range_changed(self, *_):
+        if not self._setting_range:
+            self.redraw()
+
+    def _on_range_changed_manually(self, *_):
+        if self.history is None:
+            return
+        start, end = self._view_range()
+        newest = self.history.total / self.sample_rate
+        self.follow_live = end >= newest - LIVE_EDGE_TOLERANCE * (end - start)
+        if self.follow_live:
+            self.live_span_s = end - start
+
+    def _on_mouse_clicked(self, event):
+        if event.double() and self.history is not None:
+            self.follow_live = True
+            self._show_live()
+
+    def redraw(self):
+        """Draws the part of the history in the visible x range."""
+        if self.history is None or self._channel_offsets is None:
+            return
+        start, end = self._view_range()
+        columns = max(int(self._viewbox.width()), MIN_COLUMNS)
+        envelope = self.history.envelope(start * self.sample_rate, end * self.sample_rate, columns)
+        if envelope is None:
+            self.curve.setData([], [])
+            return
+        indices, minimum, maximum = envelope
+        channels, count = minimum.shape
+        times = indices / self.sample_rate
+        if minimum is maximum:
+            x, y = times, minimum + self._channel_offsets
+        else:
+            # A vertical stroke from min to max in every column
+            x = np.repeat(times, 2)
+            y = np.empty((channels, 2 * count), dtype=np.float32)
+            np.add(minimum, self._channel_offsets, out=y[:, 0::2])
+            np.add(maximum, self._channel_offsets, out=y[:, 1::2])
+        # A NaN after each channel breaks the line before the next one
+        stacked = np.full((channels, y.shape[1] + 1), np.nan, dtype=np.float32)
+        stacked[:, :-1] = y
+        x = np.append(x, x[-1])
+        self.curve.setData(np.tile(x, channels), stacked.ravel(), connect='finite')
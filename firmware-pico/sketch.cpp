@@ -1,19 +1,61 @@
-#include "pico/stlib.h"
+#include "pico/stdlib.h"
 #include "hardware/adc.h"
 #include <stdio.h>
 
 const uint ADC_PIN = 26;
 const uint ADC_CHANNEL = 0;
-const int READ_DELAY_MS = 1000;
+const uint SAMPLE_PERIOD_US = 4000; // 250 Hz, the rate the desktop app analyzes at
+const int16_t ADC_MIDPOINT = 2048;  // 12-bit ADC
+
+// Binary frame, see desktop-app/protocol.py. The RP2040 is little-endian,
+// so the struct can be written to USB serial as-is.
+const uint16_t FRAME_SYNC = 0x5AA5;
+const int FRAME_SAMPLES = 16;
+
+struct __attribute__((packed)) Frame {
+    uint16_t sync;
+    uint16_t seq;
+    int16_t samples[FRAME_SAMPLES];
+    uint16_t checksum; // Fletcher-16 of seq and samples
+};
+
+static uint16_t fletcher16(const uint8_t *data, size_t length) {
+    uint16_t sum1 = 0;
+    uint16_t sum2 = 0;
+    for (size_t i = 0; i < length; ++i) {
+        sum1 = (sum1 + data[i]) % 255;
+        sum2 = (sum2 + sum1) % 255;
+    }
+    return (sum2 << 8) | sum1;
+}
+
 int main (){
     stdio_init_all();
     adc_init();
     adc_gpio_init(ADC_PIN);
     adc_select_input(ADC_CHANNEL);
+
+    Frame frame;
+    frame.sync = FRAME_SYNC;
+    uint16_t seq = 0;
+    absolute_time_t next_sample = get_absolute_time();
+
     while (true) {
-        uint16_t result = adc_read();
-        printf("EEG reading: %d\n", result);
-        sleep_ms(READ_DELAY_MS);
+        for (int i = 0; i < FRAME_SAMPLES; ++i) {
+            next_sample = delayed_by_us(next_sample, SAMPLE_PERIOD_US);
+            sleep_until(next_sample);
+            frame.samples[i] = (int16_t)adc_read() - ADC_MIDPOINT;
+        }
+        frame.seq = seq++;
+        frame.checksum = fletcher16((const uint8_t *)&frame.seq,
+                                    sizeof(frame) - 2 * sizeof(uint16_t));
+
+        // putchar_raw skips the stdio CR/LF translation that would corrupt binary data
+        const uint8_t *bytes = (const uint8_t *)&frame;
+        for (size_t i = 0; i < sizeof(frame); ++i) {
+            putchar_raw(bytes[i]);
+        }
+        stdio_flush();
     }
     return 0;
-}
\ No newline at end of file
+}